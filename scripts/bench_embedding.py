@@ -0,0 +1,175 @@
+# scripts/bench_embedding.py
+# So sánh embedding backend torch vs ONNX int8: parity (cosine), latency, RSS
+# Mỗi backend chạy trong 1 process riêng → RSS không lẫn vào nhau
+#
+#   python scripts/bench_embedding.py                 # export ONNX nếu chưa có
+#   python scripts/bench_embedding.py --export        # export lại
+#   python scripts/bench_embedding.py --data data/fpt_data.json --texts 256
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+
+
+SAMPLE_QUERIES = [
+    "học phí ngành công nghệ thông tin bao nhiêu",
+    "trường có ký túc xá không",
+    "điều kiện xét tuyển học bổng toàn phần",
+    "chương trình tiếng anh dự bị kéo dài bao lâu",
+    "ngành trí tuệ nhân tạo học những gì",
+    "phí nhập học đóng khi nào",
+    "fpt có cơ sở ở đà nẵng không",
+    "ra trường làm việc ở đâu",
+]
+
+
+def load_texts(data_file: str, n: int):
+    texts = list(SAMPLE_QUERIES)
+    if data_file and os.path.exists(data_file):
+        from src.rag.index_pipeline import iter_json_array
+
+        for item in iter_json_array(data_file):
+            content = (item.get("content") or "").strip()
+            if content:
+                texts.append(f"Tiêu đề: {item.get('title', '')}\nNội dung: {content[:800]}")
+            if len(texts) >= n:
+                break
+    return texts
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2)
+
+
+# ================= WORKER (1 backend / process) =================
+
+def run_worker(backend: str, texts_file: str, vectors_file: str, rounds: int):
+    from src.rag.model_registry import current_rss_mb, get_embedding_function
+
+    with open(texts_file, "r", encoding="utf-8") as f:
+        texts = json.load(f)
+
+    rss_start = current_rss_mb()
+    t0 = time.perf_counter()
+    ef = get_embedding_function(backend=backend)
+    load_s = time.perf_counter() - t0
+    rss_loaded = current_rss_mb()
+
+    ef(["warm up"])
+
+    # ---- query latency (1 câu / lần, như 1 lượt hỏi) ----
+    latencies = []
+    for r in range(rounds):
+        q = SAMPLE_QUERIES[r % len(SAMPLE_QUERIES)]
+        t0 = time.perf_counter()
+        ef([q])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    # ---- batch throughput (như index) ----
+    t0 = time.perf_counter()
+    vectors = np.stack(ef(texts))
+    batch_s = time.perf_counter() - t0
+
+    np.save(vectors_file, vectors)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "rss_model_mb": round(rss_loaded - rss_start, 1),
+        "rss_peak_mb": current_rss_mb(),
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "batch_texts_per_s": round(len(texts) / max(batch_s, 1e-9), 1),
+    }))
+
+
+# ================= MAIN =================
+
+def spawn(backend, texts_file, vectors_file, rounds):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", backend,
+         "--texts-file", texts_file, "--vectors-file", vectors_file,
+         "--rounds", str(rounds)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, EMBEDDING_BACKEND=backend),
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"❌ Worker {backend} lỗi")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--data", default=os.path.join("data", "fpt_data.json"),
+                        help="lấy thêm chunk thật từ file crawl (nếu có)")
+    parser.add_argument("--texts", type=int, default=128,
+                        help="số text cho parity + throughput")
+    parser.add_argument("--rounds", type=int, default=50,
+                        help="số query đo latency")
+    parser.add_argument("--export", action="store_true",
+                        help="export lại ONNX trước khi đo")
+    parser.add_argument("--worker", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.texts_file, args.vectors_file, args.rounds)
+        return 0
+
+    from src.rag.onnx_embedding import PARITY_MIN_COSINE, export_onnx, load_meta, model_dir
+
+    if args.export or load_meta(model_dir(settings.EMBEDDING_MODEL)) is None:
+        print("📦 Export ONNX...")
+        print(json.dumps(export_onnx(), ensure_ascii=False))
+
+    texts = load_texts(args.data, args.texts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_file = os.path.join(tmp, "texts.json")
+        with open(texts_file, "w", encoding="utf-8") as f:
+            json.dump(texts, f, ensure_ascii=False)
+
+        results = {}
+        vectors = {}
+        for backend in ("torch", "onnx"):
+            vectors_file = os.path.join(tmp, f"{backend}.npy")
+            results[backend] = spawn(backend, texts_file, vectors_file, args.rounds)
+            vectors[backend] = np.load(vectors_file)
+
+    a, b = vectors["torch"], vectors["onnx"]
+    cos = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    parity = {
+        "texts": len(texts),
+        "min_cosine": round(float(cos.min()), 5),
+        "mean_cosine": round(float(cos.mean()), 5),
+        "passed": bool(cos.min() >= PARITY_MIN_COSINE),
+    }
+
+    cols = ["load_s", "rss_model_mb", "rss_peak_mb", "query_p50_ms",
+            "query_p95_ms", "batch_texts_per_s"]
+    print(f"{'':20}{'torch':>12}{'onnx':>12}")
+    for col in cols:
+        print(f"{col:20}{results['torch'][col]:>12}{results['onnx'][col]:>12}")
+    print(f"parity: min cos {parity['min_cosine']} | mean cos {parity['mean_cosine']} "
+          f"| {'OK' if parity['passed'] else 'FAIL'} (>= {PARITY_MIN_COSINE})")
+
+    return 0 if parity["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# scripts/bench_keywords.py
+# Microbenchmark keyword / normalize: bản cũ (vòng `k in text` + 2 lượt re.sub)
+# vs KeywordMatcher compile 1 lần + 1 lượt regex
+# Lượt voice: lệnh điều khiển + tuition chung 1 matcher (INTENT_MATCHER), bản cũ
+# quét riêng từng bảng; rf_kw_hits lúc index vẫn giữ `k in text` – dòng "(tham khảo)"
+# Corpus: transcript ASR giả lập (có lỗi ASR, dấu câu, viết tắt) + chunk text
+#
+#   python scripts/bench_keywords.py
+#   python scripts/bench_keywords.py --data data/fpt_university.json --rounds 20
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import EXIT_KEYWORDS, INTENT_MATCHER, START_KEYWORDS, THANK_KEYWORDS  # noqa: E402
+from src.rag.rerank_features import TUITION_KEYWORDS, TUITION_MATCHER  # noqa: E402
+from src.services.barge_in import STOP_WORDS  # noqa: E402
+from src.utils.text_normalizer import (  # noqa: E402
+    ABBREVIATION_MAP,
+    COMMAND_FIX,
+    normalize_text,
+)
+
+
+TRANSCRIPT_PARTS = [
+    "bắt đầu tư vấn", "Bat dau", "cho mình hỏi", "học phí ngành CNTT bao nhiêu",
+    "AI có khó không?", "ngành IT ra trường làm gì", "Dừng!", "stop", "thoat",
+    "kết thuc", "ok cảm ơn", "thank you", "chi phí ký túc xá", "đóng tiền khi nào",
+    "ừm", "à", "tạm biệt", "dừng tư vấn", "ML và DL học ở kỳ mấy", "phí nhập học",
+    "trường có học bổng không ạ", "bao nhiêu tiền một kỳ", "hoi thong tin tuyen sinh",
+]
+
+CHUNK_SENTENCES = [
+    "Học phí ngành Kỹ thuật phần mềm năm 2024 là 28.7 triệu mỗi học kỳ.",
+    "Sinh viên được đóng tiền theo từng kỳ, chi phí tài liệu tính riêng.",
+    "Trường có ký túc xá trong khuôn viên, gần thư viện và sân thể thao.",
+    "Chương trình tiếng Anh dự bị kéo dài tối đa 6 mức, mỗi mức 2 tháng.",
+    "Học bổng toàn phần dành cho thí sinh đạt giải quốc gia (AI, IT, ML).",
+    "Phí nhập học 4.6 tr, nộp trước ngày khai giảng!",
+    "Ngành Trí tuệ nhân tạo đào tạo machine learning và deep learning.",
+]
+
+
+# ================= LEGACY =================
+
+def legacy_normalize(text: str) -> str:
+    if not text:
+        return ""
+    text = text.lower().strip()
+    text = unicodedata.normalize("NFC", text)
+    for k, v in COMMAND_FIX.items():
+        if k in text:
+            return v
+    text = re.sub(r"[^\w\s]", " ", text)
+    words = [ABBREVIATION_MAP.get(w, w) for w in text.split()]
+    text = " ".join(words)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def legacy_intents(text: str) -> set:
+    # controller + _detect_tuition_intent cũ của retrieval (2 lượt quét)
+    tables = {"start": START_KEYWORDS, "exit": EXIT_KEYWORDS,
+              "thank": THANK_KEYWORDS, "stop": STOP_WORDS, "tuition": TUITION_KEYWORDS}
+    return {name for name, kws in tables.items() if any(k in text for k in kws)}
+
+
+def legacy_kw_hits(text: str) -> int:
+    return sum(1 for k in TUITION_KEYWORDS if k in text)
+
+
+# ================= CORPUS =================
+
+def make_transcripts(n: int, rng: random.Random):
+    out = []
+    for _ in range(n):
+        parts = rng.sample(TRANSCRIPT_PARTS, rng.randint(1, 3))
+        out.append(rng.choice(["", " ", "  "]) + ", ".join(parts) + rng.choice(["", ".", "?", " "]))
+    return out
+
+
+def make_chunks(n: int, rng: random.Random, data: str = None):
+    if data:
+        from src.rag.index_pipeline import iter_json_array
+
+        chunks = []
+        for item in iter_json_array(data):
+            text = f"Tiêu đề: {item.get('title', '')}\nNội dung: {item.get('content', '')}"
+            chunks.extend(text[i:i + 900] for i in range(0, len(text), 720))
+            if len(chunks) >= n:
+                break
+        if chunks:
+            return chunks[:n]
+
+    return [
+        "Tiêu đề: Tuyển sinh FPT\nNội dung: "
+        + " ".join(rng.choices(CHUNK_SENTENCES, k=rng.randint(3, 16)))
+        for _ in range(n)
+    ]
+
+
+def bench(fn, items, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - t0) / (rounds * len(items)) * 1e6
+
+
+# ================= MAIN =================
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword matcher microbenchmark")
+    parser.add_argument("--transcripts", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--data", help="JSON array document (như index_data.py) làm chunk")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    transcripts = make_transcripts(args.transcripts, rng)
+    chunks = make_chunks(args.chunks, rng, args.data)
+    normalized = [normalize_text(t) for t in transcripts]
+    chunks_norm = [normalize_text(c) for c in chunks]
+
+    # Kết quả phải giống hệt bản cũ
+    for t, n in zip(transcripts, normalized):
+        assert legacy_normalize(t) == n, f"normalize mismatch: {t!r}"
+        assert legacy_intents(n) == INTENT_MATCHER.groups(n), f"intent mismatch: {n!r}"
+        assert any(k in n for k in TUITION_KEYWORDS) == bool(TUITION_MATCHER.groups(n))
+    for c, n in zip(chunks, chunks_norm):
+        assert legacy_normalize(c) == n, "normalize mismatch (chunk)"
+        assert legacy_kw_hits(n) == TUITION_MATCHER.count(n, "tuition"), "kw_hits mismatch"
+
+    cases = [
+        ("normalize_text (transcript)", legacy_normalize, normalize_text, transcripts),
+        ("intents + tuition (transcript)", legacy_intents, INTENT_MATCHER.groups, normalized),
+        ("normalize_text (chunk)", legacy_normalize, normalize_text, chunks),
+        ("tuition intent (tham khảo)",
+         lambda q: any(k in q for k in TUITION_KEYWORDS),
+         lambda q: bool(TUITION_MATCHER.groups(q)), normalized),
+        ("rf_kw_hits (tham khảo)", legacy_kw_hits,
+         lambda c: TUITION_MATCHER.count(c, "tuition"), chunks_norm),
+    ]
+
+    print(f"corpus: {len(transcripts)} transcript, {len(chunks)} chunk "
+          f"(~{sum(map(len, chunks)) // max(1, len(chunks))} ký tự)")
+    print(f"{'case':<30}{'legacy µs':>12}{'matcher µs':>12}{'speedup':>10}")
+    for name, legacy, new, items in cases:
+        old_us = bench(legacy, items, args.rounds)
+        new_us = bench(new, items, args.rounds)
+        print(f"{name:<30}{old_us:>12.2f}{new_us:>12.2f}{old_us / new_us:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# scripts/bench_rerank.py
+# Microbenchmark rerank: bản cũ (regex + normalize mỗi query) vs feature tính sẵn
+#
+#   python scripts/bench_rerank.py
+#   python scripts/bench_rerank.py --candidates 20 --rounds 2000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.rerank_features import (  # noqa: E402
+    MONEY_PATTERN,
+    TUITION_KEYWORDS,
+    compute_features,
+    score_candidates,
+    select_top,
+    trim_doc,
+)
+from src.utils.text_normalizer import normalize_text  # noqa: E402
+
+
+THRESHOLD = 0.15
+RRF_WEIGHT = 0.10
+
+SAMPLE_SENTENCES = [
+    "Học phí ngành Kỹ thuật phần mềm năm 2024 là 28.7 triệu mỗi học kỳ.",
+    "Sinh viên được đóng tiền theo từng kỳ, chi phí tài liệu tính riêng.",
+    "Trường có ký túc xá trong khuôn viên, gần thư viện và sân thể thao.",
+    "Chương trình tiếng Anh dự bị kéo dài tối đa 6 mức, mỗi mức 2 tháng.",
+    "Học bổng toàn phần dành cho thí sinh đạt giải quốc gia.",
+    "Phí nhập học 4.6 tr, nộp trước ngày khai giảng.",
+    "Ngành Trí tuệ nhân tạo đào tạo machine learning và deep learning.",
+]
+
+
+# ================= LEGACY (trước khi có feature) =================
+
+def legacy_trim(doc, max_chars=800):
+    if len(doc) <= max_chars:
+        return doc.strip()
+    match = MONEY_PATTERN.search(doc)
+    if match:
+        start = max(0, match.start() - 200)
+        end = min(len(doc), match.end() + 300)
+        return doc[start:end].strip()
+    return doc[:max_chars].strip() + "..."
+
+
+def legacy_rerank(docs, metas, dists, rrf, is_tuition_query, top_k):
+    candidates = []
+    rrf_top = max(rrf) if rrf else 0.0
+
+    for pos, (doc, meta, dist) in enumerate(zip(docs, metas, dists)):
+        score = max(0.0, 1.0 / (1.0 + dist))
+        if rrf_top:
+            score += RRF_WEIGHT * rrf[pos] / rrf_top
+        if is_tuition_query:
+            if meta.get("doc_type") == "tuition":
+                score += 0.30
+            elif meta.get("doc_type") == "tuition_note":
+                score += 0.15
+        if MONEY_PATTERN.search(doc):
+            score += 0.10
+        if meta.get("available") is True:
+            score += 0.05
+        doc_norm = normalize_text(doc)
+        hits = sum(1 for k in TUITION_KEYWORDS if k in doc_norm)
+        score += min(hits * 0.03, 0.09)
+
+        if score < THRESHOLD:
+            continue
+        candidates.append((legacy_trim(doc), round(score, 4)))
+        if len(candidates) >= top_k * 2:
+            break
+
+    candidates.sort(key=lambda x: x[1], reverse=True)
+    return candidates[:top_k]
+
+
+# ================= NEW (feature trong metadata) =================
+
+def feature_rerank(docs, metas, dists, rrf, is_tuition_query, top_k):
+    scores = score_candidates(dists, metas, metas, rrf, is_tuition_query, RRF_WEIGHT)
+    order, top_scores = select_top(scores, THRESHOLD, top_k)
+    return [(trim_doc(docs[i], metas[i]), s) for i, s in zip(order, top_scores)]
+
+
+# ================= BENCH =================
+
+def make_queries(n_queries, n_candidates, seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        docs, metas = [], []
+        for _ in range(n_candidates):
+            body = " ".join(rng.choices(SAMPLE_SENTENCES, k=rng.randint(3, 16)))
+            doc = f"Tiêu đề: Tuyển sinh FPT\nNội dung: {body}"
+            meta = {
+                "doc_type": rng.choice(["general", "tuition", "tuition_note"]),
+                "available": True,
+                **compute_features(doc),
+            }
+            docs.append(doc)
+            metas.append(meta)
+        dists = [rng.uniform(0.2, 1.2) for _ in range(n_candidates)]
+        rrf = sorted((rng.uniform(0.01, 0.033) for _ in range(n_candidates)), reverse=True)
+        queries.append((docs, metas, dists, rrf, rng.random() < 0.5))
+    return queries
+
+
+def bench(fn, queries, rounds, top_k):
+    t0 = time.perf_counter()
+    for r in range(rounds):
+        docs, metas, dists, rrf, tuition = queries[r % len(queries)]
+        fn(docs, metas, dists, rrf, tuition, top_k)
+    return (time.perf_counter() - t0) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerank microbenchmark")
+    parser.add_argument("--candidates", type=int, default=10,
+                        help="số candidate mỗi query (top_k * 2)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    top_k = max(1, args.candidates // 2)
+    queries = make_queries(args.queries, args.candidates, args.seed)
+
+    # Kết quả phải giống hệt bản cũ
+    for q in queries:
+        assert legacy_rerank(*q, top_k) == feature_rerank(*q, top_k), "rerank mismatch"
+
+    legacy_us = bench(legacy_rerank, queries, args.rounds, top_k)
+    feature_us = bench(feature_rerank, queries, args.rounds, top_k)
+
+    print(f"candidates/query : {args.candidates}")
+    print(f"legacy rerank    : {legacy_us:8.1f} µs/query")
+    print(f"feature rerank   : {feature_us:8.1f} µs/query")
+    print(f"speedup          : {legacy_us / feature_us:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# scripts/bench_vad.py
+# So sánh VAD engine trên WAV đã gán nhãn: endpoint latency, onset bị cắt, CPU
+#
+# Nhãn: mỗi foo.wav đi kèm foo.json = {"segments": [[start_s, end_s], ...]}
+#
+#   python scripts/bench_vad.py --synthetic          # tạo bộ test tổng hợp rồi đo
+#   python scripts/bench_vad.py --data data/vad_bench --engines energy,webrtc:3,adaptive
+#   python scripts/bench_vad.py --json
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import soundfile as sf  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+from src.services.vad import Endpointer, create_vad, frame_signal  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+FRAME_DURATION = 0.03            # giống VoiceService
+PREROLL = 0.4
+ONSET_TOLERANCE = 0.01           # s – đầu câu trễ hơn mức này coi là bị cắt
+
+DEFAULT_ENGINES = "energy,webrtc:1,webrtc:3,adaptive"
+
+
+# ================= DATA =================
+
+def load_wav(path: str):
+    audio, fs = sf.read(path, dtype="float32")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if fs != SAMPLE_RATE:
+        # resample tuyến tính – đủ cho VAD, không cần scipy
+        n = int(len(audio) * SAMPLE_RATE / fs)
+        audio = np.interp(
+            np.linspace(0, len(audio), n, endpoint=False),
+            np.arange(len(audio)),
+            audio
+        ).astype(np.float32)
+    return audio
+
+
+def load_dataset(data_dir: str):
+    items = []
+    for wav in sorted(glob.glob(os.path.join(data_dir, "*.wav"))):
+        label = os.path.splitext(wav)[0] + ".json"
+        if not os.path.exists(label):
+            print(f"⚠️ Bỏ qua {wav}: thiếu {os.path.basename(label)}")
+            continue
+        with open(label, "r", encoding="utf-8") as f:
+            segments = json.load(f)["segments"]
+        items.append((os.path.basename(wav), load_wav(wav), segments))
+    return items
+
+
+def make_synthetic(data_dir: str, files: int = 6, seed: int = 0):
+    """
+    Giọng nói giả lập (harmonic + formant + nhịp âm tiết ~4 Hz, onset nhỏ dần
+    như phụ âm đầu) trên noise trắng / hum 50 Hz ở nhiều SNR
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+
+    for k in range(files):
+        snr_db = [25, 15, 8][k % 3]
+        duration = 12.0
+        n = int(duration * SAMPLE_RATE)
+        t = np.arange(n) / SAMPLE_RATE
+
+        noise = rng.normal(0, 1, n).astype(np.float32)
+        if k % 2:
+            noise += 2.0 * np.sin(2 * np.pi * 50 * t)
+        noise *= 0.005 / np.sqrt(np.mean(noise ** 2))
+
+        speech = np.zeros(n, dtype=np.float32)
+        segments = []
+        cursor = 1.0 + rng.uniform(0, 0.5)
+        while cursor < duration - 2.5:
+            length = rng.uniform(0.8, 2.2)
+            i0, i1 = int(cursor * SAMPLE_RATE), int((cursor + length) * SAMPLE_RATE)
+            tt = t[i0:i1] - cursor
+
+            f0 = rng.uniform(110, 220) * (1 + 0.05 * np.sin(2 * np.pi * 3 * tt))
+            phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            voiced = sum(np.sin(h * phase) / h for h in range(1, 12))
+            hiss = rng.normal(0, 0.3, len(tt))
+            syllables = 0.5 * (1 - np.cos(2 * np.pi * 4 * tt)) ** 0.5
+            onset = np.minimum(tt / 0.15, 1.0)           # phụ âm đầu nhỏ
+            offset = np.minimum((length - tt) / 0.2, 1.0)
+
+            speech[i0:i1] = (voiced + hiss) * syllables * onset * offset
+            segments.append([round(cursor, 3), round(cursor + length, 3)])
+            cursor += length + rng.uniform(0.9, 2.0)
+
+        speech_rms = np.sqrt(np.mean(speech[speech != 0] ** 2))
+        speech *= 0.005 * 10 ** (snr_db / 20) / speech_rms
+        audio = np.clip(speech + noise, -1, 1)
+
+        name = f"synthetic_{k:02d}_snr{snr_db}"
+        sf.write(os.path.join(data_dir, name + ".wav"), audio, SAMPLE_RATE, subtype="PCM_16")
+        with open(os.path.join(data_dir, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"segments": segments, "snr_db": snr_db}, f)
+
+    print(f"🧪 Tạo {files} file tổng hợp → {data_dir}")
+
+
+# ================= SIMULATION =================
+
+def parse_engine(spec: str):
+    name, _, arg = spec.partition(":")
+    kwargs = {"sample_rate": SAMPLE_RATE, "frame_duration": FRAME_DURATION}
+    if name == "webrtc" and arg:
+        kwargs["aggressiveness"] = int(arg)
+    elif name == "adaptive" and arg:
+        kwargs["margin_db"] = float(arg)
+    elif name == "energy" and arg:
+        kwargs["threshold"] = float(arg)
+    return create_vad(name, **kwargs)
+
+
+def detect(flags, min_voice_frames: int, max_silence: int):
+    """
+    Endpointer chạy lại như vòng thu âm → [(start_s gồm pre-roll, trigger_s, end_s)]
+    """
+    endpoint = Endpointer(min_voice_frames, max_silence)
+    preroll = int(PREROLL / FRAME_DURATION)
+    out = []
+    trigger = None
+
+    for i, speech in enumerate(flags):
+        event = endpoint.update(bool(speech))
+        if event == "start":
+            trigger = i
+        elif event == "end":
+            out.append(((max(0, trigger + 1 - preroll)) * FRAME_DURATION,
+                        (trigger + 1) * FRAME_DURATION,
+                        (i + 1) * FRAME_DURATION))
+            endpoint.reset()
+
+    if endpoint.triggered:
+        end = len(flags) * FRAME_DURATION
+        out.append(((max(0, trigger + 1 - preroll)) * FRAME_DURATION,
+                    (trigger + 1) * FRAME_DURATION, end))
+    return out
+
+
+def score(segments, utterances):
+    matched = []
+    used = set()
+    for s0, s1 in segments:
+        hit = next(
+            (j for j, (u0, _, u1) in enumerate(utterances)
+             if j not in used and u0 < s1 and u1 > s0),
+            None
+        )
+        if hit is None:
+            continue
+        used.add(hit)
+        u0, trig, u1 = utterances[hit]
+        matched.append({
+            "endpoint_ms": (u1 - s1) * 1000,
+            "onset_ms": (trig - s0) * 1000,
+            "clipped_ms": max(0.0, u0 - s0) * 1000,
+        })
+
+    return matched, len(segments) - len(matched), len(utterances) - len(used)
+
+
+def bench_engine(spec, dataset, min_voice_frames, max_silence):
+    try:
+        vad = parse_engine(spec)
+    except ImportError as e:
+        return {"engine": spec, "skipped": f"thiếu thư viện: {e.name}"}
+
+    matched_all = []
+    missed = false_triggers = 0
+    cpu_stream = cpu_block = 0.0
+    audio_s = 0.0
+
+    for _, audio, segments in dataset:
+        frames = frame_signal(audio, vad.frame_size)
+        audio_s += len(frames) * FRAME_DURATION
+
+        # Như live: 1 frame / lần gọi
+        vad.reset()
+        t0 = time.process_time()
+        flags = [vad.is_speech(f)[0] for f in frames]
+        cpu_stream += time.process_time() - t0
+
+        # Cả file 1 lần (vector hoá)
+        vad.reset()
+        t0 = time.process_time()
+        vad.is_speech(frames)
+        cpu_block += time.process_time() - t0
+
+        matched, miss, false = score(segments, detect(flags, min_voice_frames, max_silence))
+        matched_all.extend(matched)
+        missed += miss
+        false_triggers += false
+
+    def pct(key, q):
+        values = [m[key] for m in matched_all]
+        return round(float(np.percentile(values, q)), 1) if values else None
+
+    clipped = [m for m in matched_all if m["clipped_ms"] > ONSET_TOLERANCE * 1000]
+    total = len(matched_all) + missed
+
+    return {
+        "engine": spec,
+        "segments": total,
+        "detected": len(matched_all),
+        "missed": missed,
+        "false_triggers": false_triggers,
+        "endpoint_p50_ms": pct("endpoint_ms", 50),
+        "endpoint_p95_ms": pct("endpoint_ms", 95),
+        "onset_p50_ms": pct("onset_ms", 50),
+        "clipped_onsets": len(clipped),
+        "clipped_mean_ms": round(float(np.mean([m["clipped_ms"] for m in clipped])), 1)
+        if clipped else 0.0,
+        "cpu_ms_per_s": round(cpu_stream / max(audio_s, 1e-9) * 1000, 3),
+        "cpu_block_ms_per_s": round(cpu_block / max(audio_s, 1e-9) * 1000, 3),
+    }
+
+
+# ================= MAIN =================
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD engine benchmark")
+    parser.add_argument("--data", default=os.path.join("data", "vad_bench"),
+                        help="thư mục *.wav + *.json nhãn")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="tạo bộ test tổng hợp vào --data nếu chưa có WAV")
+    parser.add_argument("--engines", default=DEFAULT_ENGINES,
+                        help="vd: energy,webrtc:0,webrtc:3,adaptive:12")
+    parser.add_argument("--json", action="store_true", help="in kết quả JSON")
+    args = parser.parse_args()
+
+    if args.synthetic and not glob.glob(os.path.join(args.data, "*.wav")):
+        make_synthetic(args.data)
+
+    dataset = load_dataset(args.data)
+    if not dataset:
+        print(f"❌ Không có WAV có nhãn trong {args.data} (thử --synthetic)")
+        return 1
+
+    min_voice_frames = settings.VAD_MIN_VOICE_FRAMES
+    max_silence = int(settings.SILENCE_DURATION / FRAME_DURATION)
+
+    results = [
+        bench_engine(spec.strip(), dataset, min_voice_frames, max_silence)
+        for spec in args.engines.split(",") if spec.strip()
+    ]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+
+    audio_s = sum(len(a) for _, a, _ in dataset) / SAMPLE_RATE
+    print(f"📂 {len(dataset)} file, {audio_s:.1f} s audio | endpoint silence "
+          f"{settings.SILENCE_DURATION}s, min voice {min_voice_frames} frame")
+
+    cols = ["detected", "missed", "false_triggers", "endpoint_p50_ms", "endpoint_p95_ms",
+            "onset_p50_ms", "clipped_onsets", "clipped_mean_ms", "cpu_ms_per_s",
+            "cpu_block_ms_per_s"]
+    print(f"{'':20}" + "".join(f"{r['engine']:>12}" for r in results))
+    for col in cols:
+        print(f"{col:20}" + "".join(f"{str(r.get(col, '-')):>12}" for r in results))
+    for r in results:
+        if "skipped" in r:
+            print(f"⚠️ {r['engine']}: {r['skipped']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# scripts/eval_intents.py
+# Kiểm ngưỡng intent theo embedding với model thật trước khi bật lệnh điều khiển
+# - Câu mẫu: leave-one-out (centroid tính không có chính câu đó)
+# - Câu hỏi thường (kể cả câu ngắn) không được ra start / exit / thank / stop / tuition
+# → precision / recall theo từng intent + quét INTENT_CONTROL_MIN_SIMILARITY
+#
+#   python scripts/eval_intents.py
+#   python scripts/eval_intents.py --backend onnx --json
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+from src.rag.intent_classifier import CONTROL_INTENTS, INTENT_EXAMPLES  # noqa: E402
+from src.utils.text_normalizer import normalize_text  # noqa: E402
+
+
+# Câu không phải lệnh: câu hỏi ngắn dễ nhầm + câu có chữ "dừng" / "tư vấn" / "cảm ơn"
+NEGATIVES = [
+    "trường ở đâu", "có ký túc xá không", "ngành nào dễ xin việc",
+    "học bổng thế nào", "học mấy năm", "có học online không",
+    "điểm sàn là bao nhiêu", "học tiếng anh bao lâu", "ra trường làm gì",
+    "có xe buýt tới trường không", "thi đầu vào môn gì", "học kỳ bao lâu",
+    "khi nào nhập học", "ngành ai học gì", "có cơ sở đà nẵng không",
+    "dừng học giữa chừng được không", "tư vấn ngành an toàn thông tin",
+    "cảm ơn thì nói thế nào bằng tiếng anh", "bảo lưu kết quả được không",
+    "nghỉ học có được hoàn học phí không", "thôi học thì sao",
+    "kết thúc học kỳ khi nào", "bắt đầu học từ tháng mấy",
+    "bao giờ bắt đầu năm học", "thời gian kết thúc đăng ký",
+    # tuyển sinh (không phải học phí) → không được ra tuition
+    "điểm chuẩn bao nhiêu", "hồ sơ xét tuyển gồm những gì", "xét học bạ được không",
+]
+
+CONTROL_SWEEP = (0.7, 0.75, 0.8, 0.85, 0.9)
+
+
+def unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def predict(sims, labels, text, control_min, min_sim, min_margin, max_words):
+    """
+    Cùng luật với IntentClassifier.intents (control bật)
+    """
+    order = np.argsort(sims)[::-1]
+    label = labels[order[0]]
+    best = float(sims[order[0]])
+    margin = best - float(sims[order[1]])
+
+    threshold = min_sim
+    if label in CONTROL_INTENTS:
+        if len(text.split()) > max_words:
+            return None
+        threshold = control_min
+    if best < threshold or margin < min_margin:
+        return None
+    return label
+
+
+def evaluate(embedding_fn, control_min: float) -> dict:
+    labels = list(INTENT_EXAMPLES)
+    samples = [(label, normalize_text(t)) for label in labels for t in INTENT_EXAMPLES[label]]
+    negatives = [normalize_text(t) for t in NEGATIVES]
+
+    vectors = unit(np.asarray(
+        embedding_fn([t for _, t in samples] + negatives), dtype=np.float32
+    ))
+    pos_vecs, neg_vecs = vectors[:len(samples)], vectors[len(samples):]
+    sums = {label: pos_vecs[[i for i, (l, _) in enumerate(samples) if l == label]].sum(axis=0)
+            for label in labels}
+    counts = {label: len(INTENT_EXAMPLES[label]) for label in labels}
+
+    def centroids(exclude=None):
+        rows = []
+        for label in labels:
+            total, n = sums[label], counts[label]
+            if exclude is not None and exclude[0] == label:
+                total, n = total - exclude[1], n - 1
+            rows.append(total / max(n, 1))
+        return unit(np.stack(rows))
+
+    full = centroids()
+    args = (settings.INTENT_MIN_SIMILARITY, settings.INTENT_MIN_MARGIN,
+            settings.INTENT_CONTROL_MAX_WORDS)
+
+    tp = {label: 0 for label in labels}
+    fp = {label: 0 for label in labels}
+    errors = []
+
+    for (label, text), vec in zip(samples, pos_vecs):
+        pred = predict(centroids((label, vec)) @ vec, labels, text, control_min, *args)
+        if pred == label:
+            tp[label] += 1
+        elif pred is not None:
+            fp[pred] += 1
+            errors.append((text, label, pred))
+
+    for text, vec in zip(negatives, neg_vecs):
+        pred = predict(full @ vec, labels, text, control_min, *args)
+        if pred is not None:
+            fp[pred] += 1
+            errors.append((text, None, pred))
+
+    report = {}
+    for label in labels:
+        predicted = tp[label] + fp[label]
+        report[label] = {
+            "precision": round(tp[label] / predicted, 3) if predicted else None,
+            "recall": round(tp[label] / counts[label], 3),
+            "false_positives": fp[label],
+        }
+    return {"control_min_similarity": control_min, "intents": report, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precision / recall của intent theo embedding")
+    parser.add_argument("--backend", default=None, help="torch | onnx (mặc định theo settings)")
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON")
+    args = parser.parse_args()
+
+    from src.rag.model_registry import get_embedding_function
+
+    embedding_fn = get_embedding_function(backend=args.backend)
+
+    thresholds = sorted(set(CONTROL_SWEEP) | {settings.INTENT_CONTROL_MIN_SIMILARITY})
+    results = [evaluate(embedding_fn, t) for t in thresholds]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"\n{len(NEGATIVES)} câu không phải lệnh | {sum(map(len, INTENT_EXAMPLES.values()))} câu mẫu (leave-one-out)")
+    for result in results:
+        mark = " ← settings" if result["control_min_similarity"] == settings.INTENT_CONTROL_MIN_SIMILARITY else ""
+        print(f"\nINTENT_CONTROL_MIN_SIMILARITY = {result['control_min_similarity']}{mark}")
+        for label, row in result["intents"].items():
+            precision = "-" if row["precision"] is None else f"{row['precision']:.3f}"
+            print(f"  {label:<10} precision {precision:>6} | recall {row['recall']:.3f} "
+                  f"| FP {row['false_positives']}")
+        for text, label, pred in result["errors"]:
+            print(f"    ✗ \"{text}\" ({label or 'không phải lệnh'}) → {pred}")
+
+    print("\nChỉ bật INTENT_EMBEDDING_CONTROL khi mọi intent điều khiển có precision = 1.0")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,55 @@
-# index vector DB
\ No newline at end of file
+# scripts/index_data.py
+# Index / re-index vector DB (incremental theo manifest)
+#
+#   python scripts/index_data.py                  # chỉ document mới / đã sửa
+#   python scripts/index_data.py --full           # chunk lại toàn bộ
+#   python scripts/index_data.py --prune          # xoá chunk mồ côi từ index cũ
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.model_registry import memory_report  # noqa: E402
+from src.rag.rag_system import CRAWLED_DATA_FILE, RAGSystem  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index crawl data vào ChromaDB")
+    parser.add_argument("--data", default=CRAWLED_DATA_FILE,
+                        help="file JSON crawl (mặc định: %(default)s)")
+    parser.add_argument("--full", action="store_true",
+                        help="bỏ qua manifest, chunk lại mọi document")
+    parser.add_argument("--prune", action="store_true",
+                        help="xoá chunk không thuộc document nào trong manifest")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="số process chunking")
+    parser.add_argument("--embed-batch", type=int, default=None,
+                        help="số chunk mỗi lần encode")
+    parser.add_argument("--json", action="store_true",
+                        help="in thống kê dạng JSON")
+    args = parser.parse_args()
+
+    rag = RAGSystem()
+    stats = rag.index_documents(
+        data_file=args.data,
+        full=args.full,
+        prune=args.prune,
+        workers=args.workers,
+        embed_batch=args.embed_batch,
+    )
+
+    if stats is None:
+        return 1
+
+    if args.json:
+        stats = dict(stats, memory=memory_report())
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+    return 0 if not stats["write_errors"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# scripts/replay_bench.py
+# Replay WAV qua đúng đường VoiceService (VAD + ASR) → RetrievalService.retrieve
+# → LLMService → TTS, không cần mic / loa; đo latency từng stage + end-to-end
+#
+# Nhãn (tuỳ chọn): foo.wav + foo.json = {"text": "câu hỏi", "segments": [[s, e], ...]}
+# → "text" là transcript fake ASR trả về, segment cuối = lúc user nói xong
+#
+#   python scripts/replay_bench.py --data data/replay                  # tất cả fake
+#   python scripts/replay_bench.py --data data/replay --server         # fake qua HTTP thật
+#   python scripts/replay_bench.py --retrieval real --llm openai --out build.json
+#   python scripts/replay_bench.py --asr-latency lognormal:300:900 --rounds 5
+#   python scripts/replay_bench.py --llm fake-router --gemini-ttft lognormal:300:2000
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+from src.utils.text_normalizer import normalize_text  # noqa: E402
+from src.utils.tracing import tracer  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+FRAME_DURATION = 0.03            # giống VoiceService
+DEFAULT_QUERY = "học phí ngành công nghệ thông tin bao nhiêu"
+LEAD_IN = 0.3                    # silence trước mỗi clip → VAD đã nghe trước khi user nói
+
+STAGES = ["vad_endpoint", "asr", "retrieval", "llm_first_sentence", "llm_total",
+          "tts_first", "e2e_first_audio"]
+
+
+# ================= DATA =================
+
+def load_dataset(data_dir: str):
+    from src.utils.audio_utils import decode_audio
+
+    items = []
+    for wav in sorted(glob.glob(os.path.join(data_dir, "*.wav"))):
+        with open(wav, "rb") as f:
+            audio, fs = decode_audio(f.read())
+        if fs != SAMPLE_RATE:
+            n = int(len(audio) * SAMPLE_RATE / fs)
+            audio = np.interp(
+                np.linspace(0, len(audio), n, endpoint=False),
+                np.arange(len(audio)),
+                audio
+            ).astype(np.float32)
+
+        label = {}
+        label_file = os.path.splitext(wav)[0] + ".json"
+        if os.path.exists(label_file):
+            with open(label_file, "r", encoding="utf-8") as f:
+                label = json.load(f)
+
+        segments = label.get("segments") or [[0.0, len(audio) / SAMPLE_RATE]]
+        items.append({
+            "name": os.path.basename(wav),
+            "audio": audio,
+            "text": label.get("text") or DEFAULT_QUERY,
+            "speech_end": float(segments[-1][1]),
+        })
+    return items
+
+
+def summarize(values):
+    if not values:
+        return {"n": 0}
+    arr = np.array(values) * 1000
+    return {
+        "n": len(values),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p95": round(float(np.percentile(arr, 95)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+        "mean": round(float(arr.mean()), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ================= BUILD =================
+
+def build(args):
+    from src.services.fakes import (
+        FakeGeminiServer,
+        FakeOpenAIClient,
+        FakeOpenAIServer,
+        FakeRetrieval,
+        FakeTTS,
+        NullOutput,
+        ReplayInput,
+    )
+    from src.services.voice_service import VoiceService
+
+    fake = FakeOpenAIClient(
+        asr_latency=args.asr_latency,
+        llm_ttft=args.llm_ttft,
+        llm_token=args.llm_token,
+        seed=args.seed,
+    )
+    server = None
+    client = fake
+    if args.server:
+        from openai import OpenAI
+
+        server = FakeOpenAIServer(fake).start()
+        client = OpenAI(api_key="replay", base_url=server.base_url)
+
+    # ---- ASR ----
+    if args.asr == "fake":
+        from src.services.asr_backends import OpenAIASRBackend
+        asr = OpenAIASRBackend(client=client)
+    else:
+        from src.services.asr_backends import create_asr_backend
+        asr = create_asr_backend(args.asr)
+
+    # ---- TTS ----
+    tts = FakeTTS(args.tts_latency, seed=args.seed) if args.tts == "fake" else None
+
+    mic = ReplayInput(SAMPLE_RATE, int(SAMPLE_RATE * FRAME_DURATION), speed=args.speed)
+    voice = VoiceService(asr_backend=asr, tts=tts, mic=mic, output_factory=NullOutput)
+    voice.tts_cache = None       # đo TTS thật sự, không ghi cache ra đĩa
+
+    # ---- RETRIEVAL ----
+    if args.retrieval == "fake":
+        retrieval = FakeRetrieval(args.retrieval_latency, seed=args.seed)
+    else:
+        from src.services.retrieval_service import RetrievalService
+        retrieval = RetrievalService()
+        retrieval.retrieve("học phí", top_k=1)
+
+    # ---- LLM ----
+    from src.services.llm_providers import GeminiProvider, OpenAIProvider
+    from src.services.llm_service import LLMService
+
+    servers = [server] if server is not None else []
+    if args.llm == "fake":
+        llm = LLMService(client=client)
+    elif args.llm == "fake-router":
+        # Gemini giả luôn chạy qua HTTP (SDK google-genai không inject client được)
+        gemini_fake = FakeOpenAIClient(
+            llm_ttft=args.gemini_ttft,
+            llm_token=args.llm_token,
+            seed=None if args.seed is None else args.seed + 10,
+        )
+        gemini_server = FakeGeminiServer(gemini_fake).start()
+        servers.append(gemini_server)
+        llm = LLMService(providers=[
+            OpenAIProvider(client=client),
+            GeminiProvider(api_key="replay", base_url=gemini_server.base_url),
+        ])
+    elif args.llm == "openai":
+        llm = LLMService(providers=[OpenAIProvider()])
+    else:
+        llm = LLMService()           # router: LLM_PROVIDERS thật
+
+    return voice, mic, fake, retrieval, llm, servers
+
+
+# ================= TURN =================
+
+def run_turn(voice, mic, fake, retrieval, llm, item, clip_id, streaming):
+    timings = {}
+
+    fake.set_transcript(item["text"])
+    asr_stream = voice.start_transcription()
+    lead_in = np.zeros(int(LEAD_IN * SAMPLE_RATE), dtype=np.float32)
+    mic.play(clip_id, np.concatenate([lead_in, item["audio"]]))
+
+    audio = voice.record_audio_with_vad(asr_stream)
+    t_endpoint = time.perf_counter()
+    if audio is None:
+        asr_stream.cancel()
+        return None
+
+    _, t_clip = mic.clip_start(clip_id)
+    t_speech_end = t_clip + (LEAD_IN + item["speech_end"]) / mic.speed
+    timings["vad_endpoint"] = t_endpoint - t_speech_end
+    # span trong lượt (asr, llm.ttft, tts...) → trace JSONL như khi chạy thật
+    tracer.start_turn(time.monotonic() - timings["vad_endpoint"])
+
+    t0 = time.perf_counter()
+    text = voice.finish_transcription(asr_stream)
+    timings["asr"] = time.perf_counter() - t0
+    if not text:
+        return None
+    query = normalize_text(text)
+
+    t0 = time.perf_counter()
+    retrieved = retrieval.retrieve(query=query, top_k=settings.CONTEXT_TOP_K)
+    timings["retrieval"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if streaming:
+        sentences = llm.generate_answer_stream(query=query, retrieved_docs=retrieved)
+        first = next(sentences, "")
+        timings["llm_first_sentence"] = time.perf_counter() - t0
+    else:
+        answer = llm.generate_answer(query=query, retrieved_docs=retrieved)
+        timings["llm_first_sentence"] = timings["llm_total"] = time.perf_counter() - t0
+        first = answer.split(". ")[0]
+
+    t1 = time.perf_counter()
+    data, fs = voice.synthesize(first)
+    timings["tts_first"] = time.perf_counter() - t1
+
+    output = voice.open_output(fs)
+    output.first_write = None
+    tracer.since_turn("playback.start")
+    voice.begin_playback()
+    voice.write_output(output, data)
+    voice.end_playback()
+    timings["e2e_first_audio"] = output.first_write - t_speech_end
+
+    if streaming:
+        for _ in sentences:
+            pass
+        timings["llm_total"] = time.perf_counter() - t0
+
+    return timings
+
+
+# ================= MAIN =================
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay latency benchmark")
+    parser.add_argument("--data", default=os.path.join("data", "replay"),
+                        help="thư mục *.wav (+ *.json nhãn)")
+    parser.add_argument("--rounds", type=int, default=3, help="số lần replay cả bộ")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="tốc độ đẩy audio so với thời gian thực")
+    parser.add_argument("--asr", choices=["fake", "local", "openai"], default="fake")
+    parser.add_argument("--llm", choices=["fake", "fake-router", "openai", "router"],
+                        default="fake",
+                        help="fake-router: fake OpenAI + fake Gemini sau LLM router")
+    parser.add_argument("--tts", choices=["fake", "edge"], default="fake")
+    parser.add_argument("--retrieval", choices=["fake", "real"], default="fake")
+    parser.add_argument("--server", action="store_true",
+                        help="fake OpenAI chạy như server HTTP local (qua SDK thật)")
+    parser.add_argument("--asr-latency", default="lognormal:350:900")
+    parser.add_argument("--llm-ttft", default="lognormal:450:1200")
+    parser.add_argument("--llm-token", default="const:12")
+    parser.add_argument("--gemini-ttft", default="lognormal:350:1500",
+                        help="TTFT của fake Gemini (--llm fake-router)")
+    parser.add_argument("--tts-latency", default="lognormal:300:700")
+    parser.add_argument("--retrieval-latency", default="const:25")
+    parser.add_argument("--no-stream", action="store_true", help="LLM không streaming")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="ghi JSON kết quả ra file")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.data)
+    if not dataset:
+        print(f"❌ Không có WAV trong {args.data}")
+        return 1
+
+    voice, mic, fake, retrieval, llm, servers = build(args)
+    streaming = settings.LLM_STREAMING and not args.no_stream
+
+    samples = {stage: [] for stage in STAGES}
+    failed = 0
+    try:
+        for r in range(args.rounds):
+            for item in dataset:
+                timings = run_turn(
+                    voice, mic, fake, retrieval, llm, item,
+                    f"{item['name']}#{r}", streaming
+                )
+                if timings is None:
+                    failed += 1
+                    continue
+                for stage, value in timings.items():
+                    samples[stage].append(value)
+    finally:
+        voice.close()
+        tracer.shutdown()
+        for server in servers:
+            server.stop()
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "config": {
+            k: getattr(args, k) for k in (
+                "rounds", "speed", "asr", "llm", "tts", "retrieval", "server",
+                "asr_latency", "llm_ttft", "llm_token", "gemini_ttft", "tts_latency",
+                "retrieval_latency", "seed",
+            )
+        },
+        "streaming": streaming,
+        "vad_engine": settings.VAD_ENGINE,
+        "turns": len(samples["e2e_first_audio"]),
+        "failed": failed,
+        "stages_ms": {stage: summarize(values) for stage, values in samples.items()},
+        "audio": voice.audio_stats(),
+        "spans_ms": tracer.histograms(),
+        "llm_router": llm.router.stats(),
+    }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    return 0 if result["turns"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# scripts/trace_summary.py
+# Tóm tắt trace JSONL (settings.TRACE_FILE): percentile theo span + lượt chậm nhất
+#
+#   python scripts/trace_summary.py
+#   python scripts/trace_summary.py --last 50 --slowest 5
+#   python scripts/trace_summary.py --since 3600 --prefix retrieval --json
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+
+
+# Thứ tự hiển thị theo pipeline; span khác xếp sau theo tên
+STAGE_ORDER = [
+    "vad.endpoint", "asr", "embedding", "cache.lookup", "retrieval",
+    "retrieval.chroma", "retrieval.bm25", "retrieval.rerank", "context.pack", "llm.ttft",
+    "llm.first_sentence", "llm.generate", "llm.total", "tts.synthesize",
+    "tts.cache_hit", "playback.start", "interrupt.detect", "interrupt.halt",
+]
+
+
+def load_records(path: str, since: float = None, prefix: str = None):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue             # dòng ghi dở khi process bị kill
+            if since is not None and r.get("start", 0) < since:
+                continue
+            if prefix and not r["name"].startswith(prefix):
+                continue
+            records.append(r)
+    return records
+
+
+def keep_last_turns(records, n: int):
+    turns = sorted({r["turn"] for r in records if r.get("turn") is not None})
+    keep = set(turns[-n:])
+    return [r for r in records if r.get("turn") in keep]
+
+
+def percentiles(values):
+    arr = np.array(values)
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p95": round(float(np.percentile(arr, 95)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+        "mean": round(float(arr.mean()), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+def summarize(records):
+    by_name = defaultdict(list)
+    for r in records:
+        by_name[r["name"]].append(r["ms"])
+
+    def order(name):
+        return (STAGE_ORDER.index(name) if name in STAGE_ORDER else len(STAGE_ORDER), name)
+
+    return {name: percentiles(by_name[name]) for name in sorted(by_name, key=order)}
+
+
+def slowest_turns(records, k: int, key: str = "playback.start"):
+    """
+    k lượt có key (mặc định speech end → audio đầu tiên) lớn nhất + breakdown
+    """
+    turns = defaultdict(dict)
+    for r in records:
+        if r.get("turn") is not None:
+            # span lặp trong 1 lượt (nhiều câu TTS) → cộng dồn
+            turns[r["turn"]][r["name"]] = turns[r["turn"]].get(r["name"], 0.0) + r["ms"]
+
+    ranked = sorted(
+        (t for t in turns.items() if key in t[1]),
+        key=lambda t: t[1][key],
+        reverse=True
+    )
+    return [{"turn": turn, **{n: round(ms, 1) for n, ms in spans.items()}}
+            for turn, spans in ranked[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace latency summary")
+    parser.add_argument("--file", default=settings.TRACE_FILE)
+    parser.add_argument("--last", type=int, help="chỉ N lượt gần nhất")
+    parser.add_argument("--since", type=float, help="chỉ span trong N giây gần đây")
+    parser.add_argument("--prefix", help="lọc theo tên span, vd: retrieval")
+    parser.add_argument("--slowest", type=int, default=3,
+                        help="in breakdown K lượt chậm nhất (0 = tắt)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ Chưa có trace: {args.file} (TRACE_EXPORT=jsonl)")
+        return 1
+
+    since = time.time() - args.since if args.since else None
+    records = load_records(args.file, since, args.prefix)
+    if args.last:
+        records = keep_last_turns(records, args.last)
+    if not records:
+        print("❌ Không có span nào khớp bộ lọc")
+        return 1
+
+    summary = summarize(records)
+    slow = slowest_turns(records, args.slowest) if args.slowest else []
+    turns = len({r["turn"] for r in records if r.get("turn") is not None})
+
+    if args.json:
+        print(json.dumps({"turns": turns, "spans": summary, "slowest": slow},
+                         ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"📊 {len(records)} span / {turns} lượt – {args.file}")
+    print(f"{'span':<22}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}{'max':>10}")
+    for name, s in summary.items():
+        print(f"{name:<22}{s['count']:>7}{s['p50']:>9}{s['p95']:>9}{s['p99']:>9}"
+              f"{s['mean']:>9}{s['max']:>10}")
+
+    if slow:
+        print("\n🐢 Lượt chậm nhất (ms, theo playback.start):")
+        for t in slow:
+            parts = ", ".join(f"{k}={v}" for k, v in t.items() if k != "turn")
+            print(f"  #{t['turn']}: {parts}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,10 +17,64 @@ class Settings:
     # Gemini
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
 
     # OpenAI LLM
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_LLM_MODEL = os.getenv("OPENAI_LLM_MODEL", "gpt-4o-mini")
+    # Trỏ sang server OpenAI-compatible khác (vd: stand-in local khi replay)
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+    # Router: LLM_PROVIDER ưu tiên trước, provider thiếu API key tự bỏ qua
+    LLM_PROVIDERS = [
+        p.strip() for p in os.getenv(
+            "LLM_PROVIDERS",
+            ",".join(dict.fromkeys([LLM_PROVIDER, "openai", "gemini"]))
+        ).split(",") if p.strip()
+    ]
+    LLM_ROUTER_WINDOW = 50           # số request gần nhất để tính p50 / tỉ lệ lỗi
+    LLM_ROUTER_ERROR_TTL = 60.0      # s – lỗi cũ hơn không còn tính vào tỉ lệ lỗi
+    LLM_ROUTER_ERROR_PENALTY = 2.0   # score = p50 × (1 + penalty × tỉ lệ lỗi)
+    LLM_ROUTER_FAILURES = 3          # lỗi liên tiếp → cho provider nghỉ
+    LLM_ROUTER_COOLDOWN = 30.0       # s
+    # Race: 2 provider nhanh nhất cùng chạy, lấy bên có token đầu trước
+    LLM_RACE_ENABLED = os.getenv("LLM_RACE", "false").lower() == "true"
+    LLM_RACE_AFTER = 0.0             # s chờ provider 1 trước khi gọi provider 2
+
+    # Streaming: LLM sinh câu nào → TTS phát câu đó
+    LLM_STREAMING = True
+
+    # Extractive fast path: tra cứu rõ ràng (học phí) → trích câu, bỏ qua LLM
+    EXTRACTIVE_ENABLED = True
+    EXTRACTIVE_MIN_SCORE = 0.9       # score rerank của chunk đầu (đã gồm boost intent)
+    EXTRACTIVE_MIN_MARGIN = 0.1      # cách chunk thứ 2 tối thiểu
+    EXTRACTIVE_MIN_OVERLAP = 0.5     # tỉ lệ từ nội dung câu hỏi có trong câu trích
+    EXTRACTIVE_MAX_SENTENCES = 2
+
+    # Context RAG: điền theo score tới hết budget, bỏ overlap giữa các chunk
+    CONTEXT_TOP_K = 5                # candidate lấy từ retrieval cho packer
+    CONTEXT_TOKEN_BUDGET = 600       # token context tối đa trong prompt
+    CONTEXT_MIN_OVERLAP = 40         # ký tự trùng tối thiểu để coi là overlap
+    CONTEXT_MIN_BLOCK_TOKENS = 40    # budget còn ít hơn → không cắt thêm doc
+
+    # ================= HTTP (pool chung cho provider) =================
+    HTTP_MAX_CONNECTIONS = 8
+    HTTP_KEEPALIVE_EXPIRY = 60.0     # s giữ connection rảnh trong pool
+    HTTP_CONNECT_TIMEOUT = 3.0
+    HTTP_READ_TIMEOUT = 15.0
+    HTTP_PREWARM = True              # mở sẵn TLS khi VAD bắt đầu câu
+    HTTP_RETRY_BACKOFF = 0.2         # s, nhân đôi mỗi lần retry (+ jitter)
+
+    # Deadline theo stage (s)
+    ASR_DEADLINE = 8.0
+    LLM_DEADLINE = 12.0              # non-streaming: cả câu trả lời
+    LLM_STREAM_READ_TIMEOUT = 5.0    # streaming: chờ tối đa giữa 2 chunk
+    TTS_DEADLINE = 8.0
+
+    # Hedged request: request đầu chậm hơn p95 → gửi thêm 1 bản, lấy bản xong trước
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE", "false").lower() == "true"
+    LLM_HEDGE_AFTER = 2.0            # s, dùng khi chưa đủ mẫu để tính p95
+    LLM_HEDGE_MIN_SAMPLES = 20
 
     # ================= AUDIO =================
     SAMPLE_RATE = 16000
@@ -28,22 +82,47 @@ class Settings:
     # ⬅️ Buffer lớn để tránh ALSA underrun (Jetson)
     BLOCK_SIZE = 4096
 
+    # Audio I/O dài hạn (PortAudio callback + ring buffer cấp phát sẵn)
+    AUDIO_RING_SECONDS = 60      # mic ring: utterance trả về là view trong ring
+    OUTPUT_BLOCK_SIZE = 512      # sample / callback loa
+    OUTPUT_BUFFER_SECONDS = 0.5  # PCM chờ phát tối đa → giới hạn trễ khi flush
+
+    # VAD: energy (RMS + ZCR) | webrtc | adaptive (noise floor tự thích nghi)
+    VAD_ENGINE = os.getenv("VAD_ENGINE", "energy")
+    VAD_MIN_VOICE_FRAMES = 6     # frame 30 ms có tiếng → bắt đầu câu
+    VAD_ZCR_MIN = 0.02           # energy: zero-crossing rate tối thiểu
+    VAD_AGGRESSIVENESS = 2       # webrtc: 0 (nhạy) → 3 (lọc noise mạnh)
+    VAD_NOISE_MARGIN_DB = 9.0    # adaptive: cao hơn noise floor bao nhiêu dB
+
     # Energy-based VAD
     SILENCE_THRESHOLD = 0.012
     SILENCE_DURATION = 0.6       # seconds
     MAX_RECORD_TIME = 15         # seconds
 
-    INPUT_AUDIO_FILE = "assets/input.wav"
-    OUTPUT_AUDIO_FILE = "assets/output.wav"
+    # Barge-in: mic mở cả lúc loa phát, nói "dừng" để ngắt ngay
+    BARGE_IN_ENABLED = True
+    BARGE_IN_SILENCE = 0.2       # endpoint ngắn cho câu chen ngang, chỉ trong BARGE_IN_MAX_SECONDS đầu (s)
+    BARGE_IN_MAX_SECONDS = 1.5   # dài hơn → là câu hỏi, không phải stop word
+    BARGE_IN_DUCK_GAIN = 0.3     # giảm âm lượng loa khi user bắt đầu nói chen
+    STOP_WORD_MODEL = "tiny"     # chỉ load khi ASR_PROVIDER=openai
+    ECHO_MAX_DELAY = 0.3         # độ trễ loa → mic tối đa (s)
+    ECHO_MARGIN = 2.0            # mic > margin * echo ước lượng → là giọng user
 
     # ================= MICROPHONE =================
     MIC_DEVICE_INDEX = None      # Auto-detect
 
     # ================= ASR =================
     # ---- Local Whisper / Faster-Whisper ----
-    ASR_MODEL = "base"           # base is safe, small dễ OOM
-    ASR_DEVICE = "cuda"
-    ASR_COMPUTE_TYPE = "float16"
+    ASR_MODEL = os.getenv("ASR_MODEL", "base")  # base is safe, small dễ OOM
+    ASR_DEVICE = os.getenv("ASR_DEVICE", "cpu")  # CPU để nhường CUDA
+    ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "int8")
+    ASR_CPU_THREADS = 4
+
+    # Streaming ASR: decode dần trong lúc user còn nói
+    ASR_PARTIAL_INTERVAL = 0.6   # seconds giữa 2 lần decode partial
+    ASR_COMMIT_MARGIN = 0.8      # segment kết thúc trước mép audio ít nhất (s) + ổn định 2 lần → chốt
+    ASR_COMMIT_TOLERANCE = 0.2   # lệch end time tối đa giữa 2 lần decode vẫn coi là ổn định (s)
+    ASR_SHOW_PARTIAL = True
 
     WHISPER_VAD = True
     WHISPER_VAD_MIN_SILENCE_MS = 500
@@ -53,19 +132,91 @@ class Settings:
 
     # ================= TTS =================
     TTS_VOICE = "vi-VN-HoaiMyNeural"
+    TTS_RATE = "+0%"
 
     # ================= RETRIEVAL / RAG =================
     VECTOR_DB_DIR = "vector_db"
+    EMBEDDING_MODEL = os.getenv(
+        "EMBEDDING_MODEL",
+        "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    )
+    EMBEDDING_DEVICE = "cpu"     # ❗ CPU only – không đụng CUDA (Jetson)
+
+    # torch: sentence-transformers | onnx: int8 quantized, onnxruntime
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    ONNX_MODEL_DIR = os.path.join("models", "onnx")
+    ONNX_QUANTIZE = True
+    ONNX_INTRA_OP_THREADS = 4    # Jetson Orin Nano: 6 core, chừa cho ASR / audio
+    ONNX_BATCH_SIZE = 32
+    EMBEDDING_MAX_LENGTH = 128   # = max_seq_length của MiniLM
     COLLECTION_NAME = "fpt_university"
     RETRIEVAL_SCORE_THRESHOLD = 0.15
 
+    # Hybrid search: BM25 (lexical) + vector, trộn bằng reciprocal-rank fusion
+    HYBRID_SEARCH = True
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    RRF_K = 60
+    RRF_WEIGHT = 0.10            # boost tối đa cho doc đứng đầu sau fusion
+
+    # Intent theo embedding (nearest centroid), dùng lại vector query của retrieval
+    INTENT_EMBEDDING_ENABLED = True
+    INTENT_MIN_SIMILARITY = 0.6          # cosine tới centroid (tuition)
+    INTENT_CONTROL_MIN_SIMILARITY = 0.8  # lệnh start / exit / thank / stop
+    INTENT_MIN_MARGIN = 0.05             # cách nhãn thứ 2
+    INTENT_CONTROL_MAX_WORDS = 5         # câu dài hơn → không coi là lệnh
+    # Lệnh start / exit / thank / stop từ embedding: TẮT cho tới khi
+    # scripts/eval_intents.py báo precision đủ cao với model đang dùng
+    # (nhầm "thoát" = cắt ngang phiên tư vấn) → mặc định chỉ theo keyword
+    INTENT_EMBEDDING_CONTROL = False
+
+    # Indexing pipeline
+    INDEX_WORKERS = max(1, (os.cpu_count() or 2) - 1)   # process pool chunking
+    INDEX_DOC_BATCH = 16         # documents / task gửi sang worker
+    INDEX_EMBED_BATCH = 256      # chunks / lần encode (CPU)
+    INDEX_WRITE_QUEUE = 2        # batch chờ ghi Chroma
+
+    # ================= CACHE =================
+    CACHE_DIR = "cache"
+
+    # Semantic answer cache (hit → bỏ qua retrieval + LLM)
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_FILE = os.path.join(CACHE_DIR, "answer_cache.npz")
+    ANSWER_CACHE_THRESHOLD = 0.95    # cosine giữa 2 câu hỏi
+    ANSWER_CACHE_TTL = 24 * 3600     # seconds
+    ANSWER_CACHE_MAX_ENTRIES = 512
+    ANSWER_CACHE_MAX_BYTES = 4 * 1024 * 1024
+    ANSWER_CACHE_SAVE_INTERVAL = 30  # seconds giữa 2 lần ghi đĩa
+
+    # Embedding của query (text đã normalize → vector float16, memory-map, LRU)
+    EMBEDDING_CACHE_ENABLED = True
+    # tên gốc; file thật thêm model + backend: query_embeddings.<model>.<backend>.f16
+    EMBEDDING_CACHE_FILE = os.path.join(CACHE_DIR, "query_embeddings.f16")
+    EMBEDDING_CACHE_MAX_ENTRIES = 4096   # ~3 MB với MiniLM 384 dim
+    EMBEDDING_CACHE_MAX_BATCH = 4        # batch lớn hơn (index) → không cache
+
+    # TTS phrase cache (PCM đã decode, phát ngay không cần Edge-TTS)
+    TTS_CACHE_ENABLED = True
+    TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+    TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
     # ================= VOICE UX =================
     MAX_VOICE_CHARS = 600
     MAX_VOICE_SENTENCES = 5
 
+    # Asyncio pipeline: capture → ASR → retrieval → LLM → TTS → playback
+    PIPELINE_QUEUE_SIZE = 4      # utterance / transcript / câu chờ TTS
+    PIPELINE_AUDIO_QUEUE = 2     # câu đã synthesize chờ phát
+
     # ================= DEMO / DEBUG =================
     DEMO_MODE = False
     LOG_LATENCY = True
 
+    # Tracing: span theo stage cho từng lượt + histogram trong process
+    TRACE_ENABLED = True
+    TRACE_EXPORT = os.getenv("TRACE_EXPORT", "jsonl")   # none | jsonl | otel
+    TRACE_FILE = os.path.join("logs", "traces.jsonl")
+    TRACE_SERVICE_NAME = "voice-rag-chatbot"
+
 
 settings = Settings()
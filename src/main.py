@@ -2,17 +2,26 @@
 # Voice Chatbot – FINAL VERSION (Jetson SAFE)
 # OpenAI ASR + Gemini LLM
 
+import argparse
+import asyncio
 import os
-import time
+import threading
 
 # 🔒 SAFE FOR JETSON / CPU MODE
 os.environ["ORT_DISABLE_GPU"] = "1"
 os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 
-from src.services.voice_service import VoiceService
-from src.services.retrieval_service import RetrievalService
-from src.services.llm_service import LLMService
+# ⚡ Cold start: torch / chromadb / openai / edge_tts import lazy
+# (trong thread warm-up) → IDLE loop nghe được ngay
+from src.config.settings import settings
+from src.services import http_pool
+from src.rag.rerank_features import TUITION_KEYWORDS
+from src.services.barge_in import STOP_WORDS
+from src.services.voice_pipeline import VoicePipeline
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.startup import StartupProfiler, Warmup
 from src.utils.text_normalizer import normalize_text
+from src.utils.tracing import tracer
 
 
 # -------- STATE --------
@@ -42,8 +51,25 @@ THANK_KEYWORDS = [
 ]
 
 
-def contains_any(text: str, keywords: list) -> bool:
-    return any(k in text for k in keywords)
+# -------- FIXED PROMPTS (pre-render TTS) --------
+PROMPT_START = "Mình rất vui được hỗ trợ bạn. Mời bạn đặt câu hỏi."
+PROMPT_GOODBYE = "Tạm biệt bạn. Hẹn gặp lại."
+PROMPT_STOPPED = "Mình đã dừng. Bạn có thể hỏi câu khác."
+PROMPT_THANKS = (
+    "Mình rất vui vì đã được hỗ trợ bạn. Khi cần tư vấn tiếp, hãy nói bắt đầu tư vấn nhé."
+)
+PROMPT_LLM_ERROR = "Mình chưa trả lời được ngay lúc này."
+
+
+# Mọi bảng keyword (điều khiển + tuition) → 1 matcher, quét transcript 1 lượt / turn
+# Kết quả truyền xuống retrieval + extractive → không quét lại
+INTENT_MATCHER = KeywordMatcher({
+    "start": START_KEYWORDS,
+    "exit": EXIT_KEYWORDS,
+    "thank": THANK_KEYWORDS,
+    "stop": STOP_WORDS,
+    "tuition": TUITION_KEYWORDS,
+})
 
 
 def is_noise(text: str) -> bool:
@@ -53,90 +79,256 @@ def is_noise(text: str) -> bool:
     return len(text) < 3 or text in ["ừ", "ừm", "à", "ờ", "uh", "um"]
 
 
-def run_voice_chat():
+# -------- WARM-UP (background) --------
+def load_retrieval():
+    from src.services.retrieval_service import RetrievalService
+
+    retrieval = RetrievalService()
+    # encode + query 1 lần → weight, HNSW index, BM25 nằm sẵn trong RAM
+    retrieval.retrieve("học phí", top_k=1)
+    return retrieval
+
+
+def load_llm():
+    from src.services.llm_service import LLMService
+
+    llm = LLMService()
+    # TLS tới API mở sẵn trong pool trước câu hỏi đầu tiên
+    http_pool.prewarm(background=False)
+    return llm
+
+
+def load_answer_cache():
+    from src.services.answer_cache import AnswerCache
+
+    return AnswerCache()
+
+
+def start_warmup(profiler):
+    warmup = Warmup(profiler)
+    warmup.submit("retrieval (embedding + chroma)", load_retrieval)
+    warmup.submit("llm client", load_llm)
+    if settings.ANSWER_CACHE_ENABLED:
+        warmup.submit("answer cache", load_answer_cache)
+    return warmup
+
+
+def wait_ready(warmup):
+    """
+    Readiness barrier trước query ACTIVE đầu tiên
+    """
+    if not warmup.ready("retrieval (embedding + chroma)") or not warmup.ready("llm client"):
+        print("⏳ Đang tải mô hình, chờ chút...")
+
+    retrieval = warmup.wait("retrieval (embedding + chroma)")
+    llm = warmup.wait("llm client")
+    answer_cache = (
+        warmup.wait("answer cache") if settings.ANSWER_CACHE_ENABLED else None
+    )
+    return retrieval, llm, answer_cache
+
+
+async def embed_turn(retrieval, text: str):
+    """
+    Embed transcript đúng 1 lần / lượt → intent (centroid) + answer cache + Chroma
+    """
+    vec = await asyncio.to_thread(retrieval.embed_query, text)
+    return vec, retrieval.classify_intent(vec, text)
+
+
+def report_startup(profiler, warmup):
+    def worker():
+        try:
+            warmup.wait_all()
+        except Exception as e:
+            print(f"⚠️ Warm-up error: {e}")
+        profiler.mark("warm-up xong (ready)")
+        profiler.uninstall()
+        print(profiler.report())
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def run_voice_chat(profiler=None):
+    profiler = profiler or StartupProfiler()
+
     print("🎙️ FPT AI Voice Chatbot (Jetson – FINAL)")
     print("👉 Nói: 'bắt đầu tư vấn' để bắt đầu")
     print("👉 Nói: 'dừng' để ngắt trả lời")
     print("👉 Nói: 'kết thúc', 'thoát' hoặc 'cảm ơn' để nghỉ\n")
 
-    voice = VoiceService()
-    retrieval = RetrievalService()
-    llm = LLMService()
+    # Model nặng load song song trong lúc mic + ASR khởi động
+    warmup = start_warmup(profiler)
 
-    state = IDLE
+    from src.services.voice_service import VoiceService
 
-    while True:
-        # ================= IDLE MODE =================
-        if state == IDLE:
-            user_text = voice.listen()
-            if not user_text:
-                continue
+    voice = profiler.step("voice (mic + ASR)", VoiceService)
+    # VAD bắt đầu câu → mở sẵn connection, handshake chồng lên lúc user nói
+    voice.on_speech_start = http_pool.prewarm
+
+    voice.prerender([
+        PROMPT_START,
+        PROMPT_GOODBYE,
+        PROMPT_STOPPED,
+        PROMPT_THANKS,
+        PROMPT_LLM_ERROR,
+    ])
+    warmup.after(
+        "prerender fallback", ["llm client"],
+        lambda llm: voice.prerender([llm.FALLBACK_ANSWER], background=False)
+    )
+
+    if profiler.enabled:
+        report_startup(profiler, warmup)
+
+    profiler.mark("IDLE loop (nghe được)")
+    asyncio.run(run_controller(voice, warmup))
 
+
+async def run_controller(voice, warmup):
+    """
+    IDLE / ACTIVE state machine trên pipeline asyncio
+    - Mic + ASR chạy liên tục, câu hỏi mới / "dừng" huỷ câu trả lời đang phát
+    - Không sleep cố định: reply chạy nền, controller nghe tiếp ngay
+    """
+    pipeline = VoicePipeline(voice)
+    await pipeline.start()
+
+    retrieval = llm = answer_cache = extractive = None
+    state = IDLE
+
+    try:
+        while True:
+            user_text = await pipeline.next_transcript()
             normalized = normalize_text(user_text)
-            print(f"👂 (idle) Nghe: {normalized}")
+            intents = INTENT_MATCHER.groups(normalized)
+
+            # ---- INTENT THEO EMBEDDING (model đã load xong, không chờ) ----
+            # IDLE chỉ cần lệnh điều khiển → embed khi classifier được phép ra lệnh
+            query_vec = None
+            if retrieval is None and warmup.ready("retrieval (embedding + chroma)"):
+                retrieval = warmup.wait("retrieval (embedding + chroma)")
+            if (
+                retrieval is not None
+                and not is_noise(normalized)
+                and (state == ACTIVE or settings.INTENT_EMBEDDING_CONTROL)
+            ):
+                query_vec, found = await embed_turn(retrieval, normalized)
+                if found - intents:
+                    print(f"🧭 Intent (embedding): {sorted(found - intents)}")
+                intents |= found
+
+            # ================= IDLE MODE =================
+            if state == IDLE:
+                print(f"👂 (idle) Nghe: {normalized}")
+
+                if "start" in intents:
+                    state = ACTIVE
+                    await pipeline.say(PROMPT_START)
+                    print("🟢 Chuyển sang ACTIVE\n")
+                    continue
+
+                if "exit" in intents:
+                    await pipeline.say(PROMPT_GOODBYE)
+                    await pipeline.wait_reply()
+                    break
 
-            if contains_any(normalized, START_KEYWORDS):
-                state = ACTIVE
-                voice.speak("Mình rất vui được hỗ trợ bạn. Mời bạn đặt câu hỏi.")
-                print("🟢 Chuyển sang ACTIVE\n")
-                time.sleep(0.5)
                 continue
 
-            if contains_any(normalized, EXIT_KEYWORDS):
-                voice.speak("Tạm biệt bạn. Hẹn gặp lại.")
-                break
-
-            continue
-
-        # ================= ACTIVE MODE =================
-        user_text = voice.listen()
-        if not user_text:
-            continue
-
-        normalized = normalize_text(user_text)
-        print(f"👂 (active) Nghe: {normalized}")
-
-        # ---- INTERRUPT ----
-        if "dừng" in normalized:
-            voice.stop()
-            voice.speak("Mình đã dừng. Bạn có thể hỏi câu khác.")
-            continue
-
-        # ---- EXIT / THANK ----
-        if (
-            contains_any(normalized, EXIT_KEYWORDS)
-            or contains_any(normalized, THANK_KEYWORDS)
-        ):
-            voice.stop()
-            voice.speak(
-                "Mình rất vui vì đã được hỗ trợ bạn. Khi cần tư vấn tiếp, hãy nói bắt đầu tư vấn nhé."
-            )
-            state = IDLE
-            print("🔴 Quay về IDLE\n")
-            continue
+            # ================= ACTIVE MODE =================
+            print(f"👂 (active) Nghe: {normalized}")
 
-        # ---- NOISE ----
-        if is_noise(normalized):
-            continue
+            # ---- INTERRUPT ----
+            # (barge-in: loa đã dừng ngay khi nhận stop word, ở đây chỉ xác nhận)
+            if "stop" in intents:
+                await pipeline.interrupt()
+                await pipeline.say(PROMPT_STOPPED)
+                continue
 
-        # ---- RETRIEVAL ----
-        retrieved = retrieval.retrieve(query=normalized, top_k=3)
+            # ---- EXIT / THANK ----
+            if (
+                "exit" in intents
+                or "thank" in intents
+            ):
+                await pipeline.interrupt()
+                await pipeline.say(PROMPT_THANKS)
+                state = IDLE
+                print("🔴 Quay về IDLE\n")
+                continue
 
-        # ---- LLM ----
-        try:
-            answer = llm.generate_answer(
-                query=normalized,
-                retrieved_docs=retrieved
+            # ---- NOISE ----
+            if is_noise(normalized):
+                continue
+
+            # ---- READINESS BARRIER ----
+            if llm is None:
+                retrieval, llm, answer_cache = await asyncio.to_thread(wait_ready, warmup)
+                if settings.EXTRACTIVE_ENABLED:
+                    from src.services.extractive_answer import ExtractiveAnswerer
+                    extractive = ExtractiveAnswerer()
+
+            if query_vec is None:
+                # Model vừa load xong ở barrier → embed 1 lần cho cả lượt
+                query_vec, found = await embed_turn(retrieval, normalized)
+                intents |= found
+
+            # ---- ANSWER CACHE ----
+            if answer_cache is not None:
+                with tracer.span("cache.lookup") as span:
+                    cached = answer_cache.lookup(query_vec)
+                    span.set(hit=bool(cached))
+                if cached:
+                    print(f"\n⚡ Cache hit {answer_cache.stats()}")
+                    await pipeline.say(cached)
+                    continue
+
+            # ---- RETRIEVAL → LLM → TTS (chạy nền) ----
+            remember = None
+            if answer_cache is not None:
+                def remember(answer, query=normalized, vec=query_vec):
+                    answer_cache.put(query, vec, answer)
+
+            await pipeline.answer(
+                normalized,
+                retrieval,
+                llm,
+                query_embedding=query_vec,
+                intents=intents,
+                on_complete=remember,
+                error_text=PROMPT_LLM_ERROR,
+                extractive=extractive,
             )
-        except Exception as e:
-            print("❌ LLM error:", e)
-            answer = "Mình chưa trả lời được ngay lúc này."
 
-        print("\n🤖 Bot:", answer)
-        voice.speak(answer)
-        time.sleep(0.4)
-        print("-" * 60)
+    finally:
+        await pipeline.close()
+        if voice.interrupts.events:
+            print(f"⚡ Interrupt latency: {voice.interrupts.summary()}")
+        print(f"🎚️ Audio I/O: {voice.audio_stats()}")
+        if settings.LOG_LATENCY and tracer.enabled:
+            print(tracer.report())
+        tracer.shutdown()
+        if llm is not None:
+            print(f"🔀 LLM router: {llm.router.stats()}")
+        if retrieval is not None and settings.EMBEDDING_CACHE_ENABLED:
+            print(f"🧮 Embedding cache: {retrieval.embedding_fn.stats()}")
+        if retrieval is not None and retrieval.intent_classifier is not None:
+            print(f"🧭 Intent (embedding): {retrieval.intent_classifier.stats()}")
+        if extractive is not None and extractive.turns:
+            print(f"✂️ Extractive: {extractive.stats()}")
+        http_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FPT AI Voice Chatbot")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="in thời gian từng import / bước init")
+    args = parser.parse_args()
+
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    profiler.install()
+
+    run_voice_chat(profiler)
 
 
 if __name__ == "__main__":
-    run_voice_chat()
+    main()
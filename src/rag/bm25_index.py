@@ -0,0 +1,258 @@
+# src/rag/bm25_index.py
+# BM25 lexical index (Vietnamese) – build / update cùng Chroma collection
+# Lưu dạng CSR (numpy) → nhỏ gọn trên đĩa, query < 1 ms trên CPU
+
+import os
+import threading
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.text_normalizer import tokenize
+
+
+BM25_FILE = "bm25_index.npz"
+
+
+def index_terms(text: str) -> list:
+    """
+    Tiếng Việt: mỗi âm tiết là 1 từ → thêm bigram ("học phí" → "học_phí")
+    để khớp cụm từ chính xác hơn
+    """
+    words = tokenize(text)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def _pack_strings(items) -> np.ndarray:
+    return np.frombuffer("\n".join(items).encode("utf-8"), dtype=np.uint8)
+
+
+def _unpack_strings(blob: np.ndarray) -> list:
+    text = blob.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+class BM25Index:
+    """
+    - Query: CSR arrays (term → postings doc idx + tf)
+    - Update: add() / remove() chuyển sang dạng dict, freeze() lại khi save()
+    """
+
+    def __init__(self, path: str = None, k1: float = None, b: float = None):
+        self.path = path or os.path.join(settings.VECTOR_DB_DIR, BM25_FILE)
+        self.k1 = k1 or settings.BM25_K1
+        self.b = b if b is not None else settings.BM25_B
+
+        self._lock = threading.Lock()
+
+        # ---- frozen (CSR) ----
+        self.doc_ids = []
+        self.terms = {}                               # term → term idx
+        self.offsets = np.zeros(1, dtype=np.int64)     # term idx → [start, end)
+        self.postings = np.zeros(0, dtype=np.int32)    # doc idx
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_lens = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._norm = np.zeros(0, dtype=np.float32)
+
+        # ---- mutable: doc id → {term: tf} ----
+        self._docs = None
+
+    def __len__(self):
+        return len(self._docs) if self._docs is not None else len(self.doc_ids)
+
+    # ================= SEARCH =================
+
+    def search(self, query: str, k: int = 10):
+        """
+        Trả về list (doc_id, score) giảm dần
+        """
+        with self._lock:
+            if self._docs is not None:
+                self._freeze()
+
+            n_docs = len(self.doc_ids)
+            if n_docs == 0:
+                return []
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            matched = False
+
+            for term in set(index_terms(query)):
+                t = self.terms.get(term)
+                if t is None:
+                    continue
+                start, end = self.offsets[t], self.offsets[t + 1]
+                docs = self.postings[start:end]
+                tf = self.tfs[start:end].astype(np.float32)
+                scores[docs] += self._idf[t] * tf * (self.k1 + 1) / (
+                    tf + self.k1 * self._norm[docs]
+                )
+                matched = True
+
+            if not matched:
+                return []
+
+            k = min(k, n_docs)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                (self.doc_ids[i], float(scores[i]))
+                for i in top
+                if scores[i] > 0
+            ]
+
+    # ================= UPDATE =================
+
+    def add(self, ids, texts):
+        with self._lock:
+            self._thaw()
+            for doc_id, text in zip(ids, texts):
+                counts = {}
+                for term in index_terms(text):
+                    counts[term] = counts.get(term, 0) + 1
+                self._docs[doc_id] = counts
+
+    def remove(self, ids):
+        with self._lock:
+            self._thaw()
+            for doc_id in ids:
+                self._docs.pop(doc_id, None)
+
+    def rebuild_from_collection(self, collection, page: int = 1000):
+        """
+        Build lại toàn bộ từ documents trong Chroma (lần đầu / index cũ)
+        """
+        with self._lock:
+            self._docs = {}
+
+        offset = 0
+        while True:
+            res = collection.get(include=["documents"], limit=page, offset=offset)
+            if not res["ids"]:
+                break
+            self.add(res["ids"], res["documents"])
+            offset += len(res["ids"])
+
+    # ================= PERSIST =================
+
+    def save(self):
+        with self._lock:
+            if self._docs is not None:
+                self._freeze()
+
+            vocab = sorted(self.terms, key=self.terms.get)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+            # Chuỗi lưu dạng 1 blob utf-8 ("\n" ngăn cách) → nhỏ hơn mảng unicode
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    terms=_pack_strings(vocab),
+                    offsets=self.offsets.astype(np.uint32),
+                    postings=self.postings,
+                    tfs=self.tfs,
+                    doc_ids=_pack_strings(self.doc_ids),
+                    doc_lens=self.doc_lens,
+                )
+            os.replace(tmp, self.path)
+
+    @classmethod
+    def load(cls, path: str = None) -> "BM25Index":
+        index = cls(path)
+        if not os.path.exists(index.path):
+            return index
+
+        with np.load(index.path) as data:
+            index.terms = {t: i for i, t in enumerate(_unpack_strings(data["terms"]))}
+            index.offsets = data["offsets"].astype(np.int64)
+            index.postings = data["postings"]
+            index.tfs = data["tfs"]
+            index.doc_ids = _unpack_strings(data["doc_ids"])
+            index.doc_lens = data["doc_lens"]
+
+        index._prepare_scoring()
+        return index
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    # ================= INTERNAL =================
+
+    def _thaw(self):
+        """
+        CSR → dict (chỉ khi cần update)
+        """
+        if self._docs is not None:
+            return
+
+        vocab = sorted(self.terms, key=self.terms.get)
+        term_of = np.repeat(
+            np.arange(len(vocab), dtype=np.int64), np.diff(self.offsets)
+        )
+
+        # Gom postings theo doc
+        order = np.argsort(self.postings, kind="stable")
+        bounds = np.zeros(len(self.doc_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.postings, minlength=len(self.doc_ids)), out=bounds[1:])
+
+        terms_sorted = term_of[order].tolist()
+        tfs_sorted = self.tfs[order].tolist()
+
+        docs = {}
+        for d, doc_id in enumerate(self.doc_ids):
+            start, end = bounds[d], bounds[d + 1]
+            docs[doc_id] = dict(zip(
+                [vocab[t] for t in terms_sorted[start:end]],
+                tfs_sorted[start:end]
+            ))
+        self._docs = docs
+
+    def _freeze(self):
+        """
+        dict → CSR (gán term id theo thứ tự xuất hiện, sort 1 lần bằng numpy)
+        """
+        term_ids = {}
+        t_list = []
+        tf_list = []
+        sizes = []
+
+        for counts in self._docs.values():
+            t_list.extend(term_ids.setdefault(t, len(term_ids)) for t in counts)
+            tf_list.extend(counts.values())
+            sizes.append(len(counts))
+
+        sizes = np.array(sizes, dtype=np.int64)
+        t_arr = np.array(t_list, dtype=np.int64)
+        d_arr = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+        tf_arr = np.minimum(np.array(tf_list, dtype=np.int64), 65535)
+
+        order = np.argsort(t_arr, kind="stable")
+
+        self.doc_ids = list(self._docs.keys())
+        self.doc_lens = np.array(
+            [sum(c.values()) for c in self._docs.values()], dtype=np.float32
+        )
+        self.terms = term_ids
+        self.offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(t_arr, minlength=len(term_ids)), out=self.offsets[1:])
+        self.postings = d_arr[order]
+        self.tfs = tf_arr[order].astype(np.uint16)
+
+        self._docs = None
+        self._prepare_scoring()
+
+    def _prepare_scoring(self):
+        n_docs = len(self.doc_ids)
+        if n_docs == 0:
+            self._idf = np.zeros(0, dtype=np.float32)
+            self._norm = np.zeros(0, dtype=np.float32)
+            return
+
+        df = np.diff(self.offsets).astype(np.float32)
+        self._idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avgdl = float(self.doc_lens.mean()) or 1.0
+        self._norm = (1 - self.b + self.b * self.doc_lens / avgdl).astype(np.float32)
@@ -0,0 +1,225 @@
+# src/rag/embedding_cache.py
+# Cache embedding của query đã normalize (text → vector), giữ qua restart
+# - Kiosk: câu hỏi lặp lại gần y hệt + lệnh cố định → không encode lại
+# - Row float16 trong file memory-map (384 dim → ~0.8 KB / query)
+# - LRU giới hạn số row; row bị đẩy ra được ghi đè tại chỗ
+# - Mỗi (model, backend) 1 file riêng → ST và ONNX không dùng lẫn vector
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config.settings import settings
+
+
+def _tag(text: str) -> int:
+    """
+    Key của row: hash 64-bit của text (0 = row trống)
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def cache_path(model: str, backend: str, base: str = None) -> str:
+    """
+    1 file / (model, backend): cache/query_embeddings.<model>.<backend>.f16
+    """
+    root, ext = os.path.splitext(base or settings.EMBEDDING_CACHE_FILE)
+    slug = re.sub(r"[^\w.-]+", "__", model)
+    return f"{root}.{slug}.{backend}{ext}"
+
+
+def _row_dtype(dim: int) -> np.dtype:
+    # tick: lần dùng gần nhất → dựng lại thứ tự LRU khi load
+    return np.dtype([("tag", "<u8"), ("tick", "<u8"), ("vec", "<f2", (dim,))])
+
+
+class CachedEmbeddingFunction:
+    """
+    Bọc embedding function (SharedEmbeddingFunction / OnnxEmbeddingFunction)
+    - Gọi với ít text (query) → tra cache trước, chỉ encode text chưa có
+    - Batch lớn (index document) → gọi thẳng model, không làm bẩn cache
+    - Hit hay miss đều trả vector đã làm tròn float16 → cùng text, cùng vector
+    """
+
+    def __init__(self, inner, path: str = None, max_entries: int = None,
+                 max_batch: int = None):
+        self.inner = inner
+        # Tag lấy từ chính embedding function (không phải settings)
+        self.model = getattr(inner, "model_name", settings.EMBEDDING_MODEL)
+        self.backend = getattr(inner, "backend", type(inner).__name__)
+
+        self.path = path or cache_path(self.model, self.backend)
+        self.meta_path = self.path + ".json"
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self.max_batch = max_batch or settings.EMBEDDING_CACHE_MAX_BATCH
+
+        self._slots = OrderedDict()      # tag → row (cuối = dùng gần nhất)
+        self._rows = None                # np.memmap (max_entries,) – mở khi biết dim
+        self._free = []                  # row trống (tag = 0)
+        self._tick = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._load()
+        atexit.register(self.flush)
+
+    # giữ interface của embedding function bên trong (name(), calls, ...)
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    # ================= PUBLIC =================
+
+    def __call__(self, input):
+        texts = list(input)
+        if len(texts) > self.max_batch:
+            self.bypassed += len(texts)
+            return self.inner(texts)
+
+        out = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                tag = _tag(text)
+                row = self._slots.get(tag)
+                if row is None:
+                    missing.append(i)
+                    continue
+                self._touch(tag, row)
+                out[i] = self._rows["vec"][row].astype(np.float32)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.inner([texts[i] for i in missing])
+            with self._lock:
+                for i, vec in zip(missing, vectors):
+                    out[i] = self._put(_tag(texts[i]), np.asarray(vec, dtype=np.float32))
+        return out
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "bypassed": self.bypassed,
+        }
+
+    def flush(self):
+        with self._lock:
+            if self._rows is not None:
+                self._rows.flush()
+
+    def clear(self):
+        with self._lock:
+            self._close()
+            for path in (self.path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # ================= STORAGE =================
+
+    def _load(self):
+        meta = None
+        if os.path.exists(self.meta_path):
+            try:
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+        if meta is None:
+            return
+
+        expected = {"model": self.model, "backend": self.backend,
+                    "max_entries": self.max_entries}
+        if any(meta.get(k) != v for k, v in expected.items()):
+            print("♻️ Embedding cache cũ (model / cấu hình đã đổi) → bỏ")
+            self.clear()
+            return
+
+        dim = int(meta.get("dim", 0))
+        size = _row_dtype(dim).itemsize * self.max_entries if dim else 0
+        if not size or not os.path.exists(self.path) or os.path.getsize(self.path) != size:
+            self.clear()
+            return
+
+        self._rows = np.memmap(self.path, dtype=_row_dtype(dim), mode="r+",
+                               shape=(self.max_entries,))
+        used = np.flatnonzero(self._rows["tag"])
+        for row in used[np.argsort(self._rows["tick"][used], kind="stable")]:
+            self._slots[int(self._rows["tag"][row])] = int(row)
+        self._free = np.flatnonzero(self._rows["tag"] == 0)[::-1].tolist()
+        self._tick = int(self._rows["tick"].max()) if len(used) else 0
+
+        print(f"💾 Embedding cache: {len(self._slots)} queries")
+
+    def _create(self, dim: int):
+        self._close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._rows = np.memmap(self.path, dtype=_row_dtype(dim), mode="w+",
+                               shape=(self.max_entries,))
+        self._slots.clear()
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._tick = 0
+
+        # meta ghi sau file row → meta có mà file sai kích thước = bỏ khi load
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "backend": self.backend, "dim": dim,
+                       "max_entries": self.max_entries}, f)
+        os.replace(tmp, self.meta_path)
+
+    def _close(self):
+        # Flush + đóng mmap trước khi xoá / tạo lại file
+        rows, self._rows = self._rows, None
+        if rows is not None:
+            rows.flush()
+            mm = rows._mmap
+            del rows
+            try:
+                mm.close()
+            except (BufferError, AttributeError):
+                pass             # còn view khác giữ buffer → đóng khi bị GC
+        self._slots.clear()
+        self._free = []
+        self._tick = 0
+
+    # ================= LRU =================
+
+    def _touch(self, tag: int, row: int):
+        self._tick += 1
+        self._rows["tick"][row] = self._tick
+        self._slots.move_to_end(tag)
+
+    def _put(self, tag: int, vec: np.ndarray) -> np.ndarray:
+        dim = vec.shape[-1]
+        if self._rows is None or self._rows.dtype["vec"].shape != (dim,):
+            self._create(dim)
+
+        row = self._slots.get(tag)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                _, row = self._slots.popitem(last=False)
+            self._slots[tag] = row
+
+        # tag = 0 trong lúc ghi vector → crash giữa chừng không để lại row sai
+        rows = self._rows
+        rows["tag"][row] = 0
+        rows["vec"][row] = vec
+        rows["tag"][row] = tag
+        self._touch(tag, row)
+        return rows["vec"][row].astype(np.float32)
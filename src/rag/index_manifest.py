@@ -0,0 +1,87 @@
+# src/rag/index_manifest.py
+# Per-document manifest: doc key (url) → content hash + chunk ids
+# → Re-index chỉ xử lý document đổi, xoá chunk cũ / document đã bị gỡ
+
+import hashlib
+import json
+import os
+import time
+
+from src.config.settings import settings
+
+
+MANIFEST_FILE = "index_manifest.json"
+
+# Các field ảnh hưởng tới chunk text / metadata
+HASH_FIELDS = ("url", "title", "type", "description", "content")
+
+
+class IndexManifest:
+    def __init__(self, path: str = None, docs: dict = None, feature_version: int = None):
+        self.path = path or os.path.join(settings.VECTOR_DB_DIR, MANIFEST_FILE)
+        # key → {"hash": str, "chunk_ids": [str]}
+        self.docs = docs or {}
+        # FEATURE_VERSION mà mọi chunk trong collection đã có → khác thì mới quét
+        self.feature_version = feature_version
+
+    # ================= KEY / HASH =================
+
+    @staticmethod
+    def doc_key(item: dict) -> str:
+        if item.get("url"):
+            return item["url"]
+        if item.get("title"):
+            return "title:" + item["title"]
+        # Không có url / title → key theo nội dung
+        return "content:" + IndexManifest.content_hash(item)
+
+    @staticmethod
+    def content_hash(item: dict) -> str:
+        payload = json.dumps(
+            {k: item.get(k) for k in HASH_FIELDS},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # ================= QUERY =================
+
+    def referenced_ids(self) -> set:
+        ids = set()
+        for entry in self.docs.values():
+            ids.update(entry["chunk_ids"])
+        return ids
+
+    # ================= PERSIST =================
+
+    @classmethod
+    def load(cls, path: str = None) -> "IndexManifest":
+        manifest = cls(path)
+        if not os.path.exists(manifest.path):
+            return manifest
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            manifest.docs = data.get("docs", {})
+            manifest.feature_version = data.get("feature_version")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Manifest lỗi, index lại toàn bộ: {e}")
+            manifest.docs = {}
+
+        return manifest
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "updated_at": time.time(),
+                    "feature_version": self.feature_version,
+                    "docs": self.docs,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self.path)
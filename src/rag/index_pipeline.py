@@ -0,0 +1,522 @@
+# src/rag/index_pipeline.py
+# Staged indexing pipeline – stream JSON → chunk (process pool) → embed → write
+# Jetson: không load cả file JSON, không kéo toàn bộ collection về RAM
+
+import hashlib
+import json
+import multiprocessing
+import queue
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config.settings import settings
+from src.rag.index_manifest import IndexManifest
+from src.rag.rerank_features import FEATURE_VERSION, compute_features
+
+
+# ================= SPLIT CONFIG =================
+
+CHUNK_SIZE = 900
+CHUNK_OVERLAP = 180
+SEPARATORS = ["\n\n", "\n", ".", "?", "!", " ", ""]
+
+_worker_splitter = None
+
+
+def build_text_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=SEPARATORS
+    )
+
+
+def split_text_smart(text: str, splitter):
+    if not text:
+        return []
+    if len(text) < 200:
+        return [text]
+    return splitter.split_text(text)
+
+
+# ================= STAGE 1: STREAM PARSE =================
+
+def iter_json_array(path: str, read_size: int = 1 << 16):
+    """
+    Yield từng phần tử của JSON array top-level, đọc file theo block
+    → RAM chỉ giữ 1 block + 1 document
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            # bỏ whitespace / dấu phẩy giữa các phần tử
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf = f.read(read_size)
+                pos = 0
+                eof = not buf
+                continue
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(read_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            pos = end
+            yield item
+
+
+# ================= STAGE 2: CHUNK + HASH (process pool) =================
+
+def _init_worker():
+    global _worker_splitter
+    _worker_splitter = build_text_splitter()
+
+
+def chunk_document(item: dict, splitter=None):
+    """
+    1 document → list (chunk_id, text, metadata)
+    ❗ KHÔNG normalize khi index
+    """
+    splitter = splitter or _worker_splitter
+
+    raw = item.get("content", "")
+    if item.get("description"):
+        raw = f"Tóm tắt: {item['description']}\n{raw}"
+
+    out = []
+    for idx, chunk in enumerate(split_text_smart(raw, splitter)):
+        final_chunk = (
+            f"Tiêu đề: {item.get('title', '')}\n"
+            f"Nội dung: {chunk}"
+        )
+        chunk_id = hashlib.md5(final_chunk.encode("utf-8")).hexdigest()
+
+        meta = {
+            "url": item.get("url"),
+            "title": item.get("title"),
+            "doc_type": item.get("type", "general"),
+            "available": True,
+            "chunk_index": idx,
+            # rerank feature tính sẵn → query không phải regex / normalize lại
+            **compute_features(final_chunk),
+        }
+        out.append((chunk_id, final_chunk, meta))
+
+    return out
+
+
+def _chunk_batch(items):
+    return [chunk_document(item) for item in items]
+
+
+# ================= PIPELINE =================
+
+class IndexPipeline:
+    """
+    parse + hash (main) → chunk document đổi (process pool) → lọc id đã có
+    → embed (main) → write Chroma (writer thread) → xoá chunk cũ
+    Các stage chạy chồng lên nhau, hàng đợi có giới hạn để không phình RAM
+    """
+
+    def __init__(self, collection, embedding_fn, workers: int = None,
+                 embed_batch: int = None, doc_batch: int = None,
+                 max_write_batch: int = None, bm25=None):
+        self.collection = collection
+        self.embedding_fn = embedding_fn
+        self.bm25 = bm25             # BM25Index cập nhật cùng Chroma (optional)
+        self.workers = workers or settings.INDEX_WORKERS
+        self.embed_batch = embed_batch or settings.INDEX_EMBED_BATCH
+        self.doc_batch = doc_batch or settings.INDEX_DOC_BATCH
+        self.write_batch = max(1, min(self.embed_batch, max_write_batch or self.embed_batch))
+
+        self.stats = {
+            "documents": 0,
+            "docs_unchanged": 0,
+            "docs_changed": 0,
+            "docs_removed": 0,
+            "chunks_total": 0,
+            "chunks_new": 0,
+            "chunks_refreshed": 0,
+            "chunks_written": 0,
+            "chunks_deleted": 0,
+            "write_errors": 0,
+        }
+        self._failed_ids = set()
+        self._refreshed_ids = set()
+
+    # ---------------- RUN ----------------
+
+    def run(self, data_file: str, manifest: IndexManifest = None,
+            full: bool = False) -> dict:
+        """
+        full=True: bỏ qua manifest, chunk lại mọi document
+        (chunk đã có trong Chroma không embed lại, chỉ ghi đè metadata)
+        """
+        t0 = time.time()
+
+        manifest = manifest or IndexManifest.load()
+        prev_docs = manifest.docs
+        old_docs = {} if full else prev_docs
+        new_docs = {}
+        stale_ids = set()
+
+        write_q = queue.Queue(maxsize=settings.INDEX_WRITE_QUEUE)
+        writer = threading.Thread(target=self._writer, args=(write_q,), daemon=True)
+        writer.start()
+
+        seen_ids = set()
+        pending = []                 # (id, text, meta) chờ embed
+
+        try:
+            for key, doc_hash, chunks in self._changed_documents(
+                data_file, old_docs, new_docs
+            ):
+                chunk_ids = [c[0] for c in chunks]
+                new_docs[key] = {"hash": doc_hash, "chunk_ids": chunk_ids}
+
+                # Document sửa → chunk cũ không còn trong bản mới
+                if key in prev_docs:
+                    stale_ids.update(
+                        set(prev_docs[key]["chunk_ids"]) - set(chunk_ids)
+                    )
+
+                self.stats["docs_changed"] += 1
+                self.stats["chunks_total"] += len(chunks)
+
+                fresh = self._filter_new(chunks, seen_ids)
+                pending.extend(fresh)
+
+                while len(pending) >= self.embed_batch:
+                    batch = pending[: self.embed_batch]
+                    pending = pending[self.embed_batch:]
+                    self._embed_and_queue(batch, write_q)
+
+                if self.stats["docs_changed"] % 50 == 0:
+                    print(
+                        f"Indexing: {self.stats['docs_changed']} docs đổi, "
+                        f"{self.stats['chunks_new']} chunks mới",
+                        end="\r"
+                    )
+
+            if pending:
+                self._embed_and_queue(pending, write_q)
+
+        finally:
+            write_q.put(None)
+            writer.join()
+
+        # Document bị gỡ khỏi crawl
+        for key in prev_docs.keys() - new_docs.keys():
+            stale_ids.update(prev_docs[key]["chunk_ids"])
+            self.stats["docs_removed"] += 1
+
+        manifest.docs = new_docs
+
+        # Chunk trùng nội dung có thể vẫn thuộc document khác → giữ lại
+        self._delete(stale_ids - manifest.referenced_ids())
+
+        # Chunk ghi lỗi → để hash trống, lần sau xử lý lại document đó
+        if self._failed_ids:
+            for entry in new_docs.values():
+                if self._failed_ids.intersection(entry["chunk_ids"]):
+                    entry["hash"] = ""
+
+        # Chunk của document không đổi nhưng feature rerank từ FEATURE_VERSION cũ
+        # → chỉ quét collection khi manifest chưa ghi nhận version hiện tại
+        if manifest.feature_version != FEATURE_VERSION:
+            errors = self.stats["write_errors"]
+            self.refresh_stale_features()
+            if self.stats["write_errors"] == errors:
+                manifest.feature_version = FEATURE_VERSION
+
+        manifest.save()
+
+        elapsed = time.time() - t0
+        self.stats["elapsed_s"] = round(elapsed, 2)
+        elapsed = max(elapsed, 1e-6)
+        self.stats["chunks_per_s"] = round(self.stats["chunks_total"] / elapsed, 1)
+        self.stats["embedded_per_s"] = round(self.stats["chunks_written"] / elapsed, 1)
+        self.stats["peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF)
+        self.stats["peak_rss_workers_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+        return self.stats
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.stats["chunks_written"] or self.stats["chunks_deleted"]
+                    or self.stats["chunks_refreshed"])
+
+    # ---------------- STAGES ----------------
+
+    def _changed_documents(self, data_file: str, old_docs: dict, new_docs: dict):
+        """
+        Hash từng document ở main thread:
+        - Không đổi → giữ entry manifest cũ, KHÔNG chunk / embed
+        - Đổi / mới → gửi theo batch sang process pool, giữ tối đa
+          workers * 2 batch đang chạy → yield (key, hash, chunks) theo thứ tự
+        Pool chỉ được tạo khi thật sự có document cần chunk
+        """
+        pool = None
+        max_inflight = self.workers * 2
+        inflight = deque()
+        batch = []
+        run_keys = set()
+
+        def submit(batch):
+            nonlocal pool
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            keys = [(k, h) for k, h, _ in batch]
+            future = pool.submit(_chunk_batch, [item for _, _, item in batch])
+            inflight.append((keys, future))
+
+        def drain(limit):
+            while len(inflight) > limit:
+                keys, future = inflight.popleft()
+                for (key, doc_hash), chunks in zip(keys, future.result()):
+                    yield key, doc_hash, chunks
+
+        try:
+            for item in iter_json_array(data_file):
+                self.stats["documents"] += 1
+
+                key = IndexManifest.doc_key(item)
+                doc_hash = IndexManifest.content_hash(item)
+                if key in run_keys:
+                    # URL trùng trong crawl → key theo nội dung (không theo vị trí
+                    # trong file) → crawl đổi thứ tự không làm re-index
+                    key = f"{key}#{doc_hash[:16]}"
+                    if key in run_keys:
+                        continue     # trùng cả nội dung → chunk y hệt bản trước
+                run_keys.add(key)
+
+                old = old_docs.get(key)
+                if old is not None and old["hash"] == doc_hash:
+                    new_docs[key] = old
+                    self.stats["docs_unchanged"] += 1
+                    continue
+
+                batch.append((key, doc_hash, item))
+                if len(batch) < self.doc_batch:
+                    continue
+
+                submit(batch)
+                batch = []
+                yield from drain(max_inflight - 1)
+
+            if batch:
+                submit(batch)
+            yield from drain(0)
+
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def _filter_new(self, chunks, seen_ids):
+        """
+        Chỉ hỏi Chroma đúng những id của document này (không get() cả collection)
+        """
+        candidates = []
+        for chunk_id, text, meta in chunks:
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            candidates.append((chunk_id, text, meta))
+
+        if not candidates:
+            return []
+
+        try:
+            got = self.collection.get(
+                ids=[c[0] for c in candidates],
+                include=["metadatas"]
+            )
+            existing = dict(zip(got["ids"], got["metadatas"]))
+        except Exception:
+            existing = {}
+
+        # Chunk đã có (text giữ nguyên) của document đã đổi: không embed lại,
+        # nhưng metadata (doc_type, url, feature...) theo bản mới
+        stale = [
+            c for c in candidates
+            if c[0] in existing and existing[c[0]] != c[2]
+        ]
+        self._update_metadata([c[0] for c in stale], [c[2] for c in stale])
+
+        fresh = [c for c in candidates if c[0] not in existing]
+        self.stats["chunks_new"] += len(fresh)
+        return fresh
+
+    def _embed_and_queue(self, batch, write_q):
+        ids = [c[0] for c in batch]
+        texts = [c[1] for c in batch]
+        metas = [c[2] for c in batch]
+
+        embeddings = self.embedding_fn(texts)
+        write_q.put((ids, embeddings, texts, metas))
+
+    def _writer(self, write_q):
+        while True:
+            item = write_q.get()
+            if item is None:
+                return
+
+            ids, embeddings, texts, metas = item
+            for i in range(0, len(ids), self.write_batch):
+                j = i + self.write_batch
+                try:
+                    self.collection.add(
+                        ids=ids[i:j],
+                        embeddings=embeddings[i:j],
+                        documents=texts[i:j],
+                        metadatas=metas[i:j]
+                    )
+                    self.stats["chunks_written"] += len(ids[i:j])
+                    if self.bm25 is not None:
+                        self.bm25.add(ids[i:j], texts[i:j])
+                except Exception as e:
+                    self.stats["write_errors"] += 1
+                    self._failed_ids.update(ids[i:j])
+                    print(f"\n⚠️ Skip batch: {e}")
+
+    def refresh_stale_features(self) -> int:
+        """
+        Tính lại feature rerank cho chunk lưu từ FEATURE_VERSION cũ
+        - Duyệt metadata theo trang, chỉ lấy documents của chunk cũ
+        - Không embed lại (vector không phụ thuộc feature)
+        """
+        stale = []
+        offset = 0
+        page = max(self.write_batch, 1000)
+        while True:
+            got = self.collection.get(include=["metadatas"], limit=page, offset=offset)
+            if not got["ids"]:
+                break
+            stale.extend(
+                chunk_id for chunk_id, meta in zip(got["ids"], got["metadatas"])
+                if chunk_id not in self._refreshed_ids
+                and (meta or {}).get("rf_version") != FEATURE_VERSION
+            )
+            offset += len(got["ids"])
+
+        before = self.stats["chunks_refreshed"]
+        for i in range(0, len(stale), self.write_batch):
+            try:
+                got = self.collection.get(
+                    ids=stale[i:i + self.write_batch],
+                    include=["documents", "metadatas"]
+                )
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                print(f"\n⚠️ Refresh error: {e}")
+                continue
+            metas = [
+                {**(meta or {}), **compute_features(doc or "")}
+                for doc, meta in zip(got["documents"], got["metadatas"])
+            ]
+            self._update_metadata(got["ids"], metas)
+
+        refreshed = self.stats["chunks_refreshed"] - before
+        if refreshed:
+            print(f"\n🔁 Cập nhật feature rerank v{FEATURE_VERSION}: {refreshed} chunks")
+        return refreshed
+
+    def _update_metadata(self, ids, metas):
+        for i in range(0, len(ids), self.write_batch):
+            j = i + self.write_batch
+            try:
+                self.collection.update(ids=ids[i:j], metadatas=metas[i:j])
+                self.stats["chunks_refreshed"] += len(ids[i:j])
+                self._refreshed_ids.update(ids[i:j])
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                print(f"\n⚠️ Update metadata error: {e}")
+
+    def prune_orphans(self, manifest: IndexManifest = None) -> int:
+        """
+        Xoá chunk không thuộc document nào trong manifest
+        (collection được index trước khi có manifest)
+        """
+        manifest = manifest or IndexManifest.load()
+        referenced = manifest.referenced_ids()
+
+        orphans = []
+        offset = 0
+        page = max(self.write_batch, 1000)
+        while True:
+            ids = self.collection.get(include=[], limit=page, offset=offset)["ids"]
+            if not ids:
+                break
+            orphans.extend(i for i in ids if i not in referenced)
+            offset += len(ids)
+
+        before = self.stats["chunks_deleted"]
+        self._delete(orphans)
+        return self.stats["chunks_deleted"] - before
+
+    def _delete(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), self.write_batch):
+            try:
+                batch = ids[i:i + self.write_batch]
+                self.collection.delete(ids=batch)
+                self.stats["chunks_deleted"] += len(batch)
+                if self.bm25 is not None:
+                    self.bm25.remove(batch)
+            except Exception as e:
+                print(f"\n⚠️ Delete error: {e}")
+
+
+def _peak_rss_mb(who) -> float:
+    # Linux: ru_maxrss tính bằng KB
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def format_stats(stats: dict) -> str:
+    return (
+        f"{stats['documents']} docs ({stats['docs_changed']} đổi, "
+        f"{stats['docs_unchanged']} giữ nguyên, {stats['docs_removed']} bị gỡ) | "
+        f"{stats['chunks_total']} chunks ({stats['chunks_new']} mới, "
+        f"{stats['chunks_refreshed']} cập nhật metadata, "
+        f"{stats['chunks_written']} đã ghi, {stats['chunks_deleted']} đã xoá) | "
+        f"{stats['elapsed_s']} s | {stats['chunks_per_s']} chunks/s "
+        f"(embed {stats['embedded_per_s']}/s) | "
+        f"peak RSS {stats['peak_rss_mb']} MB "
+        f"(workers {stats['peak_rss_workers_mb']} MB)"
+    )
@@ -0,0 +1,56 @@
+# src/rag/index_state.py
+# Index version stamp – đổi mỗi lần collection được re-index
+# → Các cache phía sau (answer cache, ...) tự invalidate
+
+import json
+import os
+import time
+import uuid
+
+from src.config.settings import settings
+
+
+INDEX_VERSION_FILE = "index_version.json"
+
+_cached = {"mtime": None, "version": ""}
+
+
+def _version_path() -> str:
+    return os.path.join(settings.VECTOR_DB_DIR, INDEX_VERSION_FILE)
+
+
+def bump_index_version() -> str:
+    """
+    Gọi sau khi collection thay đổi (index_documents)
+    """
+    version = uuid.uuid4().hex
+    path = _version_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "updated_at": time.time()}, f)
+    os.replace(tmp, path)
+
+    return version
+
+
+def read_index_version() -> str:
+    """
+    Đọc version hiện tại – chỉ đọc lại file khi mtime đổi (rẻ, gọi mỗi query được)
+    """
+    path = _version_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return ""
+
+    if mtime != _cached["mtime"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _cached["version"] = json.load(f).get("version", "")
+        except (OSError, ValueError):
+            _cached["version"] = ""
+        _cached["mtime"] = mtime
+
+    return _cached["version"]
@@ -0,0 +1,179 @@
+# src/rag/intent_classifier.py
+# Intent theo embedding: nearest-centroid trên câu mẫu đã gán nhãn
+# - Dùng lại vector query của retrieval → không encode thêm lần nào
+# - Bắt được biến thể ASR mà list keyword bỏ sót ("hoc phi", "cám ơn nha"...)
+# - Centroid tính lúc index, lưu cạnh collection (vector_db/intent_centroids.npz)
+#   → đổi model / câu mẫu thì tự tính lại
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.text_normalizer import normalize_text
+
+
+INTENT_CENTROIDS_FILE = "intent_centroids.npz"
+
+# Nhãn trùng tên nhóm keyword trong main.py (start / exit / thank / stop)
+INTENT_EXAMPLES = {
+    "start": [
+        "bắt đầu tư vấn", "bat dau tu van", "bắt đầu", "bắt đầu nhé",
+        "mình muốn được tư vấn", "tư vấn cho mình với", "hỏi thông tin tuyển sinh",
+        "cho mình hỏi thông tin",
+    ],
+    "exit": [
+        "thoát", "thoat", "kết thúc", "ket thuc", "tạm biệt", "bye bye",
+        "dừng tư vấn", "ngừng tư vấn", "kết thúc cuộc trò chuyện", "thôi mình không hỏi nữa",
+    ],
+    "thank": [
+        "cảm ơn", "cam on", "cám ơn", "cảm ơn bạn nhiều", "ok cảm ơn",
+        "cảm ơn nhé", "thanks", "thank you",
+    ],
+    "stop": [
+        "dừng", "dừng lại", "dung lai", "ngừng", "ngừng lại", "stop",
+        "im đi", "đủ rồi",
+    ],
+    "tuition": [
+        "học phí bao nhiêu", "hoc phi bao nhieu", "học phí ngành công nghệ thông tin",
+        "một kỳ đóng bao nhiêu tiền", "chi phí học một năm", "đóng tiền học khi nào",
+        "học phí có tăng không", "phí nhập học bao nhiêu",
+    ],
+}
+
+# Lệnh điều khiển: câu ngắn + ngưỡng cao hơn (nhầm "thoát" = cắt ngang user)
+# Mặc định tắt (INTENT_EMBEDDING_CONTROL) – kiểm bằng scripts/eval_intents.py
+CONTROL_INTENTS = ("start", "exit", "thank", "stop")
+
+
+def _centroids_path() -> str:
+    return os.path.join(settings.VECTOR_DB_DIR, INTENT_CENTROIDS_FILE)
+
+
+def examples_signature(examples: dict = None) -> str:
+    """
+    Đổi model / backend / câu mẫu → signature đổi → centroid cũ bị bỏ
+    """
+    payload = {
+        "model": settings.EMBEDDING_MODEL,
+        "backend": settings.EMBEDDING_BACKEND,
+        "examples": examples or INTENT_EXAMPLES,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def build_centroids(embedding_fn, examples: dict = None):
+    """
+    → (labels, centroids (n_label, dim) float32 đã chuẩn hoá)
+    Câu mẫu normalize giống query lúc serve (normalize_text)
+    """
+    examples = examples or INTENT_EXAMPLES
+    labels = list(examples)
+    texts = [normalize_text(t) for label in labels for t in examples[label]]
+    vectors = _unit(np.asarray(embedding_fn(texts), dtype=np.float32))
+
+    centroids = []
+    start = 0
+    for label in labels:
+        n = len(examples[label])
+        centroids.append(vectors[start:start + n].mean(axis=0))
+        start += n
+    return labels, _unit(np.stack(centroids)).astype(np.float32)
+
+
+def save_centroids(embedding_fn, path: str = None) -> str:
+    """
+    Gọi sau khi index (RAGSystem.index_documents)
+    """
+    path = path or _centroids_path()
+    labels, centroids = build_centroids(embedding_fn)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            labels=np.array(labels),
+            centroids=centroids,
+            signature=np.array(examples_signature()),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+class IntentClassifier:
+    """
+    classify(vec) → (nhãn | None, cosine, margin so với nhãn thứ 2)
+    intents(vec, text) → set nhãn đủ tự tin (tối đa 1)
+    """
+
+    def __init__(self, embedding_fn, path: str = None):
+        self.path = path or _centroids_path()
+        self.min_similarity = settings.INTENT_MIN_SIMILARITY
+        self.control_min_similarity = settings.INTENT_CONTROL_MIN_SIMILARITY
+        self.min_margin = settings.INTENT_MIN_MARGIN
+        self.control_max_words = settings.INTENT_CONTROL_MAX_WORDS
+        self.control_enabled = settings.INTENT_EMBEDDING_CONTROL
+
+        self.labels, self.centroids = self._load(embedding_fn)
+
+        self.calls = 0
+        self.accepted = {label: 0 for label in self.labels}
+
+    def _load(self, embedding_fn):
+        signature = examples_signature()
+        if os.path.exists(self.path):
+            try:
+                with np.load(self.path) as data:
+                    if str(data["signature"]) == signature:
+                        return [str(x) for x in data["labels"]], data["centroids"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Intent centroids lỗi ({e}) → tính lại")
+
+        # Chưa index lại sau khi đổi model / câu mẫu → tính ngay (vài chục câu)
+        print("🧭 Tính intent centroids (chưa có / đã cũ)")
+        save_centroids(embedding_fn, self.path)
+        with np.load(self.path) as data:
+            return [str(x) for x in data["labels"]], data["centroids"]
+
+    # ================= PUBLIC =================
+
+    def classify(self, embedding):
+        vec = _unit(np.asarray(embedding, dtype=np.float32))
+        sims = self.centroids @ vec
+
+        order = np.argsort(sims)[::-1]
+        best = float(sims[order[0]])
+        margin = best - float(sims[order[1]]) if len(order) > 1 else best
+        return self.labels[order[0]], best, margin
+
+    def intents(self, embedding, text: str = "") -> set:
+        self.calls += 1
+        label, sim, margin = self.classify(embedding)
+
+        threshold = self.min_similarity
+        if label in CONTROL_INTENTS:
+            # Lệnh điều khiển chỉ theo keyword cho tới khi ngưỡng được kiểm chứng
+            if not self.control_enabled:
+                return set()
+            # Câu hỏi dài có chữ "tư vấn" / "dừng" không phải lệnh
+            if len(text.split()) > self.control_max_words:
+                return set()
+            threshold = self.control_min_similarity
+
+        if sim < threshold or margin < self.min_margin:
+            return set()
+
+        self.accepted[label] += 1
+        return {label}
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "accepted": dict(self.accepted)}
@@ -0,0 +1,229 @@
+# src/rag/model_registry.py
+# Registry dùng chung trong process: embedding model + Chroma client / collection
+# → Index + serve cùng process chỉ load MiniLM 1 lần (Jetson 8 GB)
+
+import gc
+import os
+import threading
+import time
+
+from chromadb import PersistentClient
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+from src.config.settings import settings
+
+
+_lock = threading.RLock()
+_models = {}          # (model_name, device, backend) → SharedEmbeddingFunction
+_query_fns = {}       # (model_name, device, backend) → CachedEmbeddingFunction
+_clients = {}         # abs path → PersistentClient
+_collections = {}     # (abs path, name) → Collection
+
+
+def current_rss_mb() -> float:
+    """
+    RSS hiện tại của process (Linux /proc, không cần psutil)
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class SharedEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Giữ name() / get_config() của SentenceTransformerEmbeddingFunction
+    → collection đã tạo trước đây vẫn khớp config
+    - encode có lock: fast tokenizer của HF không an toàn khi gọi song song
+    """
+
+    backend = "torch"            # vector khác backend → cache không dùng chung
+
+    def __init__(self, model_name: str, device: str = "cpu"):
+        self.model_name = model_name
+        self.device = device
+        self.normalize_embeddings = False
+        self.kwargs = {}
+
+        rss_before = current_rss_mb()
+        t0 = time.time()
+
+        self._model = self._load_model()
+        self._encode_lock = threading.Lock()
+
+        self.load_s = round(time.time() - t0, 2)
+        self.rss_mb = round(current_rss_mb() - rss_before, 1)
+        self.calls = 0
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name_or_path=self.model_name, device=self.device)
+
+    def _encode(self, texts):
+        return super().__call__(texts)
+
+    def __call__(self, input):
+        with self._encode_lock:
+            if self._model is None:
+                raise RuntimeError(f"Embedding model {self.model_name} đã unload")
+            self.calls += 1
+            return self._encode(input)
+
+    def param_mb(self) -> float:
+        if self._model is None:
+            return 0.0
+        total = sum(p.numel() * p.element_size() for p in self._model.parameters())
+        return round(total / (1024 * 1024), 1)
+
+    def release(self):
+        with self._encode_lock:
+            self._model = None
+
+
+# ================= EMBEDDING =================
+
+def get_embedding_function(model_name: str = None, device: str = None,
+                           backend: str = None):
+    """
+    Load lazy lần đầu, các lần sau trả về cùng instance
+    backend: torch (sentence-transformers) | onnx (int8, onnxruntime)
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    device = device or settings.EMBEDDING_DEVICE
+    backend = backend or settings.EMBEDDING_BACKEND
+    key = (model_name, device, backend)
+
+    with _lock:
+        ef = _models.get(key)
+        if ef is None:
+            print(f"🔄 Loading embedding model {model_name} on {device.upper()} ({backend})")
+            if backend == "onnx":
+                from src.rag.onnx_embedding import OnnxEmbeddingFunction
+
+                ef = OnnxEmbeddingFunction(model_name, device)
+            else:
+                ef = SharedEmbeddingFunction(model_name, device)
+            _models[key] = ef
+            print(f"✅ Embedding model ready ({ef.load_s} s, +{ef.rss_mb} MB RSS)")
+        return ef
+
+
+def get_query_embedding_function(model_name: str = None, device: str = None,
+                                 backend: str = None):
+    """
+    Embedding function cho query: model của registry + cache query trên đĩa
+    (EMBEDDING_CACHE_ENABLED); collection vẫn giữ embedding function gốc
+    """
+    ef = get_embedding_function(model_name, device, backend)
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return ef
+
+    key = (
+        model_name or settings.EMBEDDING_MODEL,
+        device or settings.EMBEDDING_DEVICE,
+        backend or settings.EMBEDDING_BACKEND,
+    )
+    with _lock:
+        cached = _query_fns.get(key)
+        if cached is None or cached.inner is not ef:
+            from src.rag.embedding_cache import CachedEmbeddingFunction
+
+            cached = CachedEmbeddingFunction(ef)
+            _query_fns[key] = cached
+        return cached
+
+
+def unload_embedding_function(model_name: str = None, device: str = None,
+                              backend: str = None) -> bool:
+    """
+    Giải phóng model; collection đang giữ EF này cũng bị bỏ khỏi cache
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    device = device or settings.EMBEDDING_DEVICE
+    backend = backend or settings.EMBEDDING_BACKEND
+
+    with _lock:
+        ef = _models.pop((model_name, device, backend), None)
+        if ef is None:
+            return False
+
+        cached = _query_fns.pop((model_name, device, backend), None)
+        if cached is not None:
+            cached.flush()
+
+        stale = [
+            key for key, collection in _collections.items()
+            if getattr(collection, "_embedding_function", None) is ef
+        ]
+        for key in stale:
+            _collections.pop(key)
+
+        ef.release()
+
+    gc.collect()
+    return True
+
+
+# ================= CHROMA =================
+
+def get_client(path: str = None):
+    path = os.path.abspath(path or settings.VECTOR_DB_DIR)
+
+    with _lock:
+        client = _clients.get(path)
+        if client is None:
+            client = PersistentClient(path=path)
+            _clients[path] = client
+        return client
+
+
+def get_collection(name: str = None, path: str = None, embedding_fn=None):
+    """
+    Collection dùng chung (cosine space), gắn embedding function của registry
+    """
+    name = name or settings.COLLECTION_NAME
+    key = (os.path.abspath(path or settings.VECTOR_DB_DIR), name)
+
+    with _lock:
+        collection = _collections.get(key)
+        if collection is None:
+            collection = get_client(path).get_or_create_collection(
+                name=name,
+                embedding_function=embedding_fn or get_embedding_function(),
+                metadata={"hnsw:space": "cosine"}
+            )
+            _collections[key] = collection
+        return collection
+
+
+# ================= REPORT =================
+
+def memory_report() -> dict:
+    """
+    RSS process + RSS tăng thêm lúc load / kích thước weight của từng model
+    """
+    with _lock:
+        models = {
+            f"{name}@{device}/{backend}": {
+                "rss_at_load_mb": ef.rss_mb,
+                "param_mb": ef.param_mb(),
+                "load_s": ef.load_s,
+                "encode_calls": ef.calls,
+            }
+            for (name, device, backend), ef in _models.items()
+        }
+        caches = {
+            f"{name}@{device}/{backend}": cached.stats()
+            for (name, device, backend), cached in _query_fns.items()
+        }
+
+    return {
+        "process_rss_mb": current_rss_mb(),
+        "models": models,
+        "embedding_cache": caches,
+        "clients": len(_clients),
+        "collections": len(_collections),
+    }
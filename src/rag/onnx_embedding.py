@@ -0,0 +1,208 @@
+# src/rag/onnx_embedding.py
+# Embedding backend ONNX Runtime (int8 dynamic quantization) – CPU
+# Export 1 lần từ sentence-transformers → query / index không cần torch
+
+import json
+import os
+import re
+
+import numpy as np
+
+from src.config.settings import settings
+from src.rag.model_registry import SharedEmbeddingFunction
+
+
+META_FILE = "embedding_meta.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+PARITY_MIN_COSINE = 0.99
+
+
+def model_dir(model_name: str, root: str = None) -> str:
+    slug = re.sub(r"[^\w.-]+", "__", model_name)
+    return os.path.join(root or settings.ONNX_MODEL_DIR, slug)
+
+
+def load_meta(out_dir: str):
+    path = os.path.join(out_dir, META_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ================= EXPORT =================
+
+def export_onnx(model_name: str = None, out_dir: str = None,
+                quantize: bool = None, opset: int = 17) -> dict:
+    """
+    sentence-transformers (torch) → ONNX (+ int8 dynamic quantization)
+    Cần torch + sentence-transformers, chỉ chạy 1 lần (hoặc khi đổi model)
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model_name = model_name or settings.EMBEDDING_MODEL
+    out_dir = out_dir or model_dir(model_name)
+    quantize = settings.ONNX_QUANTIZE if quantize is None else quantize
+    os.makedirs(out_dir, exist_ok=True)
+
+    st = SentenceTransformer(model_name_or_path=model_name, device="cpu")
+    pooling = st[1].get_pooling_mode_str() if len(st) > 1 else "mean"
+    if pooling != "mean" or len(st) > 2:
+        raise ValueError(f"{model_name}: chỉ hỗ trợ mean pooling, không normalize ({pooling})")
+
+    tokenizer = st.tokenizer
+    tokenizer.save_pretrained(out_dir)
+    if not os.path.exists(os.path.join(out_dir, TOKENIZER_FILE)):
+        raise ValueError(f"{model_name}: cần fast tokenizer (tokenizer.json)")
+
+    transformer = st[0].auto_model.eval()
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            ).last_hidden_state
+
+    sample = tokenizer(["Học phí ngành CNTT bao nhiêu?"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer),
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+
+    model_file = FP32_FILE
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(out_dir, INT8_FILE),
+            weight_type=QuantType.QInt8,
+        )
+        model_file = INT8_FILE
+
+    meta = {
+        "model_name": model_name,
+        "model_file": model_file,
+        "quantized": bool(quantize),
+        "pooling": "mean",
+        "max_length": min(st.max_seq_length or settings.EMBEDDING_MAX_LENGTH,
+                          settings.EMBEDDING_MAX_LENGTH),
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+    }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    return meta
+
+
+# ================= EMBEDDING FUNCTION =================
+
+class OnnxEmbeddingFunction(SharedEmbeddingFunction):
+    """
+    Cùng name() / config với SentenceTransformerEmbeddingFunction
+    → dùng được với collection đã index bằng torch (vector lệch < 1%)
+    - Tokenizer Rust (tokenizers), không import transformers / torch
+    - Sort theo độ dài trước khi chia batch → ít padding khi index
+    """
+
+    backend = "onnx"
+
+    def _load_model(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        out_dir = model_dir(self.model_name)
+        meta = load_meta(out_dir)
+        if meta is None or meta.get("model_name") != self.model_name:
+            print(f"📦 Chưa có ONNX cho {self.model_name} → export (1 lần)...")
+            meta = export_onnx(self.model_name, out_dir)
+
+        self.meta = meta
+        self.model_path = os.path.join(out_dir, meta["model_file"])
+
+        tokenizer = Tokenizer.from_file(os.path.join(out_dir, TOKENIZER_FILE))
+        tokenizer.enable_truncation(max_length=meta["max_length"])
+        tokenizer.enable_padding(pad_id=meta["pad_id"], pad_token=meta["pad_token"])
+        self._tokenizer = tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        session = ort.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in session.get_inputs()}
+        return session
+
+    def _encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        out = [None] * len(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batch_size = settings.ONNX_BATCH_SIZE
+
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self._tokenizer.encode_batch([texts[i] for i in idx])
+
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self._model.run(None, feeds)[0]
+
+            # mean pooling theo attention mask (giống sentence-transformers)
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+            for i, vec in zip(idx, pooled):
+                out[i] = vec.astype(np.float32)
+
+        return out
+
+    def param_mb(self) -> float:
+        if self._model is None:
+            return 0.0
+        return round(os.path.getsize(self.model_path) / (1024 * 1024), 1)
+
+    def release(self):
+        with self._encode_lock:
+            self._model = None
+            self._tokenizer = None
+
@@ -0,0 +1,186 @@
+# src/rag/rerank_features.py
+# Rerank features tính 1 lần lúc index (lưu trong chunk metadata)
+# → Query chỉ còn 1 lượt NumPy trên tập candidate, không regex / normalize lại
+
+import re
+
+import numpy as np
+
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.text_normalizer import normalize_text
+
+
+TUITION_KEYWORDS = [
+    "học phí", "hoc phi", "bao nhiêu tiền",
+    "chi phí", "đóng tiền", "phí"
+]
+
+# Lượt voice: nhóm "tuition" nằm trong INTENT_MATCHER (main.py) → quét 1 lần cùng
+# lệnh điều khiển; matcher riêng chỉ cho caller không truyền intents (warmup, bench)
+TUITION_MATCHER = KeywordMatcher({"tuition": TUITION_KEYWORDS})
+
+MONEY_PATTERN = re.compile(
+    r"\b(\d+(\.\d+)?\s?(triệu|tr|vnd|vnđ|đ))\b",
+    re.IGNORECASE
+)
+
+# Ranh giới câu: sau . ! ? (trừ số thập phân "1.5") hoặc xuống dòng
+SENTENCE_END = re.compile(r"(?<!\d)[.!?]+(?=\s|$)|\n")
+
+# Tăng khi đổi cách tính feature → chunk cũ tự tính lại lúc query
+FEATURE_VERSION = 2
+
+TRIM_MAX_CHARS = 800
+TRIM_BEFORE = 200
+TRIM_AFTER = 300
+
+# ---- trọng số (giữ nguyên như rerank cũ) ----
+BOOST_TUITION = 0.30
+BOOST_TUITION_NOTE = 0.15
+BOOST_MONEY = 0.10
+BOOST_AVAILABLE = 0.05
+BOOST_KEYWORD = 0.03
+BOOST_KEYWORD_MAX = 0.09
+
+
+# ================= INDEX TIME =================
+
+def compute_features(doc: str) -> dict:
+    """
+    doc → metadata fields (Chroma chỉ nhận str / int / float / bool)
+    - rf_money: có nhắc số tiền; rf_money_start/end: vị trí match đầu tiên
+    - rf_kw_hits: số TUITION_KEYWORDS có trong normalize_text(doc)
+    - rf_trim_start/end: đoạn trích tốt nhất (quanh số tiền / 800 ký tự đầu)
+    - rf_sents: ranh giới câu "start:end,..." (cho extractive answer)
+    """
+    match = MONEY_PATTERN.search(doc)
+    doc_norm = normalize_text(doc)
+
+    if len(doc) <= TRIM_MAX_CHARS:
+        trim = (0, len(doc))
+    elif match:
+        trim = (
+            max(0, match.start() - TRIM_BEFORE),
+            min(len(doc), match.end() + TRIM_AFTER),
+        )
+    else:
+        trim = (0, TRIM_MAX_CHARS)
+
+    return {
+        "rf_version": FEATURE_VERSION,
+        "rf_money": match is not None,
+        "rf_money_start": match.start() if match else -1,
+        "rf_money_end": match.end() if match else -1,
+        "rf_kw_hits": sum(1 for k in TUITION_KEYWORDS if k in doc_norm),
+        "rf_trim_start": trim[0],
+        "rf_trim_end": trim[1],
+        "rf_sents": ",".join(f"{a}:{b}" for a, b in sentence_spans(doc)),
+    }
+
+
+def sentence_spans(doc: str):
+    """
+    [(start, end)] của từng câu (đã bỏ khoảng trắng 2 đầu)
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(doc):
+        end = match.end()
+        a, b = start, end
+        while a < b and doc[a].isspace():
+            a += 1
+        while b > a and doc[b - 1].isspace():
+            b -= 1
+        if b > a:
+            spans.append((a, b))
+        start = end
+
+    tail = doc[start:].strip()
+    if tail:
+        a = doc.index(tail, start)
+        spans.append((a, a + len(tail)))
+    return spans
+
+
+def features_of(doc: str, meta: dict) -> dict:
+    """
+    Feature lưu sẵn; chunk index trước khi có feature → tính tại chỗ
+    """
+    if meta and meta.get("rf_version") == FEATURE_VERSION:
+        return meta
+    return compute_features(doc)
+
+
+def trim_doc(doc: str, feats: dict) -> str:
+    if len(doc) <= TRIM_MAX_CHARS:
+        return doc.strip()
+
+    text = doc[feats["rf_trim_start"]:feats["rf_trim_end"]].strip()
+    return text if feats["rf_money"] else text + "..."
+
+
+def sentences_of(doc: str, feats: dict) -> list:
+    """
+    Câu của chunk theo ranh giới tính sẵn (không split lại lúc query)
+    """
+    spans = feats.get("rf_sents")
+    if not spans:
+        return []
+    out = []
+    for span in spans.split(","):
+        a, b = span.split(":")
+        out.append(doc[int(a):int(b)])
+    return out
+
+
+# ================= QUERY TIME =================
+
+def score_candidates(distances, metadatas, feats, rrf=None,
+                     is_tuition_query: bool = False,
+                     rrf_weight: float = 0.0) -> np.ndarray:
+    """
+    Score toàn bộ candidate trong 1 lượt vector hoá
+    """
+    dist = np.asarray(distances, dtype=np.float64)
+    scores = np.maximum(0.0, 1.0 / (1.0 + dist))
+
+    # ---- hybrid fusion boost ----
+    if rrf is not None and len(rrf):
+        rrf = np.asarray(rrf, dtype=np.float64)
+        top = rrf.max()
+        if top:
+            scores += rrf_weight * rrf / top
+
+    # ---- intent boost ----
+    if is_tuition_query:
+        doc_type = np.array([m.get("doc_type") for m in metadatas], dtype=object)
+        scores += np.where(doc_type == "tuition", BOOST_TUITION, 0.0)
+        scores += np.where(doc_type == "tuition_note", BOOST_TUITION_NOTE, 0.0)
+
+    # ---- money / availability / keyword ----
+    money = np.fromiter((f["rf_money"] for f in feats), dtype=bool, count=len(feats))
+    available = np.fromiter(
+        (m.get("available") is True for m in metadatas), dtype=bool, count=len(feats)
+    )
+    hits = np.fromiter((f["rf_kw_hits"] for f in feats), dtype=np.float64, count=len(feats))
+
+    scores += money * BOOST_MONEY
+    scores += available * BOOST_AVAILABLE
+    scores += np.minimum(hits * BOOST_KEYWORD, BOOST_KEYWORD_MAX)
+
+    return scores
+
+
+def select_top(scores: np.ndarray, threshold: float, top_k: int):
+    """
+    Giống rerank cũ: giữ tối đa top_k * 2 candidate đầu tiên đạt threshold
+    (theo thứ tự retrieval), sort giảm dần theo score đã làm tròn
+    → (chỉ số candidate, score làm tròn)
+    """
+    keep = np.flatnonzero(scores >= threshold)[: top_k * 2]
+
+    # round() của Python (≤ top_k * 2 phần tử) → score trả về y hệt bản cũ
+    rounded = [round(float(s), 4) for s in scores[keep]]
+    order = sorted(range(len(keep)), key=lambda i: rounded[i], reverse=True)[:top_k]
+
+    return [int(keep[i]) for i in order], [rounded[i] for i in order]
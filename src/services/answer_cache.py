@@ -0,0 +1,306 @@
+# src/services/answer_cache.py
+# Semantic answer cache – tra theo embedding của câu hỏi đã normalize
+# Hit → bỏ qua Chroma + rerank + LLM
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config.settings import settings
+from src.rag.index_state import read_index_version
+
+
+ENTRY_OVERHEAD_BYTES = 200   # ước lượng dict + object overhead / entry
+
+
+class AnswerCache:
+    """
+    - Lookup: cosine(query_vec, các query cũ) >= threshold
+    - LRU + TTL, giới hạn số entry và bộ nhớ
+    - Lưu ra đĩa, load lại khi khởi động
+    - Tự xoá khi collection được re-index (index version đổi)
+      hoặc đổi embedding model / backend / số chiều vector
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        threshold: float = None,
+        ttl: float = None,
+        max_entries: int = None,
+        max_bytes: int = None,
+        model: str = None,
+    ):
+        self.path = path or settings.ANSWER_CACHE_FILE
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.ANSWER_CACHE_MAX_BYTES
+        # vector từ model khác không so cosine được với nhau
+        self.model = model or f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_BACKEND}"
+        self.dim = None              # biết khi có entry đầu tiên
+
+        # query → {"answer", "embedding", "created", "size"}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._matrix = None          # (n, dim) – build lại khi entries đổi
+        self._keys = []
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+        self.hits = 0
+        self.misses = 0
+
+        self.index_version = read_index_version()
+        self._load()
+
+        atexit.register(self.save)
+
+    # ================= PUBLIC =================
+
+    def lookup(self, embedding):
+        """
+        Trả về câu trả lời đã cache hoặc None
+        """
+        with self._lock:
+            self._check_index_version()
+
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            self._expire()
+
+            vec = self._normalize(embedding)
+            if not self._check_dim(vec):
+                self.misses += 1
+                return None
+
+            matrix = self._get_matrix()
+            if matrix is None:
+                self.misses += 1
+                return None
+
+            sims = matrix @ vec
+            best = int(np.argmax(sims))
+
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]["answer"]
+
+    def put(self, query: str, embedding, answer: str):
+        if not query or not answer:
+            return
+
+        with self._lock:
+            self._check_index_version()
+
+            if query in self._entries:
+                self._remove(query)
+
+            vec = self._normalize(embedding)
+            self._check_dim(vec)
+            self.dim = vec.shape[0]
+            size = (
+                vec.nbytes
+                + len(query.encode("utf-8"))
+                + len(answer.encode("utf-8"))
+                + ENTRY_OVERHEAD_BYTES
+            )
+
+            self._entries[query] = {
+                "answer": answer,
+                "embedding": vec,
+                "created": time.time(),
+                "size": size,
+            }
+            self._bytes += size
+            self._matrix = None
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+            self._dirty = True
+            should_save = time.time() - self._last_save > settings.ANSWER_CACHE_SAVE_INTERVAL
+
+        if should_save:
+            self.save()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self.dim = None
+            self._dirty = True
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    # ================= PERSIST =================
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+
+            keys = list(self._entries.keys())
+            meta = {
+                "index_version": self.index_version,
+                "model": self.model,
+                "dim": self.dim,
+                "entries": [
+                    {
+                        "query": k,
+                        "answer": self._entries[k]["answer"],
+                        "created": self._entries[k]["created"],
+                    }
+                    for k in keys
+                ],
+            }
+            if keys:
+                embeddings = np.stack([self._entries[k]["embedding"] for k in keys])
+            else:
+                embeddings = np.zeros((0, 0), dtype=np.float32)
+
+            self._dirty = False
+            self._last_save = time.time()
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    embeddings=embeddings,
+                    meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                )
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Answer cache save error: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with np.load(self.path) as data:
+                meta = json.loads(str(data["meta"]))
+                embeddings = data["embeddings"]
+        except Exception as e:
+            print(f"⚠️ Answer cache load error: {e}")
+            return
+
+        if meta.get("index_version") != self.index_version:
+            print("♻️ Answer cache cũ (index đã đổi) → bỏ qua")
+            self._dirty = True
+            return
+
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        if meta.get("model") != self.model or (
+            meta.get("entries") and meta.get("dim") != dim
+        ):
+            print("♻️ Answer cache cũ (embedding model đã đổi) → bỏ qua")
+            self._dirty = True
+            return
+        self.dim = meta.get("dim")
+
+        now = time.time()
+        for entry, vec in zip(meta.get("entries", []), embeddings):
+            if now - entry["created"] > self.ttl:
+                continue
+            size = (
+                vec.nbytes
+                + len(entry["query"].encode("utf-8"))
+                + len(entry["answer"].encode("utf-8"))
+                + ENTRY_OVERHEAD_BYTES
+            )
+            self._entries[entry["query"]] = {
+                "answer": entry["answer"],
+                "embedding": vec.astype(np.float32),
+                "created": entry["created"],
+                "size": size,
+            }
+            self._bytes += size
+
+        print(f"💾 Answer cache: {len(self._entries)} entries")
+
+    # ================= INTERNAL =================
+
+    def _check_index_version(self):
+        version = read_index_version()
+        if version != self.index_version:
+            print("♻️ Index thay đổi → xoá answer cache")
+            self.index_version = version
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self.dim = None
+            self._dirty = True
+
+    def _check_dim(self, vec) -> bool:
+        """
+        Vector khác số chiều với entry đã cache (model đổi lúc chạy)
+        → xoá cache thay vì để matrix @ vec ném ValueError
+        """
+        if self.dim is None or not self._entries or vec.shape[0] == self.dim:
+            return True
+        print(f"♻️ Embedding {vec.shape[0]} chiều ≠ cache {self.dim} chiều → xoá answer cache")
+        self._entries.clear()
+        self._bytes = 0
+        self._matrix = None
+        self.dim = None
+        self._dirty = True
+        return False
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            k for k, e in self._entries.items()
+            if now - e["created"] > self.ttl
+        ]
+        for k in expired:
+            self._remove(k)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        self._matrix = None
+        self._dirty = True
+
+    def _get_matrix(self):
+        if self._matrix is None and self._entries:
+            self._keys = list(self._entries.keys())
+            self._matrix = np.stack(
+                [self._entries[k]["embedding"] for k in self._keys]
+            )
+        return self._matrix
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
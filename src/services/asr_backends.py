@@ -0,0 +1,295 @@
+# src/services/asr_backends.py
+# Pluggable ASR backends – OpenAI API | Local Faster-Whisper (CPU int8)
+# Streaming: nhận frame từ VAD khi user còn đang nói → partial / final
+
+import threading
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.audio_utils import encode_wav
+
+
+# ======================================================
+# STREAM (1 câu nói)
+# ======================================================
+class ASRStream:
+    """
+    Phiên nhận dạng cho 1 câu nói
+    - accept(frame): đẩy audio khi user còn đang nói
+    - partial(): transcript tạm thời
+    - finalize(): transcript cuối cùng (sau khi VAD chốt endpoint)
+    """
+
+    def __init__(self, backend, sample_rate: int, on_partial=None):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+
+        self._frames = []
+        self._lock = threading.Lock()
+
+    def accept(self, frame: np.ndarray):
+        # Frame thường là view zero-copy trong ring của mic → copy trước khi giữ lại,
+        # worker partial / finalize đọc sau khi ring đã quay vòng ghi đè
+        frame = np.array(frame, dtype=np.float32, copy=True)
+        with self._lock:
+            self._frames.append(frame)
+
+    def audio(self) -> np.ndarray:
+        with self._lock:
+            if not self._frames:
+                return np.zeros(0, dtype=np.float32)
+            return np.concatenate(self._frames)
+
+    def partial(self) -> str:
+        return ""
+
+    def finalize(self) -> str:
+        audio = self.audio()
+        if audio.size == 0:
+            return ""
+        return self.backend.transcribe(audio, self.sample_rate)
+
+    def cancel(self):
+        with self._lock:
+            self._frames = []
+
+
+# ======================================================
+# BACKEND INTERFACE
+# ======================================================
+class ASRBackend:
+    name = "base"
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate: int, on_partial=None) -> ASRStream:
+        # Mặc định: gom audio, decode 1 lần khi finalize
+        return ASRStream(self, sample_rate, on_partial)
+
+
+# ======================================================
+# OPENAI (whisper-1 API)
+# ======================================================
+class OpenAIASRBackend(ASRBackend):
+    name = "openai"
+
+    def __init__(self, client=None, model: str = None, language: str = "vi"):
+        if client is None:
+            from src.services.http_pool import get_openai_client
+            client = get_openai_client(settings.ASR_DEADLINE)
+
+        self.client = client
+        self.model = model or settings.OPENAI_ASR_MODEL
+        self.language = language
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        # 🔑 ABSOLUTE FIX: prepend 300ms silence
+        silence = np.zeros(int(sample_rate * 0.3), dtype=np.float32)
+        audio = np.concatenate([silence, audio])
+
+        # WAV trong RAM → upload thẳng, không ghi file tạm
+        result = self.client.audio.transcriptions.create(
+            model=self.model,
+            file=encode_wav(audio, sample_rate),
+            language=self.language,
+            temperature=0.0,
+        )
+        return result.text.strip()
+
+
+# ======================================================
+# LOCAL FASTER-WHISPER (CTranslate2)
+# ======================================================
+class LocalWhisperASRBackend(ASRBackend):
+    """
+    Faster-Whisper chạy local (mặc định CPU int8)
+    - Không round-trip mạng mỗi lượt
+    - decoder: inject model khác (test / stub), cần có .transcribe()
+      trả về (segments, info) giống faster_whisper.WhisperModel
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_size: str = None,
+        device: str = None,
+        compute_type: str = None,
+        language: str = "vi",
+        decoder=None,
+    ):
+        self.language = language
+
+        if decoder is None:
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError as e:
+                raise RuntimeError(
+                    "ASR_PROVIDER=local cần faster-whisper: pip install faster-whisper"
+                ) from e
+
+            decoder = WhisperModel(
+                model_size or settings.ASR_MODEL,
+                device=device or settings.ASR_DEVICE,
+                compute_type=compute_type or settings.ASR_COMPUTE_TYPE,
+                cpu_threads=settings.ASR_CPU_THREADS,
+            )
+
+        self.model = decoder
+
+        # CTranslate2 model: 1 decode tại 1 thời điểm
+        self._lock = threading.Lock()
+
+    def decode_segments(self, audio: np.ndarray, vad_filter: bool = False):
+        """
+        Trả về list (start, end, text) – thời gian tính theo giây
+        """
+        kwargs = {
+            "language": self.language,
+            "beam_size": 1,
+            "condition_on_previous_text": False,
+            "vad_filter": vad_filter,
+        }
+        if vad_filter:
+            kwargs["vad_parameters"] = {
+                "min_silence_duration_ms": settings.WHISPER_VAD_MIN_SILENCE_MS
+            }
+
+        with self._lock:
+            segments, _ = self.model.transcribe(audio, **kwargs)
+            # segments là generator → decode thật sự xảy ra ở đây
+            return [(s.start, s.end, s.text.strip()) for s in segments]
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        if sample_rate != 16000:
+            raise ValueError("Faster-Whisper cần audio 16 kHz")
+
+        segments = self.decode_segments(audio, vad_filter=settings.WHISPER_VAD)
+        return " ".join(t for _, _, t in segments if t).strip()
+
+    def start_stream(self, sample_rate: int, on_partial=None) -> ASRStream:
+        return LocalWhisperStream(self, sample_rate, on_partial)
+
+
+class LocalWhisperStream(ASRStream):
+    """
+    Decode dần trong lúc user còn nói:
+    - Mỗi ASR_PARTIAL_INTERVAL giây decode phần audio chưa chốt → partial
+    - Segment kết thúc trước mép audio >= ASR_COMMIT_MARGIN và giống lần decode
+      trước (text + end time) → chốt, kể cả câu chỉ có 1 segment
+      → lần decode sau chỉ còn phần đuôi
+    → Khi VAD chốt endpoint, finalize() chỉ phải decode đoạn ngắn còn lại
+    """
+
+    def __init__(self, backend, sample_rate: int, on_partial=None):
+        super().__init__(backend, sample_rate, on_partial)
+
+        self.partial_interval = settings.ASR_PARTIAL_INTERVAL
+        self.commit_margin = settings.ASR_COMMIT_MARGIN
+        self.commit_tolerance = settings.ASR_COMMIT_TOLERANCE
+
+        self._committed_text = []
+        self._committed_pos = 0      # sample index đã chốt
+        self._last_segments = []     # lần decode trước (cùng gốc _committed_pos)
+        self._partial = ""
+
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def partial(self) -> str:
+        return self._partial
+
+    # ---------------- WORKER ----------------
+
+    def _run(self):
+        decoded_len = 0
+        min_new = int(self.partial_interval * self.sample_rate)
+
+        while not self._closed.wait(timeout=self.partial_interval):
+            audio = self.audio()
+            if len(audio) - decoded_len < min_new:
+                continue
+
+            decoded_len = len(audio)
+            try:
+                self._decode_pending(audio)
+            except Exception as e:
+                print(f"⚠️ Partial ASR error: {e}")
+
+    def _decode_pending(self, audio: np.ndarray):
+        pending = audio[self._committed_pos:]
+        segments = self.backend.decode_segments(pending)
+        previous, self._last_segments = self._last_segments, segments
+        if not segments:
+            return
+
+        stable = self._stable_prefix(segments, previous, len(pending) / self.sample_rate)
+        if stable:
+            self._committed_text.extend(t for _, _, t in segments[:stable] if t)
+            self._committed_pos += int(segments[stable - 1][1] * self.sample_rate)
+            self._last_segments = []             # gốc thời gian đổi
+            segments = segments[stable:]
+
+        tail = " ".join(t for _, _, t in segments if t)
+        self._partial = " ".join(self._committed_text + [tail]).strip()
+
+        if self.on_partial and self._partial:
+            self.on_partial(self._partial)
+
+    def _stable_prefix(self, segments, previous, pending_s: float) -> int:
+        """
+        Số segment đầu được chốt: kết thúc cách mép audio >= commit_margin
+        (whisper không còn sửa) và lần decode trước ra cùng text, cùng end time
+        """
+        n = 0
+        for i, (_, end, text) in enumerate(segments):
+            if end > pending_s - self.commit_margin or i >= len(previous):
+                break
+            _, prev_end, prev_text = previous[i]
+            if prev_text != text or abs(prev_end - end) > self.commit_tolerance:
+                break
+            n = i + 1
+        return n
+
+    # ---------------- FINAL ----------------
+
+    def finalize(self) -> str:
+        self._stop_worker()
+
+        audio = self.audio()
+        tail_audio = audio[self._committed_pos:]
+
+        texts = list(self._committed_text)
+        if tail_audio.size > 0:
+            texts.extend(
+                t for _, _, t in self.backend.decode_segments(tail_audio) if t
+            )
+
+        return " ".join(texts).strip()
+
+    def cancel(self):
+        self._stop_worker()
+        super().cancel()
+
+    def _stop_worker(self):
+        self._closed.set()
+        if self._worker.is_alive() and self._worker is not threading.current_thread():
+            self._worker.join()
+
+
+# ======================================================
+# FACTORY
+# ======================================================
+def create_asr_backend(provider: str = None) -> ASRBackend:
+    provider = (provider or settings.ASR_PROVIDER).lower()
+
+    if provider == "local":
+        return LocalWhisperASRBackend()
+    if provider == "openai":
+        return OpenAIASRBackend()
+
+    raise ValueError(f"Unknown ASR_PROVIDER: {provider}")
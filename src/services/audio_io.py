@@ -0,0 +1,269 @@
+# src/services/audio_io.py
+# Audio I/O dài hạn: InputStream / OutputStream mở 1 lần, PortAudio callback
+# đẩy / kéo PCM qua ring buffer cấp phát sẵn → không mở lại ALSA mỗi lượt,
+# không copy frame, đếm xrun + frame bị bỏ thay vì âm thầm nuốt mất
+
+import threading
+import time
+
+import numpy as np
+
+
+class AudioRing:
+    """
+    Ring buffer float32 cấp phát sẵn, ghi đôi (i và i + capacity)
+    → mọi đoạn <= capacity sample là 1 view liên tục (zero-copy)
+    - Vị trí là chỉ số tuyệt đối (tổng sample đã ghi), không quay vòng
+    - View chỉ hợp lệ khi chưa bị ghi đè (trong vòng capacity sample)
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity, dtype=np.float32)
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        cap = self.capacity
+        if n > cap:
+            samples = samples[-cap:]
+            self.written += n - cap
+            n = cap
+
+        start = self.written % cap
+        first = min(n, cap - start)
+        self._buf[start:start + first] = samples[:first]
+        self._buf[start + cap:start + cap + first] = samples[:first]
+
+        rest = n - first
+        if rest:
+            self._buf[:rest] = samples[first:]
+            self._buf[cap:cap + rest] = samples[first:]
+
+        self.written += n
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.written - self.capacity)
+
+    def view(self, start: int, end: int) -> np.ndarray:
+        """
+        Đoạn [start, end) → view read-only, không copy
+        """
+        if start < self.oldest or end > self.written or end - start > self.capacity:
+            raise IndexError(f"audio [{start}, {end}) ngoài ring "
+                             f"[{self.oldest}, {self.written})")
+
+        offset = start % self.capacity
+        out = self._buf[offset:offset + (end - start)]
+        out.flags.writeable = False
+        return out
+
+
+# ======================================================
+# INPUT
+# ======================================================
+class AudioInput:
+    """
+    Mic mở liên tục, callback ghi vào AudioRing
+    - Reader giữ con trỏ riêng (pos), đọc frame bằng read(pos, n)
+    - xruns: PortAudio báo input overflow (sample mất ở driver)
+    - dropped_frames: reader chậm hơn cả ring → nhảy tới hiện tại
+    """
+
+    def __init__(self, sample_rate: int, frame_size: int,
+                 ring_seconds: float = 60.0, device=None):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.device = device
+        self.ring = AudioRing(int(sample_rate * ring_seconds))
+
+        self._cond = threading.Condition()
+        self._stream = None
+        self._closed = False
+
+        self.xruns = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        if self._stream is not None:
+            return
+        self._closed = False
+        # PortAudio load lazy → replay harness / test dùng fake không cần sounddevice
+        import sounddevice as sd
+
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.frame_size,
+            device=self.device,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.xruns += 1
+        self.ring.write(indata[:, 0])
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def latency(self) -> float:
+        return self._stream.latency if self._stream is not None else 0.0
+
+    def position(self) -> int:
+        return self.ring.written
+
+    def read(self, pos: int, n: int = None, timeout: float = 0.1):
+        """
+        → (view [pos, pos + n), pos mới) | (None, pos) nếu hết timeout
+        """
+        n = n or self.frame_size
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._closed or self.ring.written >= pos + n,
+                timeout=timeout
+            )
+        if not ready or self._closed:
+            return None, pos
+
+        oldest = self.ring.oldest
+        if pos < oldest:
+            self.dropped_frames += (self.ring.written - n - pos) // n
+            pos = self.ring.written - n
+
+        return self.ring.view(pos, pos + n), pos + n
+
+    def capture_time(self, pos: int) -> float:
+        """
+        Thời điểm (monotonic) sample pos vào mic
+        """
+        return time.monotonic() - (self.ring.written - pos) / self.sample_rate - self.latency
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
+
+
+# ======================================================
+# OUTPUT
+# ======================================================
+class AudioOutput:
+    """
+    Loa mở liên tục, callback kéo PCM từ ring (thiếu → phát silence)
+    - write() chờ khi ring đầy → buffer_seconds giới hạn độ trễ tới loa
+    - flush(): bỏ phần chưa phát (barge-in) | drain(): chờ phát hết
+    - underflows: đang phát mà ring cạn (TTS / writer không kịp)
+    - xruns: PortAudio báo output underflow
+    """
+
+    def __init__(self, sample_rate: int, blocksize: int = 512,
+                 buffer_seconds: float = 0.5, device=None):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.device = device
+
+        self.capacity = max(int(sample_rate * buffer_seconds), 2 * blocksize)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._read = 0
+        self._write = 0
+        self._active = False         # đang giữa 1 lượt phát
+
+        self._cond = threading.Condition()
+        self._stream = None
+
+        self.xruns = 0
+        self.underflows = 0
+
+    def start(self):
+        if self._stream is not None:
+            return
+        import sounddevice as sd
+
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.blocksize,
+            device=self.device,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.xruns += 1
+
+        out = outdata[:, 0]
+        with self._cond:
+            n = min(self._write - self._read, frames)
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out[:first] = self._buf[start:start + first]
+            out[first:n] = self._buf[:n - first]
+            out[n:] = 0.0
+
+            if n < frames and self._active:
+                self.underflows += 1
+            self._read += n
+            self._cond.notify_all()
+
+    @property
+    def latency(self) -> float:
+        return self._stream.latency if self._stream is not None else 0.0
+
+    def pending_seconds(self) -> float:
+        return (self._write - self._read) / self.sample_rate
+
+    def write(self, data: np.ndarray, stop_event: threading.Event = None) -> bool:
+        """
+        Ghi vào ring (chờ khi đầy); stop_event set giữa chừng → False
+        """
+        pos = 0
+        total = len(data)
+        while pos < total:
+            with self._cond:
+                free = self.capacity - (self._write - self._read)
+                if free == 0:
+                    self._cond.wait(timeout=0.05)
+                    if stop_event is not None and stop_event.is_set():
+                        return False
+                    continue
+
+                n = min(free, total - pos)
+                start = self._write % self.capacity
+                first = min(n, self.capacity - start)
+                self._buf[start:start + first] = data[pos:pos + first]
+                self._buf[:n - first] = data[pos + first:pos + n]
+                self._write += n
+                self._active = True
+            pos += n
+        return True
+
+    def flush(self):
+        with self._cond:
+            self._read = self._write
+            self._active = False
+            self._cond.notify_all()
+
+    def drain(self, stop_event: threading.Event = None):
+        with self._cond:
+            self._active = False     # phần đuôi ngắn hơn 1 block không tính underflow
+            while self._write > self._read:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                self._cond.wait(timeout=0.05)
+
+    def close(self):
+        self.flush()
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
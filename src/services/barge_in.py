@@ -0,0 +1,178 @@
+# src/services/barge_in.py
+# Barge-in (full duplex): mic mở cả lúc loa phát
+# - EchoSuppressor: lấy tín hiệu đang phát làm reference, chặn frame chỉ có echo
+# - StopWordDetector: nhận "dừng" local từ đoạn audio ngắn, không qua mạng
+# - InterruptStats: đo độ trễ từ lúc nói xong → tắt loa
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.text_normalizer import normalize_text
+
+
+STOP_WORDS = ["dừng", "stop"]
+
+REF_HOP = 0.01               # reference lưu theo từng 10 ms
+
+
+# ======================================================
+# ECHO SUPPRESSION
+# ======================================================
+class EchoSuppressor:
+    """
+    Echo suppressor dạng năng lượng (không cần AEC đầy đủ):
+    - push_reference(): mỗi block ghi ra loa → RMS theo 10 ms + thời điểm phát
+    - process(): mic frame nhỏ hơn margin * (coupling * reference) → coi là echo,
+      trả về frame 0 để VAD không kích hoạt; lớn hơn → người dùng đang nói chen
+    - coupling (loa → mic) tự học trên các frame chỉ có echo
+    """
+
+    def __init__(self, max_delay: float = None, margin: float = None,
+                 adapt: float = 0.05):
+        self.max_delay = max_delay or settings.ECHO_MAX_DELAY
+        self.margin = margin or settings.ECHO_MARGIN
+        self.adapt = adapt
+        self.coupling = 0.5
+
+        self._ref = deque(maxlen=int(2.0 / REF_HOP))    # (t, rms), ~2 s
+        self._lock = threading.Lock()
+
+        self.suppressed = 0
+        self.passed = 0
+
+    def push_reference(self, samples: np.ndarray, fs: int, t_play: float):
+        hop = max(1, int(fs * REF_HOP))
+        n = len(samples) // hop
+        if n == 0:
+            return
+
+        blocks = np.asarray(samples[: n * hop], dtype=np.float32).reshape(n, hop)
+        rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+
+        with self._lock:
+            for i, value in enumerate(rms):
+                self._ref.append((t_play + i * REF_HOP, float(value)))
+
+    def reference_level(self, t0: float, t1: float) -> float:
+        with self._lock:
+            levels = [r for t, r in self._ref if t0 <= t <= t1]
+        return max(levels) if levels else 0.0
+
+    def process(self, frame: np.ndarray, t_frame: float):
+        """
+        → (frame sau khi xử lý, True nếu là echo)
+        """
+        ref = self.reference_level(t_frame - self.max_delay, t_frame)
+        if ref < 1e-4:
+            return frame, False
+
+        mic = float(np.sqrt(np.mean(frame * frame)))
+        if mic < self.margin * self.coupling * ref:
+            ratio = min(mic / ref, 4.0)
+            self.coupling += self.adapt * (ratio - self.coupling)
+            self.suppressed += 1
+            return np.zeros_like(frame), True
+
+        self.passed += 1
+        return frame, False
+
+    def clear(self):
+        with self._lock:
+            self._ref.clear()
+
+
+# ======================================================
+# STOP WORD
+# ======================================================
+class StopWordDetector:
+    """
+    Nhận stop word từ đoạn barge-in ngắn (<= BARGE_IN_MAX_SECONDS)
+    - ASR local → transcript của chính ASR stream (shared, không decode thêm)
+    - ASR OpenAI → Faster-Whisper nhỏ (STOP_WORD_MODEL) decode local, không qua mạng
+    """
+
+    def __init__(self, asr_backend=None, stop_words=None):
+        self.stop_words = stop_words or STOP_WORDS
+        self.shared = getattr(asr_backend, "name", "") == "local"
+        self._backend = asr_backend if self.shared else None
+        self._lock = threading.Lock()
+        self.available = True
+
+    def matches(self, text: str) -> bool:
+        text = normalize_text(text)
+        return any(w in text for w in self.stop_words)
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        backend = self._get_backend()
+        if backend is None:
+            return ""
+        return backend.transcribe(audio, sample_rate)
+
+    def _get_backend(self):
+        with self._lock:
+            if self._backend is None and self.available:
+                try:
+                    from src.services.asr_backends import LocalWhisperASRBackend
+
+                    self._backend = LocalWhisperASRBackend(
+                        model_size=settings.STOP_WORD_MODEL
+                    )
+                except Exception as e:
+                    print(f"⚠️ Stop-word detector tắt: {e}")
+                    self.available = False
+            return self._backend
+
+
+# ======================================================
+# LATENCY
+# ======================================================
+class InterruptStats:
+    """
+    detect: nói xong → nhận ra stop word (gồm endpoint + decode)
+    halt:   nhận ra → output stream thật sự dừng
+    """
+
+    def __init__(self):
+        self.events = []
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def detected(self, speech_end: float, t_detect: float = None):
+        with self._lock:
+            self._pending = (speech_end, t_detect or time.monotonic())
+
+    def halted(self, t_halt: float = None):
+        with self._lock:
+            if self._pending is None:
+                return None
+            speech_end, t_detect = self._pending
+            self._pending = None
+
+            t_halt = t_halt or time.monotonic()
+            event = {
+                "detect_ms": round((t_detect - speech_end) * 1000, 1),
+                "halt_ms": round((t_halt - t_detect) * 1000, 1),
+                "total_ms": round((t_halt - speech_end) * 1000, 1),
+            }
+            self.events.append(event)
+            return event
+
+    def summary(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+        if not events:
+            return {"count": 0}
+
+        out = {"count": len(events)}
+        for key in ("detect_ms", "halt_ms", "total_ms"):
+            values = np.array([e[key] for e in events])
+            out[key] = {
+                "p50": round(float(np.percentile(values, 50)), 1),
+                "p95": round(float(np.percentile(values, 95)), 1),
+                "max": round(float(values.max()), 1),
+            }
+        return out
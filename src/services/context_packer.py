@@ -0,0 +1,197 @@
+# src/services/context_packer.py
+# Đóng gói context RAG theo ngân sách token
+# - Đếm token: tiktoken (nếu có) theo model LLM, không có → ước lượng theo âm tiết
+# - Bỏ phần overlap giữa các chunk liền kề (splitter overlap 180 ký tự)
+#   + câu trùng hẳn giữa các doc
+# - Điền budget theo score: doc tốt trước, doc không vừa → cắt ở ranh giới câu
+
+import re
+
+from src.config.settings import settings
+
+
+WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+SENTENCE_RE = re.compile(r"(?<=[.!?\n])\s+")
+SPACE_RE = re.compile(r"\s+")
+
+_encoder = None
+_encoder_ready = False
+
+
+# ======================================================
+# TOKEN COUNT
+# ======================================================
+def _get_encoder():
+    global _encoder, _encoder_ready
+
+    if not _encoder_ready:
+        _encoder_ready = True
+        try:
+            import tiktoken
+
+            try:
+                _encoder = tiktoken.encoding_for_model(settings.OPENAI_LLM_MODEL)
+            except KeyError:
+                _encoder = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoder = None      # ước lượng: tiếng Việt ~ 1 token / âm tiết
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return len(WORD_RE.findall(text))
+
+
+# ======================================================
+# DEDUP
+# ======================================================
+def _overlap_head(kept: str, text: str, min_overlap: int) -> int:
+    """
+    Độ dài đoạn đầu của text trùng với đoạn cuối của kept (0 = không trùng)
+    """
+    probe = text[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+
+    pos = kept.find(probe)
+    while pos != -1:
+        tail = kept[pos:]
+        if text.startswith(tail):
+            return len(tail)
+        pos = kept.find(probe, pos + 1)
+    return 0
+
+
+def _overlap_tail(kept: str, text: str, min_overlap: int) -> int:
+    """
+    Độ dài đoạn cuối của text trùng với đoạn đầu của kept
+    """
+    probe = kept[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+
+    pos = text.find(probe)
+    while pos != -1:
+        tail = text[pos:]
+        if kept.startswith(tail):
+            return len(tail)
+        pos = text.find(probe, pos + 1)
+    return 0
+
+
+def strip_overlap(text: str, kept: list, min_overlap: int) -> str:
+    """
+    Bỏ phần text đã có trong các block đã chọn:
+    nằm trọn trong block khác | đầu trùng cuối block khác | cuối trùng đầu block khác
+    """
+    for block in kept:
+        if text in block:
+            return ""
+
+        head = _overlap_head(block, text, min_overlap)
+        if head:
+            text = text[head:].lstrip()
+
+        tail = _overlap_tail(block, text, min_overlap)
+        if tail:
+            text = text[: len(text) - tail].rstrip()
+
+        if not text:
+            return ""
+    return text
+
+
+def _sentence_keys(text: str):
+    return {s.strip().lower() for s in SENTENCE_RE.split(text) if s.strip()}
+
+
+def _drop_seen_sentences(text: str, seen: set) -> str:
+    kept = []
+    for sentence in SENTENCE_RE.split(text):
+        key = sentence.strip().lower()
+        if key and key not in seen:
+            kept.append(sentence.strip())
+    return " ".join(kept)
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Giữ các câu đầu vừa budget (không cắt giữa câu)
+    """
+    out = []
+    used = 0
+    for sentence in SENTENCE_RE.split(text):
+        n = count_tokens(sentence)
+        if used + n > budget:
+            break
+        out.append(sentence)
+        used += n
+    return " ".join(out)
+
+
+# ======================================================
+# PACK
+# ======================================================
+def pack_context(retrieved_docs: dict, budget: int = None, min_overlap: int = None,
+                 min_block_tokens: int = None):
+    """
+    → (context, stats)
+    stats: tokens_in (tổng doc gốc), tokens_out, saved_overlap, saved_budget, docs, dropped
+    """
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+    min_overlap = min_overlap or settings.CONTEXT_MIN_OVERLAP
+    min_block_tokens = min_block_tokens or settings.CONTEXT_MIN_BLOCK_TOKENS
+
+    docs = retrieved_docs.get("documents", [[]])[0]
+    scores = (retrieved_docs.get("scores") or [[]])[0]
+    stats = {"tokens_in": 0, "tokens_out": 0, "saved_overlap": 0,
+             "saved_budget": 0, "docs": 0, "dropped": 0}
+
+    if not docs:
+        return "", stats
+
+    # Retrieval đã sắp theo score; có "scores" thì sắp lại cho chắc
+    order = list(range(len(docs)))
+    if len(scores) == len(docs):
+        order.sort(key=lambda i: scores[i], reverse=True)
+
+    blocks = []
+    seen = set()
+    used = 0
+
+    for i in order:
+        raw = SPACE_RE.sub(" ", docs[i]).strip()
+        raw_tokens = count_tokens(raw)
+        stats["tokens_in"] += raw_tokens
+
+        text = strip_overlap(raw, blocks, min_overlap)
+        text = _drop_seen_sentences(text, seen) if text else ""
+        tokens = count_tokens(text)
+        stats["saved_overlap"] += raw_tokens - tokens
+
+        if not tokens:
+            stats["dropped"] += 1
+            continue
+
+        remaining = budget - used
+        if tokens > remaining:
+            cut = _truncate_to_tokens(text, remaining) if remaining >= min_block_tokens else ""
+            cut_tokens = count_tokens(cut)
+            stats["saved_budget"] += tokens - cut_tokens
+            if not cut_tokens:
+                stats["dropped"] += 1
+                continue
+            text, tokens = cut, cut_tokens
+
+        blocks.append(text)
+        seen |= _sentence_keys(text)
+        used += tokens
+
+    stats["tokens_out"] = used
+    stats["docs"] = len(blocks)
+    return "\n\n".join(blocks), stats
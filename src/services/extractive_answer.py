@@ -0,0 +1,196 @@
+# src/services/extractive_answer.py
+# Fast path không qua LLM cho câu hỏi tra cứu rõ ràng (vd: học phí)
+# - Chỉ trả lời khi chunk đầu đúng loại, score cao và cách xa chunk thứ 2
+# - Chọn câu từ ranh giới câu tính sẵn lúc index (rf_sents) → không split lại
+# - Không đủ tự tin → None, caller gọi LLMService như bình thường
+
+import re
+import time
+
+from src.config.settings import settings
+from src.rag.rerank_features import MONEY_PATTERN, TUITION_KEYWORDS
+from src.utils.keyword_matcher import KeywordMatcher
+from src.utils.tracing import tracer
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Từ hỏi / hư từ – không dùng để khớp câu
+STOPWORDS = {
+    "bao", "nhiêu", "là", "của", "cho", "thì", "có", "không", "ạ", "vậy", "nhỉ",
+    "mình", "em", "tôi", "bạn", "ơi", "với", "và", "ở", "tại", "trường", "đại",
+    "học", "fpt", "một", "mấy", "gì", "nào", "năm", "hiện", "nay", "cần", "muốn",
+    "hỏi", "biết", "xin", "được", "khoảng", "ngành", "chuyên", "hệ",
+}
+
+# intent → điều kiện + template giọng nói
+INTENTS = {
+    "tuition": {
+        "keywords": TUITION_KEYWORDS,
+        "doc_types": ("tuition",),
+        "pattern": MONEY_PATTERN,
+        "subject": "học phí",
+        # câu trích không nhắc subject → thêm đầu câu (title khi khớp nhờ title)
+        "lead": "Về học phí, ",
+        "lead_title": "Học phí {title}: ",
+    },
+}
+
+# Chỉ dùng khi caller không truyền intents của lượt
+INTENT_KEYWORDS = KeywordMatcher({name: spec["keywords"] for name, spec in INTENTS.items()})
+
+# Viết lại cho TTS đọc tự nhiên
+SPOKEN = [
+    (re.compile(r"^(Tiêu đề|Nội dung|Tóm tắt)\s*:\s*", re.IGNORECASE), ""),
+    (re.compile(r"^[-•*+]\s*"), ""),
+    (re.compile(r"\s*/\s*(kỳ|năm|tháng|tín chỉ)\b", re.IGNORECASE), r" mỗi \1"),
+    (re.compile(r"(\d)\s?tr\b", re.IGNORECASE), r"\1 triệu"),
+    (re.compile(r"(\d)\s?(vnđ|vnd|đ)\b", re.IGNORECASE), r"\1 đồng"),
+    (re.compile(r"[#*_>`|]"), ""),
+]
+
+
+def _words(text: str) -> set:
+    return set(WORD_RE.findall(text.lower()))
+
+
+def _spoken(sentence: str) -> str:
+    for pattern, repl in SPOKEN:
+        sentence = pattern.sub(repl, sentence)
+    sentence = re.sub(r"\s+", " ", sentence).strip()
+    if sentence and sentence[-1] not in ".!?":
+        sentence += "."
+    return sentence
+
+
+class ExtractiveAnswerer:
+    """
+    answer(query, retrieved) → câu trả lời | None (→ LLM)
+    Thống kê hit rate + latency tiết kiệm (so với p50 LLM đo được trong tracer)
+    """
+
+    def __init__(self):
+        self.min_score = settings.EXTRACTIVE_MIN_SCORE
+        self.min_margin = settings.EXTRACTIVE_MIN_MARGIN
+        self.min_overlap = settings.EXTRACTIVE_MIN_OVERLAP
+        self.max_sentences = settings.EXTRACTIVE_MAX_SENTENCES
+
+        self.turns = 0
+        self.hits = 0
+        self.saved_ms = 0.0
+
+    # ================= PUBLIC =================
+
+    def answer(self, query: str, retrieved: dict, intents=None):
+        """
+        intents: intent của lượt (keyword + embedding, controller);
+        None → tự quét keyword trên query
+        """
+        t0 = time.monotonic()
+        self.turns += 1
+
+        with tracer.span("extractive") as span:
+            if intents is None:
+                intents = INTENT_KEYWORDS.groups(query)
+            text, reason = self._answer(query, retrieved, intents)
+            span.set(hit=text is not None, reason=reason)
+
+        elapsed_ms = (time.monotonic() - t0) * 1000
+        if text is None:
+            if settings.LOG_LATENCY:
+                print(f"↪️ Extractive miss ({reason}) → LLM | hit {self.hits}/{self.turns}")
+            return None
+
+        self.hits += 1
+        llm_span = "llm.first_sentence" if settings.LLM_STREAMING else "llm.generate"
+        llm_ms = tracer.percentile(llm_span, 50)
+        saved = None if llm_ms is None else max(0.0, llm_ms - elapsed_ms)
+        if saved is not None:
+            self.saved_ms += saved
+
+        if settings.LOG_LATENCY:
+            saved_txt = "n/a (chưa có số đo LLM)" if saved is None else f"~{saved:.0f} ms"
+            print(f"⚡ Extractive hit ({elapsed_ms:.1f} ms, tiết kiệm {saved_txt}) "
+                  f"| hit {self.hits}/{self.turns}")
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.turns, 3) if self.turns else 0.0,
+            "saved_ms": round(self.saved_ms, 1),
+        }
+
+    # ================= CORE =================
+
+    def _answer(self, query: str, retrieved: dict, intents: set):
+        """
+        → (text | None, lý do)
+        """
+        intent = next((name for name in INTENTS if name in intents), None)
+        if intent is None:
+            return None, "intent"
+        spec = INTENTS[intent]
+
+        docs = retrieved.get("documents", [[]])[0]
+        metas = retrieved.get("metadatas", [[]])[0]
+        scores = (retrieved.get("scores") or [[]])[0]
+        sentences = (retrieved.get("sentences") or [[]])[0]
+        if not docs or not scores or not sentences:
+            return None, "no_doc"
+
+        meta = metas[0] or {}
+        if meta.get("doc_type") not in spec["doc_types"]:
+            return None, "doc_type"
+        if scores[0] < self.min_score:
+            return None, "score"
+        if len(scores) > 1 and scores[0] - scores[1] < self.min_margin:
+            return None, "margin"
+
+        candidates = [s for s in sentences[0] if spec["pattern"].search(s)]
+        if not candidates:
+            return None, "no_match"
+
+        # Từ nội dung của câu hỏi (tên ngành, hệ...) sau khi bỏ từ hỏi / keyword
+        intent_words = set().union(*(_words(k) for k in spec["keywords"]))
+        content = _words(query) - STOPWORDS - intent_words
+        title = meta.get("title") or ""
+        title_words = _words(title)
+
+        via_title = False
+        if content:
+            # Xếp theo từ khớp trong chính câu; title chỉ giúp qua ngưỡng
+            # (title chung cho cả chunk → không phân biệt được các câu)
+            ranked = []
+            for i, sentence in enumerate(candidates):
+                words = _words(sentence)
+                own = len(content & words) / len(content)
+                if len(content & (words | title_words)) / len(content) >= self.min_overlap:
+                    ranked.append((own, i, sentence))
+            if not ranked:
+                return None, "overlap"
+
+            best = max(r[0] for r in ranked)
+            via_title = best < self.min_overlap
+            # Chỉ lấy các câu khớp tốt nhất, đọc theo thứ tự trong tài liệu
+            # Khớp nhờ title → chỉ câu có số tiền đầu tiên (câu sau có thể nói ngành khác)
+            chosen = [s for own, _, s in sorted(ranked, key=lambda r: r[1])
+                      if own == best][: 1 if via_title else self.max_sentences]
+        elif len(candidates) == 1:
+            # Câu hỏi chung chung → chỉ trả lời khi tài liệu có đúng 1 con số
+            chosen = candidates
+            via_title = True
+        else:
+            return None, "ambiguous"
+
+        body = " ".join(_spoken(s) for s in chosen)
+        if spec["subject"] not in body.lower():
+            title = title.strip()
+            if via_title and title:
+                lead = (f"{title}: " if spec["subject"] in title.lower()
+                        else spec["lead_title"].format(title=title))
+            else:
+                lead = spec["lead"]
+            body = lead + body[0].lower() + body[1:]
+        return body, intent
@@ -0,0 +1,497 @@
+# src/services/fakes.py
+# Provider giả lập cho replay / benchmark – không cần mic, loa, OpenAI, Edge-TTS
+# - Latency lấy mẫu theo phân phối cấu hình được (LatencyModel)
+# - In-process fake (FakeOpenAIClient, FakeTTS, FakeRetrieval) hoặc
+#   stand-in server qua HTTP thật: OpenAI-compatible (FakeOpenAIServer),
+#   Gemini REST (FakeGeminiServer)
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.services.audio_io import AudioInput, AudioOutput
+
+
+DEFAULT_ANSWER = (
+    "Học phí ngành Công nghệ thông tin tại Đại học FPT khoảng hơn hai mươi triệu "
+    "đồng mỗi học kỳ. Mức này có thể thay đổi theo từng năm. "
+    "Bạn nên xem thông báo tuyển sinh mới nhất để biết chính xác nhé."
+)
+
+
+# ======================================================
+# LATENCY
+# ======================================================
+class LatencyModel:
+    """
+    Spec (ms):
+    - "0" / "none"            → không trễ
+    - "const:200"
+    - "uniform:100:300"
+    - "normal:250:40"          (mean, sd; cắt ở 0)
+    - "lognormal:300:900"      (p50, p95) – đuôi dài như API thật
+    """
+
+    def __init__(self, spec: str = "0", seed: int = None):
+        self.spec = spec
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        kind, *args = str(spec).split(":")
+        self.kind = kind.lower()
+        self.args = [float(a) / 1000 for a in args]
+
+        if self.kind in ("0", "none"):
+            self.kind = "const"
+            self.args = [0.0]
+        if self.kind not in ("const", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency spec: {spec}")
+
+        if self.kind == "lognormal":
+            p50, p95 = self.args
+            self._mu = math.log(p50)
+            self._sigma = max(math.log(p95 / p50) / 1.645, 1e-6)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "const":
+                return self.args[0]
+            if self.kind == "uniform":
+                return float(self._rng.uniform(*self.args))
+            if self.kind == "normal":
+                return max(0.0, float(self._rng.normal(*self.args)))
+            return float(self._rng.lognormal(self._mu, self._sigma))
+
+    def sleep(self) -> float:
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def split_tokens(text: str):
+    """
+    Chia answer thành "token" (từ + khoảng trắng) để stream
+    """
+    words = text.split(" ")
+    return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+
+# ======================================================
+# OPENAI (in-process)
+# ======================================================
+class _FakeStream:
+    def __init__(self, tokens, ttft: LatencyModel, per_token: LatencyModel):
+        self._tokens = tokens
+        self._ttft = ttft
+        self._per_token = per_token
+        self._closed = False
+
+    def __iter__(self):
+        self._ttft.sleep()
+        for i, token in enumerate(self._tokens):
+            if self._closed:
+                return
+            if i:
+                self._per_token.sleep()
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))]
+            )
+
+    def close(self):
+        self._closed = True
+
+
+class FakeOpenAIClient:
+    """
+    Thay openai.OpenAI cho OpenAIASRBackend / LLMService:
+    - audio.transcriptions.create → transcript kế tiếp (set_transcript)
+    - chat.completions.create    → answer, stream=True trả từng token
+    llm_error: xác suất call LLM lỗi (thử fallback / router)
+    """
+
+    def __init__(self, asr_latency: str = "0", llm_ttft: str = "0",
+                 llm_token: str = "0", answer: str = DEFAULT_ANSWER, seed: int = None,
+                 llm_error: float = 0.0):
+        self.asr_latency = LatencyModel(asr_latency, seed)
+        self.llm_ttft = LatencyModel(llm_ttft, None if seed is None else seed + 1)
+        self.llm_token = LatencyModel(llm_token, None if seed is None else seed + 2)
+        self.answer = answer
+        self.llm_error = llm_error
+        self._rng = np.random.default_rng(None if seed is None else seed + 3)
+
+        self._transcript = ""
+        self.calls = {"asr": 0, "llm": 0}
+
+        self.audio = SimpleNamespace(
+            transcriptions=SimpleNamespace(create=self._transcribe)
+        )
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(create=self._complete)
+        )
+
+    def set_transcript(self, text: str):
+        self._transcript = text
+
+    def _transcribe(self, **kwargs):
+        self.calls["asr"] += 1
+        self.asr_latency.sleep()
+        return SimpleNamespace(text=self._transcript)
+
+    def should_fail(self) -> bool:
+        return self.llm_error > 0 and self._rng.random() < self.llm_error
+
+    def _complete(self, stream: bool = False, **kwargs):
+        self.calls["llm"] += 1
+        if self.should_fail():
+            self.llm_ttft.sleep()
+            raise RuntimeError("fake LLM error")
+        if stream:
+            return _FakeStream(split_tokens(self.answer), self.llm_ttft, self.llm_token)
+
+        self.llm_ttft.sleep()
+        for _ in range(len(split_tokens(self.answer)) - 1):
+            self.llm_token.sleep()
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.answer))]
+        )
+
+
+# ======================================================
+# STAND-IN SERVER (HTTP thật)
+# ======================================================
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sse(self, fake, events, done: bytes = None):
+        """
+        events: payload cho từng token (dict), trễ theo llm_ttft / llm_token
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        fake.llm_ttft.sleep()
+        try:
+            for i, payload in enumerate(events):
+                if i:
+                    fake.llm_token.sleep()
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            if done:
+                self.wfile.write(done)
+        except (BrokenPipeError, ConnectionResetError):
+            pass                 # client close() giữa chừng
+        self.close_connection = True
+
+
+class _FakeServer:
+    def __init__(self, handler, host: str, port: int):
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeOpenAIServer(_FakeServer):
+    """
+    Server OpenAI-compatible tối thiểu (/v1/audio/transcriptions,
+    /v1/chat/completions có SSE) → đo cả overhead HTTP / SDK
+    Dùng: OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+    """
+
+    def __init__(self, fake: FakeOpenAIClient, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake
+        server = self
+
+        class Handler(_FakeHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                if self.path.endswith("/audio/transcriptions"):
+                    server.fake.calls["asr"] += 1
+                    server.fake.asr_latency.sleep()
+                    self._json({"text": server.fake._transcript})
+                elif self.path.endswith("/chat/completions"):
+                    server.fake.calls["llm"] += 1
+                    request = json.loads(body or b"{}")
+                    if server.fake.should_fail():
+                        server.fake.llm_ttft.sleep()
+                        self._json({"error": {"message": "fake LLM error"}}, status=503)
+                    elif request.get("stream"):
+                        self._sse(
+                            server.fake,
+                            (server.chunk(request, t) for t in split_tokens(server.fake.answer)),
+                            done=b"data: [DONE]\n\n",
+                        )
+                    else:
+                        server.fake.llm_ttft.sleep()
+                        self._json(server.completion(request, server.fake.answer))
+                else:
+                    self.send_error(404)
+
+        super().__init__(Handler, host, port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.address}/v1"
+
+    @staticmethod
+    def completion(request, text):
+        return {
+            "id": "chatcmpl-replay",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+        }
+
+    @staticmethod
+    def chunk(request, token):
+        return {
+            "id": "chatcmpl-replay",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+        }
+
+
+class FakeGeminiServer(_FakeServer):
+    """
+    Gemini REST tối thiểu (models/*:generateContent, :streamGenerateContent?alt=sse)
+    Latency / answer / lỗi lấy từ 1 FakeOpenAIClient (dùng như cấu hình backend)
+    Dùng: GEMINI_BASE_URL=http://127.0.0.1:<port>
+    """
+
+    def __init__(self, fake: FakeOpenAIClient, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake
+        server = self
+
+        class Handler(_FakeHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                path = self.path.split("?")[0]
+
+                if not (path.endswith(":generateContent")
+                        or path.endswith(":streamGenerateContent")):
+                    self.send_error(404)
+                    return
+
+                server.fake.calls["llm"] += 1
+                if server.fake.should_fail():
+                    server.fake.llm_ttft.sleep()
+                    self._json({"error": {"code": 503, "message": "fake LLM error",
+                                          "status": "UNAVAILABLE"}}, status=503)
+                elif path.endswith(":streamGenerateContent"):
+                    self._sse(
+                        server.fake,
+                        (server.response(t, last=False) for t in split_tokens(server.fake.answer)),
+                    )
+                else:
+                    server.fake.llm_ttft.sleep()
+                    self._json(server.response(server.fake.answer))
+
+        super().__init__(Handler, host, port)
+
+    @property
+    def base_url(self) -> str:
+        return self.address
+
+    @staticmethod
+    def response(text, last: bool = True):
+        candidate = {"index": 0, "content": {"role": "model", "parts": [{"text": text}]}}
+        if last:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+
+# ======================================================
+# TTS / RETRIEVAL
+# ======================================================
+class FakeTTS:
+    """
+    Thay Edge-TTS: tts(text) → (PCM, fs) sau khi "render"
+    Độ dài audio ~ số ký tự / chars_per_second (tiếng Việt ~ 15 ký tự/s)
+    """
+
+    def __init__(self, latency: str = "0", fs: int = 24000,
+                 chars_per_second: float = 15.0, seed: int = None):
+        self.latency = LatencyModel(latency, seed)
+        self.fs = fs
+        self.chars_per_second = chars_per_second
+        self.calls = 0
+
+    def __call__(self, text: str):
+        self.calls += 1
+        self.latency.sleep()
+        n = max(1, int(len(text) / self.chars_per_second * self.fs))
+        t = np.arange(n, dtype=np.float32) / self.fs
+        return (0.05 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), self.fs
+
+
+class FakeRetrieval:
+    """
+    Thay RetrievalService (không cần Chroma / embedding model)
+    """
+
+    def __init__(self, latency: str = "0", documents=None, seed: int = None):
+        self.latency = LatencyModel(latency, seed)
+        self.documents = documents or [DEFAULT_ANSWER]
+
+    def embed_query(self, query: str):
+        return np.zeros(384, dtype=np.float32)
+
+    def retrieve(self, query: str, top_k: int = 5, query_embedding=None):
+        self.latency.sleep()
+        docs = self.documents[:top_k]
+        return {
+            "documents": [docs],
+            "metadatas": [[{"title": "replay"} for _ in docs]],
+            "distances": [[0.2 for _ in docs]],
+        }
+
+
+# ======================================================
+# AUDIO
+# ======================================================
+class ReplayInput(AudioInput):
+    """
+    Thay mic: thread nền đẩy WAV (rồi silence) vào AudioRing theo nhịp
+    thời gian thực / speed → cùng đường VAD + ASR như mic thật
+    """
+
+    def __init__(self, sample_rate: int, frame_size: int, speed: float = 1.0,
+                 ring_seconds: float = 60.0):
+        super().__init__(sample_rate, frame_size, ring_seconds=ring_seconds)
+        self.speed = speed
+        self._clips = deque()
+        self._clip_starts = {}
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._feed, daemon=True)
+        self._thread.start()
+
+    @property
+    def latency(self) -> float:
+        return 0.0
+
+    def play(self, clip_id, audio: np.ndarray):
+        with self._cond:
+            self._clips.append((clip_id, np.asarray(audio, dtype=np.float32)))
+
+    def clip_start(self, clip_id, timeout: float = 30.0):
+        """
+        → (vị trí sample đầu clip trong ring, perf_counter lúc ghi)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: clip_id in self._clip_starts, timeout=timeout)
+            return self._clip_starts.get(clip_id)
+
+    def _feed(self):
+        silence = np.zeros(self.frame_size, dtype=np.float32)
+        period = self.frame_size / self.sample_rate / self.speed
+        current, offset = None, 0
+        deadline = time.perf_counter()
+
+        while not self._closed:
+            with self._cond:
+                if current is None and self._clips:
+                    clip_id, current = self._clips.popleft()
+                    offset = 0
+                    self._clip_starts[clip_id] = (self.ring.written, time.perf_counter())
+
+            if current is not None:
+                frame = current[offset:offset + self.frame_size]
+                if len(frame) < self.frame_size:
+                    frame = np.concatenate([frame, silence[len(frame):]])
+                offset += self.frame_size
+                if offset >= len(current):
+                    current = None
+            else:
+                frame = silence
+
+            self.ring.write(frame)
+            with self._cond:
+                self._cond.notify_all()
+
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class NullOutput(AudioOutput):
+    """
+    Thay loa: ghi nhận thời điểm audio đầu tiên, không phát
+    """
+
+    def __init__(self, sample_rate: int):
+        super().__init__(sample_rate)
+        self.first_write = None
+        self.samples = 0
+
+    def start(self):
+        pass
+
+    def write(self, data, stop_event=None) -> bool:
+        if self.first_write is None:
+            self.first_write = time.perf_counter()
+        self.samples += len(data)
+        return True
+
+    def pending_seconds(self) -> float:
+        return 0.0
+
+    def flush(self):
+        pass
+
+    def drain(self, stop_event=None):
+        pass
+
+    def close(self):
+        pass
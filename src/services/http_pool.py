@@ -0,0 +1,279 @@
+# src/services/http_pool.py
+# 1 connection pool keep-alive cho mọi call tới provider (OpenAI ASR / LLM)
+# - Timeout theo stage (connect / read), SDK không tự retry → deadline rõ ràng
+# - prewarm(): mở sẵn TCP + TLS khi VAD vừa bắt đầu câu → handshake chồng lên
+#   lúc user còn nói, request thật dùng lại connection trong pool
+# - Hedger: gửi request trùng khi request đầu chậm hơn p95 → cắt tail latency
+
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.config.settings import settings
+
+
+_lock = threading.Lock()
+_http_client = None
+_openai_clients = {}             # timeout → OpenAI (chung http client)
+
+_prewarm_lock = threading.Lock()
+_last_prewarm = 0.0
+
+
+# ======================================================
+# POOL
+# ======================================================
+def get_http_client():
+    """
+    httpx.Client dùng chung (thread-safe) – import lazy để không chậm cold start
+    """
+    global _http_client
+
+    with _lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.HTTP_READ_TIMEOUT,
+                    connect=settings.HTTP_CONNECT_TIMEOUT,
+                ),
+            )
+        return _http_client
+
+
+def get_openai_client(read_timeout: float = None):
+    """
+    OpenAI client trên pool chung; read_timeout = deadline của stage
+    (streaming: khoảng chờ tối đa giữa 2 chunk)
+    """
+    read_timeout = read_timeout or settings.HTTP_READ_TIMEOUT
+
+    http_client = get_http_client()
+    with _lock:
+        client = _openai_clients.get(read_timeout)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                http_client=http_client,
+                timeout=httpx.Timeout(read_timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+                max_retries=0,       # retry / hedge do service tự quyết
+            )
+            _openai_clients[read_timeout] = client
+        return client
+
+
+def abort_response(response):
+    """
+    Huỷ httpx response đang stream từ thread khác
+    response.close() không đánh thức thread đang chờ recv → shutdown socket
+    (connection bị bỏ, không quay lại pool)
+    """
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def close():
+    global _http_client
+
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        _openai_clients.clear()
+
+
+# ======================================================
+# PRE-CONNECT
+# ======================================================
+def provider_url(name: str) -> str:
+    """
+    Base URL của provider (env override → host thật)
+    """
+    if name == "gemini":
+        return settings.GEMINI_BASE_URL or "https://generativelanguage.googleapis.com"
+    return settings.OPENAI_BASE_URL or "https://api.openai.com/v1"
+
+
+def prewarm_urls() -> list:
+    """
+    Host của mọi LLM provider có API key (router có thể chọn bất kỳ bên nào)
+    + OpenAI khi ASR chạy qua OpenAI
+    """
+    keys = {"openai": settings.OPENAI_API_KEY, "gemini": settings.GEMINI_API_KEY}
+    names = [n for n in settings.LLM_PROVIDERS if keys.get(n)]
+    if settings.ASR_PROVIDER == "openai":
+        names.append("openai")
+    return list(dict.fromkeys(provider_url(n) for n in names))
+
+
+def prewarm(url: str = None, background: bool = True):
+    """
+    HEAD tới API host → connection (đã TLS) nằm sẵn trong pool
+    url=None → mọi host trong prewarm_urls(), song song
+    Bỏ qua nếu vừa warm (connection còn trong keepalive_expiry)
+    """
+    global _last_prewarm
+
+    if not settings.HTTP_PREWARM:
+        return
+
+    now = time.monotonic()
+    with _prewarm_lock:
+        if now - _last_prewarm < settings.HTTP_KEEPALIVE_EXPIRY / 2:
+            return
+        _last_prewarm = now
+
+    urls = [url] if url else prewarm_urls()
+
+    def run(target):
+        try:
+            get_http_client().head(target, timeout=settings.HTTP_CONNECT_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Prewarm lỗi ({target}): {e}")
+
+    threads = [
+        threading.Thread(target=run, args=(target,), name="http-prewarm", daemon=True)
+        for target in urls
+    ]
+    for thread in threads:
+        thread.start()
+    if not background:
+        for thread in threads:
+            thread.join()
+
+
+# ======================================================
+# HEDGING
+# ======================================================
+class Hedger:
+    """
+    - delay(): p95 latency gần đây (hoặc default khi chưa đủ mẫu)
+    - run(fn): gọi fn(); quá delay chưa xong → gọi fn() lần 2 (hoặc hedge_fn:
+      provider khác), lấy kết quả xong trước, kết quả thua đưa cho on_loser() để dọn
+    """
+
+    def __init__(self, name: str, default_after: float, min_samples: int = 20,
+                 window: int = 200, workers: int = 4):
+        self.name = name
+        self.default_after = default_after
+        self.min_samples = min_samples
+
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"hedge-{name}")
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def delay(self) -> float:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.default_after
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def run(self, fn, on_loser=None, deadline: float = None, hedge_fn=None,
+            delay: float = None):
+        """
+        delay: None = p95 đã học | số giây cố định (0 = gửi cả 2 ngay – race)
+        """
+        self.calls += 1
+        t0 = time.monotonic()
+
+        def timed(call):
+            # Ghi cả request thua (xong muộn) → p95 không bị kéo xuống
+            # vì chỉ thấy request thắng
+            start = time.monotonic()
+            result = call()
+            self.observe(time.monotonic() - start)
+            return result
+
+        primary = self._pool.submit(timed, fn)
+        done, _ = wait([primary], timeout=self.delay() if delay is None else delay)
+        futures = [primary]
+
+        if not done:
+            self.hedged += 1
+            futures.append(self._pool.submit(timed, hedge_fn or fn))
+
+        remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - t0))
+        pending = set(futures)
+        error = None
+
+        while pending:
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break            # quá deadline
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+
+                result = future.result()
+                if future is not primary:
+                    self.hedge_wins += 1
+                self._discard(pending, on_loser)
+                return result
+
+            if remaining is not None:
+                remaining = max(0.0, deadline - (time.monotonic() - t0))
+
+        self._discard(pending, on_loser)
+        if error is not None:
+            raise error
+        raise TimeoutError(f"{self.name}: quá deadline {deadline}s")
+
+    @staticmethod
+    def _discard(futures, on_loser):
+        """
+        Request thua vẫn chạy trong thread → dọn khi nó xong
+        """
+        def cleanup(future):
+            if on_loser is not None and future.exception() is None:
+                try:
+                    on_loser(future.result())
+                except Exception:
+                    pass
+
+        for future in futures:
+            future.add_done_callback(cleanup)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after_s": round(self.delay(), 3),
+        }
+
+
+def backoff(attempt: int) -> float:
+    """
+    Exponential backoff + jitter thay cho sleep cố định giữa 2 lần retry
+    """
+    base = settings.HTTP_RETRY_BACKOFF * (2 ** attempt)
+    return base * (0.5 + random.random() / 2)
@@ -0,0 +1,469 @@
+# src/services/llm_providers.py
+# LLM provider (OpenAI | Gemini) + router theo latency
+# - Provider: complete(messages) → text | stream(messages) → LLMStream (text delta, close())
+# - Router: latency (TTFT) + tỉ lệ lỗi theo cửa sổ trượt cho từng provider
+#   → gửi tới provider khỏe nhanh nhất, lỗi → fallback provider kế tiếp
+#   → (tuỳ chọn) race 2 provider tới token đầu tiên, stream thua bị close()
+
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from src.config.settings import settings
+from src.services.http_pool import (
+    Hedger,
+    abort_response,
+    get_http_client,
+    get_openai_client,
+    provider_url,
+)
+
+
+class LLMStream:
+    """
+    Iterator text delta + close() (dừng đọc, trả connection về pool)
+    + abort() (huỷ từ thread khác, kể cả khi đang chờ token)
+    """
+
+    def __init__(self, deltas, close=None, abort=None):
+        self._deltas = deltas
+        self._close = close
+        self._abort = abort
+
+    def __iter__(self):
+        return self._deltas
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def abort(self):
+        if self._abort is None:
+            self.close()
+            return
+        self._abort()
+        self._abort = None
+        self._close = None
+
+
+class CallHandle:
+    """
+    Huỷ 1 call đang chạy ở thread khác (bên thua race / hedge)
+    - attach(close): đăng ký hàm đóng response ngay khi có
+    - cancel(): đóng luôn nếu đã có, chưa có → đóng ngay lúc attach
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._close = None
+        self.cancelled = False
+
+    def attach(self, close):
+        with self._lock:
+            if not self.cancelled:
+                self._close = close
+                return
+        close()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            close, self._close = self._close, None
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+
+# ======================================================
+# PROVIDERS
+# ======================================================
+class OpenAIProvider:
+    name = "openai"
+
+    def __init__(self, client=None, model: str = None):
+        # client: inject fake / stand-in (replay harness)
+        self.client = client or get_openai_client(settings.LLM_DEADLINE)
+        self.stream_client = client or get_openai_client(settings.LLM_STREAM_READ_TIMEOUT)
+        self.model = model or settings.OPENAI_LLM_MODEL
+
+    def complete(self, messages: list, temperature: float = 0.3) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+        )
+        return response.choices[0].message.content or ""
+
+    def stream(self, messages: list, temperature: float = 0.3) -> LLMStream:
+        response = self.stream_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+        )
+
+        def deltas():
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        def abort():
+            # Stream của SDK giữ httpx response; fake client (replay) chỉ có close()
+            http_response = getattr(response, "response", None)
+            if http_response is None:
+                response.close()
+            else:
+                abort_response(http_response)
+
+        return LLMStream(deltas(), response.close, abort)
+
+
+class GeminiProvider:
+    """
+    google-genai SDK trên pool HTTP chung; system message → system_instruction
+    Stream: REST SSE trực tiếp (cùng pool) để huỷ được giữa chừng
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, model: str = None, base_url: str = None):
+        from google import genai
+        from google.genai import types
+
+        self._types = types
+        self.model = model or settings.GEMINI_MODEL
+        self.api_key = api_key or settings.GEMINI_API_KEY
+        self.base_url = (base_url or provider_url("gemini")).rstrip("/")
+        self.api_version = "v1beta"
+        self.client = genai.Client(
+            api_key=self.api_key,
+            http_options=types.HttpOptions(
+                base_url=self.base_url,
+                timeout=int(settings.LLM_DEADLINE * 1000),
+                httpx_client=get_http_client(),
+            ),
+        )
+
+    def _request(self, messages: list, temperature: float):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        contents = [
+            {
+                "role": "model" if m["role"] == "assistant" else "user",
+                "parts": [{"text": m["content"]}],
+            }
+            for m in messages if m["role"] != "system"
+        ]
+        config = self._types.GenerateContentConfig(
+            system_instruction=system or None,
+            temperature=temperature,
+        )
+        return contents, config
+
+    def complete(self, messages: list, temperature: float = 0.3) -> str:
+        contents, config = self._request(messages, temperature)
+        response = self.client.models.generate_content(
+            model=self.model, contents=contents, config=config
+        )
+        return response.text or ""
+
+    def stream(self, messages: list, temperature: float = 0.3) -> LLMStream:
+        """
+        SSE qua REST trên pool chung (SDK không lộ response để huỷ từ thread khác)
+        → close() đóng httpx response ngay, kể cả khi chưa có token đầu
+        """
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        contents, _ = self._request(messages, temperature)
+        body = {"contents": contents, "generationConfig": {"temperature": temperature}}
+        if system:
+            body["systemInstruction"] = {"parts": [{"text": system}]}
+
+        http = get_http_client()
+        request = http.build_request(
+            "POST",
+            f"{self.base_url}/{self.api_version}/models/{self.model}:streamGenerateContent",
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": self.api_key},
+            json=body,
+            timeout=settings.LLM_STREAM_READ_TIMEOUT,
+        )
+        response = http.send(request, stream=True)
+        if response.status_code >= 400:
+            detail = response.read().decode("utf-8", "replace")[:200]
+            response.close()
+            raise RuntimeError(f"gemini HTTP {response.status_code}: {detail}")
+
+        def deltas():
+            try:
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    for candidate in json.loads(line[5:]).get("candidates", []):
+                        for part in (candidate.get("content") or {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+            finally:
+                response.close()
+
+        return LLMStream(deltas(), response.close, lambda: abort_response(response))
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+}
+
+
+def create_providers(names=None) -> list:
+    """
+    Provider theo LLM_PROVIDERS (thứ tự = ưu tiên khi chưa có số đo),
+    bỏ provider chưa có API key / chưa cài SDK
+    """
+    names = names or settings.LLM_PROVIDERS
+    keys = {"openai": settings.OPENAI_API_KEY, "gemini": settings.GEMINI_API_KEY}
+
+    providers = []
+    for name in names:
+        if name not in PROVIDERS:
+            print(f"⚠️ LLM provider không hỗ trợ: {name}")
+            continue
+        if not keys.get(name):
+            continue
+        try:
+            providers.append(PROVIDERS[name]())
+        except ImportError as e:
+            print(f"⚠️ Bỏ LLM provider {name} (thiếu {e.name})")
+
+    if not providers:
+        raise RuntimeError(f"Không có LLM provider khả dụng trong {names}")
+    return providers
+
+
+# ======================================================
+# ROUTER
+# ======================================================
+class ProviderStats:
+    """
+    Cửa sổ trượt latency (s tới token đầu) + kết quả gần đây
+    - Lỗi liên tiếp >= LLM_ROUTER_FAILURES → nghỉ LLM_ROUTER_COOLDOWN giây
+      (chỉ cooldown mới loại provider khỏi nhóm khỏe)
+    - Tỉ lệ lỗi chỉ tính kết quả trong LLM_ROUTER_ERROR_TTL giây gần nhất
+      → lỗi cũ tự hết hạn, provider không bị phạt mãi khi không có traffic
+    """
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)     # (monotonic, True = thành công)
+        self.failures = 0
+        self.down_until = 0.0
+
+    def success(self, seconds: float):
+        self.latencies.append(seconds)
+        self.outcomes.append((time.monotonic(), True))
+        self.failures = 0
+
+    def censored(self, seconds: float):
+        """
+        Bị huỷ vì thua race: chỉ biết latency >= seconds → vẫn ghi (cận dưới)
+        để provider chậm không giữ latency 0 mãi
+        """
+        self.latencies.append(seconds)
+
+    def failure(self):
+        now = time.monotonic()
+        self.outcomes.append((now, False))
+        self.failures += 1
+        if self.failures >= settings.LLM_ROUTER_FAILURES:
+            self.down_until = now + settings.LLM_ROUTER_COOLDOWN
+
+    def error_rate(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        recent = [ok for t, ok in self.outcomes if now - t <= settings.LLM_ROUTER_ERROR_TTL]
+        if not recent:
+            return 0.0
+        return recent.count(False) / len(recent)
+
+    def latency(self) -> float:
+        """
+        p50 latency; chưa có mẫu → 0 (được thử sớm để có số đo)
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def score(self, now: float = None) -> float:
+        # Lỗi = request phải chạy lại ở provider khác → phạt theo tỉ lệ lỗi
+        # (nhân hệ số: provider lỗi gần đây vẫn được thử khi các bên khác chậm hơn nhiều)
+        return self.latency() * (1.0 + settings.LLM_ROUTER_ERROR_PENALTY * self.error_rate(now))
+
+
+class LLMRouter:
+    """
+    - complete(messages) / open_stream(messages) → (kết quả, tên provider)
+    - Thứ tự thử: provider khỏe theo score tăng dần, rồi provider đang nghỉ
+    - race: 2 provider đầu cùng chạy (sau LLM_RACE_AFTER), lấy bên có token trước
+    - 1 provider + LLM_HEDGE: hedge chính provider đó như trước
+    """
+
+    def __init__(self, providers: list, race: bool = None, race_after: float = None):
+        self.providers = providers
+        self.race = settings.LLM_RACE_ENABLED if race is None else race
+        self.race_after = settings.LLM_RACE_AFTER if race_after is None else race_after
+
+        self._lock = threading.Lock()
+        self._stats = {p.name: ProviderStats(settings.LLM_ROUTER_WINDOW) for p in providers}
+        self._racer = Hedger("llm-race", self.race_after)
+
+        self.hedgers = {}
+        if settings.LLM_HEDGE_ENABLED:
+            self.hedgers = {
+                p.name: Hedger(f"llm-{p.name}", settings.LLM_HEDGE_AFTER,
+                               settings.LLM_HEDGE_MIN_SAMPLES)
+                for p in providers
+            }
+
+    # ================= HEALTH =================
+
+    def ranked(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            order = {p.name: i for i, p in enumerate(self.providers)}
+            healthy = [p for p in self.providers if self._stats[p.name].healthy(now)]
+            resting = [p for p in self.providers if p not in healthy]
+            healthy.sort(key=lambda p: (self._stats[p.name].score(now), order[p.name]))
+            resting.sort(key=lambda p: self._stats[p.name].down_until)
+        return healthy + resting
+
+    def record_error(self, name: str):
+        """
+        Lỗi giữa chừng stream (sau token đầu) → vẫn tính vào tỉ lệ lỗi
+        """
+        with self._lock:
+            self._stats[name].failure()
+
+    def _timed(self, provider, call, handles: list):
+        """
+        Bọc call → ghi latency / lỗi vào stats (cả khi là bên thua race)
+        Mỗi lần chạy có 1 CallHandle (hedge gọi lại cùng hàm) → huỷ được bên thua
+        """
+        def run():
+            handle = CallHandle()
+            handles.append(handle)
+            t0 = time.monotonic()
+            try:
+                result = call(provider, handle)
+            except Exception:
+                if handle.cancelled:
+                    # Bị huỷ vì thua race → không phải lỗi của provider
+                    with self._lock:
+                        self._stats[provider.name].censored(time.monotonic() - t0)
+                else:
+                    self.record_error(provider.name)
+                raise
+            with self._lock:
+                stats = self._stats[provider.name]
+                if handle.cancelled:
+                    stats.censored(time.monotonic() - t0)
+                else:
+                    stats.success(time.monotonic() - t0)
+            return result, provider.name, handle
+        return run
+
+    @staticmethod
+    def _settle(outcome, handles: list):
+        """
+        Có bên thắng → huỷ ngay mọi call còn lại (chưa cần chờ token đầu)
+        """
+        result, name, winner = outcome
+        for handle in handles:
+            if handle is not winner:
+                handle.cancel()
+        return result, name
+
+    # ================= DISPATCH =================
+
+    def _dispatch(self, call, on_loser=None):
+        ranked = self.ranked()
+        error = None
+        i = 0
+
+        while i < len(ranked):
+            primary = ranked[i]
+            second = ranked[i + 1] if self.race and i + 1 < len(ranked) else None
+            handles = []
+            try:
+                if second is not None:
+                    outcome = self._racer.run(
+                        self._timed(primary, call, handles),
+                        on_loser=on_loser,
+                        deadline=settings.LLM_DEADLINE,
+                        hedge_fn=self._timed(second, call, handles),
+                        delay=self.race_after,
+                    )
+                else:
+                    hedger = self.hedgers.get(primary.name)
+                    if hedger is not None:
+                        outcome = hedger.run(self._timed(primary, call, handles),
+                                             on_loser=on_loser,
+                                             deadline=settings.LLM_DEADLINE)
+                    else:
+                        outcome = self._timed(primary, call, handles)()
+                return self._settle(outcome, handles)
+            except Exception as e:
+                # quá deadline → call còn treo cũng huỷ luôn
+                for handle in handles:
+                    handle.cancel()
+                print(f"⚠️ LLM {primary.name}{'/' + second.name if second else ''} lỗi: {e}")
+                error = e
+                i += 2 if second is not None else 1
+
+        raise error
+
+    def complete(self, messages: list, temperature: float = 0.3):
+        # Non-streaming: SDK không trả handle trước khi xong → bên thua tự chạy hết
+        return self._dispatch(lambda p, handle: p.complete(messages, temperature))
+
+    def open_stream(self, messages: list, temperature: float = 0.3):
+        """
+        → (LLMStream bắt đầu từ delta đầu tiên, provider)
+        Latency ghi cho router = time-to-first-token
+        """
+        def open_first(provider, handle):
+            stream = provider.stream(messages, temperature)
+            # Bên thua bị huỷ ngay khi bên kia thắng, kể cả khi chưa có token đầu
+            handle.attach(stream.abort)
+            deltas = iter(stream)
+            for delta in deltas:
+                return LLMStream(itertools.chain([delta], deltas), stream.close, stream.abort)
+            stream.close()
+            raise ValueError(f"{provider.name}: empty stream")
+
+        # on_loser: bên thua vẫn kịp mở xong stream (race sát nút) → đóng lại
+        return self._dispatch(open_first, on_loser=lambda opened: opened[0].close())
+
+    # ================= REPORT =================
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {
+                name: {
+                    "p50_ms": round(s.latency() * 1000, 1),
+                    "error_rate": round(s.error_rate(), 3),
+                    "samples": len(s.latencies),
+                    "resting": s.down_until > time.monotonic(),
+                }
+                for name, s in self._stats.items()
+            }
+        if self.race:
+            out["race"] = self._racer.stats()
+        for name, hedger in self.hedgers.items():
+            out[f"hedge.{name}"] = hedger.stats()
+        return out
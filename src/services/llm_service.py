@@ -1,51 +1,19 @@
 # src/services/llm_service.py
-# OpenAI LLM + RAG (FINAL – Jetson CPU / API SAFE)
+# LLM (OpenAI / Gemini qua router) + RAG (FINAL – Jetson CPU / API SAFE)
 
-from openai import OpenAI
 from src.config.settings import settings
+from src.services.context_packer import pack_context
+from src.services.http_pool import backoff
+from src.services.llm_providers import LLMRouter, OpenAIProvider, create_providers
+from src.utils.tracing import tracer
 import time
 import re
 
 
-class LLMService:
-    """
-    - Build RAG prompt
-    - Call OpenAI Chat API
-    - Voice-safe answer generation
-    """
-
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model_name = settings.OPENAI_LLM_MODEL
-
-        self.MAX_OUTPUT_CHARS = 600
-        self.MAX_SENTENCES = 5
-        self.MAX_DOC_CHARS = 450   # cắt context cho voice
-        self.RETRY = 2
-
-    # ================== CONTEXT ==================
-
-    def build_context(self, retrieved_docs: dict) -> str:
-        docs = retrieved_docs.get("documents", [[]])[0]
-
-        if not docs:
-            return ""
-
-        blocks = []
-        for doc in docs:
-            clean = doc.strip()
-            if len(clean) > self.MAX_DOC_CHARS:
-                clean = clean[: self.MAX_DOC_CHARS].rsplit(" ", 1)[0] + "..."
-            blocks.append(clean)
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
-        return "\n\n".join(blocks)
-
-    # ================== PROMPT ==================
-
-    def build_prompt(self, query: str, context: str) -> str:
-        if context:
-            return f"""
-Bạn là trợ lý tư vấn tuyển sinh của Đại học FPT.
+# Hướng dẫn cố định → system message, không chèn gì thay đổi theo request
+RAG_SYSTEM_PROMPT = """Bạn là trợ lý tư vấn tuyển sinh của Đại học FPT.
 Bạn đang TRẢ LỜI BẰNG GIỌNG NÓI cho người nghe.
 
 QUY TẮC:
@@ -58,32 +26,72 @@ YÊU CẦU:
 - Tối đa 5 câu
 - Mỗi câu ngắn, dễ nghe
 - Có thể dùng "mình", "bạn"
+- Trả lời dựa trên THÔNG TIN THAM KHẢO trong tin nhắn của người dùng"""
 
-THÔNG TIN THAM KHẢO:
-{context}
-
-CÂU HỎI:
-{query}
-
-TRẢ LỜI:
-"""
-        else:
-            # fallback khi không có RAG
-            return f"""
-Bạn là trợ lý tư vấn tuyển sinh của Đại học FPT.
+# Fallback khi không có RAG
+CHAT_SYSTEM_PROMPT = """Bạn là trợ lý tư vấn tuyển sinh của Đại học FPT.
 Bạn đang nói chuyện trực tiếp với người dùng.
 
 YÊU CẦU:
 - Trả lời trung thực
 - Nếu không chắc, nói rõ là thông tin tham khảo
 - Ngắn gọn, dễ hiểu
-- Tối đa 4 câu
+- Tối đa 4 câu"""
+
 
-CÂU HỎI:
-{query}
+class LLMService:
+    """
+    - Build RAG prompt
+    - Call LLM qua router (provider nhanh nhất còn khỏe, fallback / race)
+    - Voice-safe answer generation
+    """
 
-TRẢ LỜI:
-"""
+    def __init__(self, client=None, providers=None):
+        # client: inject OpenAI fake / stand-in (replay harness)
+        # providers: danh sách provider dựng sẵn (vd: fake OpenAI + fake Gemini)
+        if providers is None:
+            providers = [OpenAIProvider(client=client)] if client else create_providers()
+        self.router = LLMRouter(providers)
+
+        self.MAX_OUTPUT_CHARS = 600
+        self.MAX_SENTENCES = 5
+        self.RETRY = 2
+
+        self.FALLBACK_ANSWER = (
+            "Mình chưa trả lời được ngay lúc này. "
+            "Bạn có thể hỏi lại hoặc nói theo cách khác nhé."
+        )
+
+    # ================== CONTEXT ==================
+
+    def build_context(self, retrieved_docs: dict) -> str:
+        """
+        Context theo budget token (bỏ overlap giữa chunk) + log token tiết kiệm
+        """
+        with tracer.span("context.pack") as span:
+            context, stats = pack_context(retrieved_docs)
+            span.set(**stats)
+
+        if settings.LOG_LATENCY and stats["tokens_in"]:
+            saved = stats["tokens_in"] - stats["tokens_out"]
+            print(
+                f"📦 Context: {stats['tokens_out']}/{stats['tokens_in']} token "
+                f"({stats['docs']} doc) – tiết kiệm {saved} "
+                f"(overlap {stats['saved_overlap']}, budget {stats['saved_budget']})"
+            )
+
+        return context
+
+    # ================== PROMPT ==================
+
+    def build_prompt(self, query: str, context: str) -> str:
+        """
+        Phần thay đổi theo request (context + câu hỏi) → message user
+        Hướng dẫn cố định nằm ở system prompt (RAG_SYSTEM_PROMPT / CHAT_SYSTEM_PROMPT)
+        """
+        if context:
+            return f"THÔNG TIN THAM KHẢO:\n{context}\n\nCÂU HỎI:\n{query}\n\nTRẢ LỜI:"
+        return f"CÂU HỎI:\n{query}\n\nTRẢ LỜI:"
 
     # ================== POST PROCESS ==================
 
@@ -91,7 +99,7 @@ TRẢ LỜI:
         text = re.sub(r"[#*_>`]", "", text)
         text = re.sub(r"\s+", " ", text).strip()
 
-        sentences = re.split(r"(?<=[.!?])\s+", text)
+        sentences = SENTENCE_SPLIT.split(text)
         sentences = sentences[: self.MAX_SENTENCES]
 
         result = " ".join(sentences)
@@ -101,40 +109,149 @@ TRẢ LỜI:
 
         return result.strip()
 
+    def post_process_sentence(self, sentence: str) -> str:
+        """
+        Giống post_process nhưng cho 1 câu (streaming mode)
+        """
+        sentence = re.sub(r"[#*_>`]", "", sentence)
+        return re.sub(r"\s+", " ", sentence).strip()
+
     # ================== GENERATE ==================
 
+    def _build_messages(self, prompt: str, rag: bool = True) -> list:
+        # System prompt byte-identical giữa các request → prefix cache phía provider
+        return [
+            {
+                "role": "system",
+                "content": RAG_SYSTEM_PROMPT if rag else CHAT_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
     def generate_answer(self, query: str, retrieved_docs: dict) -> str:
         context = self.build_context(retrieved_docs)
-        prompt = self.build_prompt(query, context)
+        messages = self._build_messages(self.build_prompt(query, context), rag=bool(context))
 
         for attempt in range(self.RETRY):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Bạn là trợ lý tư vấn tuyển sinh của Đại học FPT."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.3,
-                )
-
-                text = response.choices[0].message.content.strip()
+                with tracer.span("llm.generate", attempt=attempt) as span:
+                    text, provider = self.router.complete(messages)
+                    span.set(provider=provider)
+
+                text = text.strip()
                 if not text:
                     raise ValueError("Empty LLM response")
 
                 return self.post_process(text)
 
             except Exception as e:
-                print(f"❌ OpenAI LLM error (attempt {attempt + 1}): {e}")
-                time.sleep(0.4)
+                print(f"❌ LLM error (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.RETRY:
+                    time.sleep(backoff(attempt))
 
-        return (
-            "Mình chưa trả lời được ngay lúc này. "
-            "Bạn có thể hỏi lại hoặc nói theo cách khác nhé."
-        )
+        return self.FALLBACK_ANSWER
+
+    # ================== STREAMING ==================
+
+    def generate_answer_stream(self, query: str, retrieved_docs: dict):
+        """
+        Yield từng câu ngay khi LLM sinh xong câu đó
+        - post_process áp dụng cho từng câu
+        - Vẫn giới hạn MAX_SENTENCES / MAX_OUTPUT_CHARS
+        - Chỉ retry khi chưa yield câu nào
+        """
+        context = self.build_context(retrieved_docs)
+        messages = self._build_messages(self.build_prompt(query, context), rag=bool(context))
+
+        emitted = 0
+        total_chars = 0
+        t0 = time.monotonic()
+
+        for attempt in range(self.RETRY):
+            provider = None
+            stream = None
+            try:
+                stream, provider = self.router.open_stream(messages)
+                tracer.record("llm.ttft", time.monotonic() - t0,
+                              provider=provider, attempt=attempt)
+
+                buffer = ""
+                done = False
+
+                for delta in stream:
+                    buffer += delta
+                    parts = SENTENCE_SPLIT.split(buffer)
+
+                    # Phần cuối có thể chưa hết câu → giữ lại
+                    buffer = parts.pop()
+
+                    for part in parts:
+                        sentence, done = self._limit_sentence(
+                            part, emitted, total_chars
+                        )
+                        if sentence:
+                            if emitted == 0:
+                                tracer.record("llm.first_sentence", time.monotonic() - t0)
+                            emitted += 1
+                            total_chars += len(sentence) + 1
+                            yield sentence
+                        if done:
+                            break
+
+                    if done:
+                        break
+
+                if not done and buffer:
+                    sentence, _ = self._limit_sentence(
+                        buffer, emitted, total_chars
+                    )
+                    if sentence:
+                        if emitted == 0:
+                            tracer.record("llm.first_sentence", time.monotonic() - t0)
+                        emitted += 1
+                        yield sentence
+
+                if emitted == 0:
+                    raise ValueError("Empty LLM response")
+
+                tracer.record("llm.total", time.monotonic() - t0, sentences=emitted)
+                return
+
+            except Exception as e:
+                print(f"❌ LLM stream error (attempt {attempt + 1}): {e}")
+                if provider is not None:
+                    self.router.record_error(provider)
+                if emitted > 0:
+                    # Đã nói một phần → không lặp lại từ đầu
+                    return
+                if attempt + 1 < self.RETRY:
+                    time.sleep(backoff(attempt))
+
+            finally:
+                # Kể cả khi consumer đóng generator giữa chừng (barge-in / huỷ reply)
+                # → response HTTP trả về pool ngay, không chờ GC
+                if stream is not None:
+                    stream.close()
+
+        yield self.FALLBACK_ANSWER
+
+    def _limit_sentence(self, sentence: str, emitted: int, total_chars: int):
+        """
+        Trả về (câu sau post_process, đã chạm giới hạn hay chưa)
+        """
+        sentence = self.post_process_sentence(sentence)
+        if not sentence:
+            return "", False
+
+        if emitted >= self.MAX_SENTENCES:
+            return "", True
+
+        remaining = self.MAX_OUTPUT_CHARS - total_chars
+        if len(sentence) > remaining:
+            cut = sentence[: max(remaining, 0)].rsplit(" ", 1)[0]
+            return (cut + "..." if cut else ""), True
+
+        return sentence, emitted + 1 >= self.MAX_SENTENCES
@@ -1,29 +1,26 @@
 import os
-import tempfile
-import soundfile as sf
-from openai import OpenAI
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from src.config.settings import settings
+from src.services.http_pool import get_openai_client
+from src.utils.audio_utils import encode_wav
 
 
 class OpenAIASRService:
-    def __init__(self, model=None, language="vi"):
+    def __init__(self, model=None, language="vi", client=None):
         self.model = model or os.getenv("OPENAI_ASR_MODEL", "gpt-4o-transcribe")
         self.language = language
+        # Pool HTTP chung với LLM, không tạo client riêng lúc import module
+        self.client = client or get_openai_client(settings.ASR_DEADLINE)
 
     def transcribe(self, audio_np, sample_rate):
         """
         audio_np: numpy array (float32 or int16)
         sample_rate: int
         """
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
-            sf.write(tmp.name, audio_np, sample_rate)
-
-            with open(tmp.name, "rb") as audio_file:
-                result = client.audio.transcriptions.create(
-                    file=audio_file,
-                    model=self.model,
-                    language=self.language
-                )
+        result = self.client.audio.transcriptions.create(
+            file=encode_wav(audio_np, sample_rate),
+            model=self.model,
+            language=self.language
+        )
 
         return result.text.strip()
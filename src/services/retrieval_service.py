@@ -1,28 +1,23 @@
 # src/services/retrieval_service.py
-# ChromaDB RAG – FINAL (Jetson SAFE, NO CUDA CONFLICT)
+# ChromaDB RAG + BM25 hybrid – FINAL (Jetson SAFE, NO CUDA CONFLICT)
 
-import re
-
-from chromadb import PersistentClient
-from chromadb.utils import embedding_functions
+import numpy as np
 
 from src.config.settings import settings
-from src.utils.text_normalizer import normalize_text
-
-
-# ================= CONFIG =================
-
-MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-
-TUITION_KEYWORDS = [
-    "học phí", "hoc phi", "bao nhiêu tiền",
-    "chi phí", "đóng tiền", "phí"
-]
-
-MONEY_PATTERN = re.compile(
-    r"\b(\d+(\.\d+)?\s?(triệu|tr|vnd|vnđ|đ))\b",
-    re.IGNORECASE
+from src.rag.bm25_index import BM25Index
+from src.rag.index_state import read_index_version
+from src.rag.intent_classifier import IntentClassifier
+from src.rag.model_registry import get_client, get_collection, get_query_embedding_function
+from src.rag.rerank_features import (
+    TUITION_MATCHER,
+    features_of,
+    score_candidates,
+    select_top,
+    sentences_of,
+    trim_doc,
 )
+from src.utils.text_normalizer import normalize_text
+from src.utils.tracing import tracer
 
 
 class RetrievalService:
@@ -35,141 +30,222 @@ class RetrievalService:
     def __init__(self):
         print("🔎 Retrieval embedding device: CPU (explicit)")
 
-        # ❗ CPU ONLY – tuyệt đối không init CUDA
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=MODEL_NAME,
-            device="cpu"
-        )
+        # ❗ CPU ONLY – tuyệt đối không init CUDA (settings.EMBEDDING_DEVICE)
+        # Model + client lấy từ registry → dùng chung với RAGSystem
+        # embedding_fn: model + cache query (text đã normalize → vector)
+        self.embedding_fn = get_query_embedding_function()
+        self.client = get_client()
+        self.collection = get_collection()
 
-        self.client = PersistentClient(
-            path=settings.VECTOR_DB_DIR
-        )
+        self.score_threshold = settings.RETRIEVAL_SCORE_THRESHOLD
 
-        self.collection = self.client.get_or_create_collection(
-            name=settings.COLLECTION_NAME,
-            embedding_function=self.embedding_fn,
-            metadata={"hnsw:space": "cosine"}
+        # Intent theo embedding: chạy trên chính vector query → 1 lần encode / lượt
+        self.intent_classifier = (
+            IntentClassifier(self.embedding_fn) if settings.INTENT_EMBEDDING_ENABLED else None
         )
 
-        self.score_threshold = settings.RETRIEVAL_SCORE_THRESHOLD
+        # BM25 lexical index (load lazy, reload khi index version đổi)
+        self.bm25 = None
+        self._bm25_version = None
 
     # ================= PUBLIC =================
 
-    def retrieve(self, query: str, top_k: int = 5):
+    def prepare_query(self, query: str) -> str:
         query_norm = normalize_text(query)
 
         # ASR alias fix
-        query_norm = (
+        return (
             query_norm
             .replace("mpt", "fpt")
             .replace("mbt", "fpt")
         )
 
-        is_tuition_query = self._detect_tuition_intent(query_norm)
-
-        results = self.collection.query(
-            query_texts=[query_norm],
-            n_results=top_k * 2,
-            include=["documents", "metadatas", "distances"]
-        )
-
-        return self._rerank_results(
-            query_norm,
-            results,
-            is_tuition_query,
-            top_k
-        )
+    def embed_query(self, query: str):
+        """
+        Embedding của query (đã normalize) – dùng chung cho cache + Chroma
+        """
+        with tracer.span("embedding"):
+            return self.embedding_fn([self.prepare_query(query)])[0]
+
+    def classify_intent(self, query_embedding, query: str = "") -> set:
+        """
+        Intent từ vector query (đã embed) – set rỗng nếu tắt / không đủ tự tin
+        """
+        if self.intent_classifier is None or query_embedding is None:
+            return set()
+        with tracer.span("intent.embedding") as span:
+            found = self.intent_classifier.intents(query_embedding, self.prepare_query(query))
+            span.set(intent=",".join(sorted(found)))
+        return found
+
+    def retrieve(self, query: str, top_k: int = 5, query_embedding=None, intents=None):
+        """
+        intents: intent của lượt (keyword + embedding, controller) → không tính lại
+        """
+        with tracer.span("retrieval", top_k=top_k):
+            return self._retrieve(query, top_k, query_embedding, intents)
+
+    def _retrieve(self, query: str, top_k: int, query_embedding, intents):
+        query_norm = self.prepare_query(query)
+
+        bm25 = self._get_bm25()
+
+        if query_embedding is None and (bm25 is not None or self.intent_classifier is not None):
+            # Hybrid (distance cho doc chỉ có ở BM25) + intent cần vector query
+            with tracer.span("embedding"):
+                query_embedding = self.embedding_fn([query_norm])[0]
+
+        if intents is None:
+            # Không có intent của lượt (controller đã quét keyword) → tự quét
+            intents = self.classify_intent(query_embedding, query) | TUITION_MATCHER.groups(query_norm)
+        is_tuition_query = "tuition" in intents
+
+        if query_embedding is not None:
+            # Đã embed 1 lần (controller / ở trên) → Chroma không encode lại
+            with tracer.span("retrieval.chroma"):
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k * 2,
+                    include=["documents", "metadatas", "distances"]
+                )
+        else:
+            # Chroma tự encode → span gồm cả embedding
+            with tracer.span("retrieval.chroma", embed=True):
+                results = self.collection.query(
+                    query_texts=[query_norm],
+                    n_results=top_k * 2,
+                    include=["documents", "metadatas", "distances"]
+                )
+
+        if bm25 is not None:
+            with tracer.span("retrieval.bm25"):
+                results = self._fuse_lexical(
+                    bm25, query_norm, query_embedding, results, top_k * 2
+                )
+
+        with tracer.span("retrieval.rerank"):
+            return self._rerank_results(
+                query_norm,
+                results,
+                is_tuition_query,
+                top_k
+            )
+
+    # ================= HYBRID (BM25 + VECTOR) =================
+
+    def _get_bm25(self):
+        if not settings.HYBRID_SEARCH:
+            return None
+
+        # Collection re-index → load lại BM25 đi kèm
+        version = read_index_version()
+        if self.bm25 is None or version != self._bm25_version:
+            self.bm25 = BM25Index.load()
+            self._bm25_version = version
+
+        return self.bm25 if len(self.bm25) else None
+
+    def _fuse_lexical(self, bm25, query_norm, query_embedding, results, n_results):
+        """
+        Reciprocal-rank fusion: 1 / (RRF_K + rank) cộng từ 2 danh sách
+        - Doc chỉ có ở BM25 → lấy từ Chroma, tính cosine distance với query
+        """
+        lexical = bm25.search(query_norm, k=n_results)
+        if not lexical:
+            return results
+
+        vector_ids = results["ids"][0] if results.get("ids") else []
+        rows = {
+            doc_id: (doc, meta, dist)
+            for doc_id, doc, meta, dist in zip(
+                vector_ids,
+                results["documents"][0],
+                results["metadatas"][0],
+                results["distances"][0]
+            )
+        }
 
-    # ================= INTENT =================
+        fused = {}
+        for ranked in (vector_ids, [doc_id for doc_id, _ in lexical]):
+            for rank, doc_id in enumerate(ranked):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+
+        order = sorted(fused, key=fused.get, reverse=True)[:n_results]
+
+        missing = [doc_id for doc_id in order if doc_id not in rows]
+        if missing:
+            got = self.collection.get(
+                ids=missing,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            q = np.asarray(query_embedding, dtype=np.float32)
+            q = q / (np.linalg.norm(q) or 1.0)
+            for doc_id, doc, meta, emb in zip(
+                got["ids"], got["documents"], got["metadatas"], got["embeddings"]
+            ):
+                emb = np.asarray(emb, dtype=np.float32)
+                cos = float(emb @ q) / (float(np.linalg.norm(emb)) or 1.0)
+                rows[doc_id] = (doc, meta, 1.0 - cos)
+
+        order = [doc_id for doc_id in order if doc_id in rows]
 
-    def _detect_tuition_intent(self, query: str) -> bool:
-        return any(k in query for k in TUITION_KEYWORDS)
+        return {
+            "ids": [order],
+            "documents": [[rows[i][0] for i in order]],
+            "metadatas": [[rows[i][1] for i in order]],
+            "distances": [[rows[i][2] for i in order]],
+            "rrf": [[fused[i] for i in order]],
+        }
 
     # ================= RERANK =================
 
     def _rerank_results(self, query, results, is_tuition_query, top_k):
+        """
+        Feature (money / keyword / trim span) đã tính lúc index
+        → chỉ còn 1 lượt NumPy trên các candidate
+        """
         if not results.get("documents") or not results["documents"][0]:
             return self._empty_result()
 
-        candidates = []
-
-        for doc, meta, dist in zip(
-            results["documents"][0],
-            results["metadatas"][0],
-            results["distances"][0]
-        ):
-            score = max(0.0, 1.0 / (1.0 + dist))
-
-            # ---- intent boost ----
-            if is_tuition_query:
-                if meta.get("doc_type") == "tuition":
-                    score += 0.30
-                elif meta.get("doc_type") == "tuition_note":
-                    score += 0.15
-
-            # ---- money signal ----
-            if MONEY_PATTERN.search(doc):
-                score += 0.10
-
-            # ---- availability ----
-            if meta.get("available") is True:
-                score += 0.05
-
-            # ---- keyword soft boost ----
-            doc_norm = normalize_text(doc)
-            hits = sum(1 for k in TUITION_KEYWORDS if k in doc_norm)
-            score += min(hits * 0.03, 0.09)
-
-            if score < self.score_threshold:
-                continue
-
-            candidates.append({
-                "document": self._trim_doc(doc),
-                "metadata": meta,
-                "score": round(score, 4)
-            })
+        docs = results["documents"][0]
+        metas = [m or {} for m in results["metadatas"][0]]
+        feats = [features_of(doc, meta) for doc, meta in zip(docs, metas)]
+
+        scores = score_candidates(
+            results["distances"][0],
+            metas,
+            feats,
+            rrf=results.get("rrf", [[]])[0],
+            is_tuition_query=is_tuition_query,
+            rrf_weight=settings.RRF_WEIGHT,
+        )
 
-            if len(candidates) >= top_k * 2:
-                break
+        order, top_scores = select_top(scores, self.score_threshold, top_k)
 
         # ================= FALLBACK MỀM (FIX QUAN TRỌNG) =================
-        if not candidates:
+        if not order:
             # Lấy doc tốt nhất dù score thấp để LLM vẫn có context
-            doc = results["documents"][0][0]
-            meta = results["metadatas"][0][0]
-
             return {
-                "documents": [[self._trim_doc(doc)]],
-                "metadatas": [[meta]],
-                "scores": [[0.01]]
+                "documents": [[trim_doc(docs[0], feats[0])]],
+                "metadatas": [[results["metadatas"][0][0]]],
+                "scores": [[0.01]],
+                "sentences": [[sentences_of(docs[0], feats[0])]]
             }
 
-        candidates.sort(key=lambda x: x["score"], reverse=True)
-        candidates = candidates[:top_k]
-
         return {
-            "documents": [[c["document"] for c in candidates]],
-            "metadatas": [[c["metadata"] for c in candidates]],
-            "scores": [[c["score"] for c in candidates]]
+            "documents": [[trim_doc(docs[i], feats[i]) for i in order]],
+            "metadatas": [[results["metadatas"][0][i] for i in order]],
+            "scores": [top_scores],
+            # câu của chunk gốc (chưa trim) – extractive answer
+            "sentences": [[sentences_of(docs[i], feats[i]) for i in order]]
         }
 
     # ================= UTIL =================
 
-    def _trim_doc(self, doc: str, max_chars: int = 800):
-        if len(doc) <= max_chars:
-            return doc.strip()
-
-        match = MONEY_PATTERN.search(doc)
-        if match:
-            start = max(0, match.start() - 200)
-            end = min(len(doc), match.end() + 300)
-            return doc[start:end].strip()
-
-        return doc[:max_chars].strip() + "..."
-
     def _empty_result(self):
         return {
             "documents": [[]],
             "metadatas": [[]],
-            "scores": [[]]
+            "scores": [[]],
+            "sentences": [[]]
         }
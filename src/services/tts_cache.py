@@ -0,0 +1,180 @@
+# src/services/tts_cache.py
+# Content-addressed TTS cache – (voice, text, rate) → PCM float32 trên đĩa
+# Câu cố định + câu trả lời lặp lại → phát ngay, không gọi Edge-TTS
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from src.config.settings import settings
+
+
+class TTSCache:
+    """
+    - Key: sha1(voice | rate | text)
+    - File: <key>.<sample_rate>.npy (PCM đã decode + fade-in)
+    - Giới hạn dung lượng, xoá theo LRU (mtime = lần dùng cuối)
+    - pin(): giữ sẵn trong RAM cho câu cố định
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or settings.TTS_CACHE_DIR
+        self.max_bytes = max_bytes or settings.TTS_CACHE_MAX_BYTES
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # key → {"path", "fs", "size", "atime"}
+        self._index = {}
+        self._bytes = 0
+        self._pinned = {}            # key → (data, fs)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._scan()
+
+    # ================= KEY =================
+
+    @staticmethod
+    def key(voice: str, text: str, rate: str) -> str:
+        raw = f"{voice}|{rate}|{text.strip()}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    # ================= PUBLIC =================
+
+    def get(self, voice: str, text: str, rate: str):
+        """
+        Trả về (data, fs) hoặc None
+        """
+        k = self.key(voice, text, rate)
+
+        with self._lock:
+            if k in self._pinned:
+                self.hits += 1
+                return self._pinned[k]
+
+            entry = self._index.get(k)
+            if entry is None:
+                self.misses += 1
+                return None
+
+        try:
+            data = np.load(entry["path"])
+        except (OSError, ValueError):
+            with self._lock:
+                self._drop(k)
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry["atime"] = now
+            self.hits += 1
+        try:
+            os.utime(entry["path"], (now, now))
+        except OSError:
+            pass
+
+        return data, entry["fs"]
+
+    def put(self, voice: str, text: str, rate: str, data: np.ndarray, fs: int):
+        k = self.key(voice, text, rate)
+        path = os.path.join(self.cache_dir, f"{k}.{int(fs)}.npy")
+        data = np.ascontiguousarray(data, dtype=np.float32)
+
+        # Tên tạm riêng cho mỗi lần ghi → 2 thread / process cùng câu không ghi đè nhau
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{k}.", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ TTS cache write error: {e}")
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        with self._lock:
+            if k in self._index:
+                self._bytes -= self._index[k]["size"]
+            size = os.path.getsize(path)
+            self._index[k] = {
+                "path": path,
+                "fs": int(fs),
+                "size": size,
+                "atime": time.time(),
+            }
+            self._bytes += size
+            self._evict()
+
+    def pin(self, voice: str, text: str, rate: str, data: np.ndarray, fs: int):
+        with self._lock:
+            self._pinned[self.key(voice, text, rate)] = (data, fs)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "files": len(self._index),
+            "bytes": self._bytes,
+            "pinned": len(self._pinned),
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    # ================= INTERNAL =================
+
+    def _scan(self):
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                # File tạm sót lại sau crash (bỏ qua file đang được ghi)
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    if now - os.stat(path).st_mtime > 60:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(".npy"):
+                continue
+            try:
+                k, fs, _ = name.split(".")
+                fs = int(fs)
+            except ValueError:
+                continue
+
+            path = os.path.join(self.cache_dir, name)
+            st = os.stat(path)
+            self._index[k] = {
+                "path": path,
+                "fs": fs,
+                "size": st.st_size,
+                "atime": st.st_mtime,
+            }
+            self._bytes += st.st_size
+
+        self._evict()
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+
+        for k in sorted(self._index, key=lambda x: self._index[x]["atime"]):
+            if self._bytes <= self.max_bytes:
+                break
+            self._drop(k)
+
+    def _drop(self, k):
+        entry = self._index.pop(k, None)
+        if entry is None:
+            return
+        self._bytes -= entry["size"]
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
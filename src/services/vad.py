@@ -0,0 +1,173 @@
+# src/services/vad.py
+# Pluggable VAD – energy/ZCR (vector hoá) | WebRTC VAD | adaptive noise floor
+# Engine chỉ phân loại frame speech / non-speech; Endpointer chốt đầu / cuối câu
+
+import numpy as np
+
+from src.config.settings import settings
+
+
+def frame_signal(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """
+    1D audio → (n_frames, frame_size), bỏ phần dư cuối; view, không copy
+    """
+    n = len(audio) // frame_size
+    return np.asarray(audio[: n * frame_size], dtype=np.float32).reshape(n, frame_size)
+
+
+# ======================================================
+# ENGINES
+# ======================================================
+class VADEngine:
+    name = "base"
+
+    def __init__(self, sample_rate: int = 16000, frame_duration: float = 0.03):
+        self.sample_rate = sample_rate
+        self.frame_duration = frame_duration
+        self.frame_size = int(sample_rate * frame_duration)
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        """
+        frames: (n, frame_size) hoặc 1 frame (frame_size,) → bool (n,)
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class EnergyVAD(VADEngine):
+    """
+    Heuristic cũ (RMS + zero-crossing rate), tính 1 lần cho cả block frame
+    """
+    name = "energy"
+
+    def __init__(self, threshold: float = None, zcr_min: float = None, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold = threshold or settings.SILENCE_THRESHOLD
+        self.zcr_min = settings.VAD_ZCR_MIN if zcr_min is None else zcr_min
+
+    def is_speech(self, frames):
+        frames = np.atleast_2d(frames)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        zcr = np.mean(np.abs(np.diff(np.sign(frames), axis=1)), axis=1)
+        return (rms > self.threshold) & (zcr > self.zcr_min)
+
+
+class WebRTCVAD(VADEngine):
+    """
+    webrtcvad (GMM, C) – frame 10/20/30 ms, 8/16/32/48 kHz, PCM 16-bit
+    aggressiveness 0 (nhạy) → 3 (lọc noise mạnh)
+    """
+    name = "webrtc"
+
+    def __init__(self, aggressiveness: int = None, **kwargs):
+        super().__init__(**kwargs)
+        import webrtcvad  # lazy: chỉ cần khi chọn engine này
+
+        if int(round(self.frame_duration * 1000)) not in (10, 20, 30):
+            raise ValueError(f"webrtcvad cần frame 10/20/30 ms, nhận {self.frame_duration}s")
+
+        self.aggressiveness = (
+            settings.VAD_AGGRESSIVENESS if aggressiveness is None else aggressiveness
+        )
+        self._vad = webrtcvad.Vad(self.aggressiveness)
+
+    def is_speech(self, frames):
+        frames = np.atleast_2d(frames)
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+        return np.array(
+            [self._vad.is_speech(f.tobytes(), self.sample_rate) for f in pcm],
+            dtype=bool
+        )
+
+
+class AdaptiveVAD(VADEngine):
+    """
+    Noise floor tự thích nghi (dB):
+    - floor giảm nhanh theo frame yên tĩnh, tăng chậm → không "học" mất giọng nói
+    - speech khi năng lượng > floor + margin_db (và > min_db, bỏ mic im hẳn)
+    Năng lượng tính vector hoá, chỉ phần đệ quy floor chạy theo frame
+    """
+    name = "adaptive"
+
+    def __init__(self, margin_db: float = None, rise: float = 0.05,
+                 fall: float = 0.5, min_db: float = -60.0, **kwargs):
+        super().__init__(**kwargs)
+        self.margin_db = settings.VAD_NOISE_MARGIN_DB if margin_db is None else margin_db
+        self.rise = rise             # dB / frame khi đang lớn hơn floor
+        self.fall = fall             # hệ số bám xuống khi nhỏ hơn floor
+        self.min_db = min_db
+        self.floor = None
+
+    def reset(self):
+        self.floor = None
+
+    def is_speech(self, frames):
+        frames = np.atleast_2d(frames)
+        energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+        out = np.zeros(len(energy), dtype=bool)
+        floor = energy[0] if self.floor is None else self.floor
+        for i, e in enumerate(energy):
+            out[i] = e > floor + self.margin_db and e > self.min_db
+            if e < floor:
+                floor += self.fall * (e - floor)
+            else:
+                floor += min(self.rise, e - floor)
+        self.floor = float(floor)
+        return out
+
+
+VAD_ENGINES = {
+    EnergyVAD.name: EnergyVAD,
+    WebRTCVAD.name: WebRTCVAD,
+    AdaptiveVAD.name: AdaptiveVAD,
+}
+
+
+def create_vad(engine: str = None, **kwargs) -> VADEngine:
+    engine = (engine or settings.VAD_ENGINE).lower()
+    if engine not in VAD_ENGINES:
+        raise ValueError(f"Unknown VAD_ENGINE: {engine}")
+    return VAD_ENGINES[engine](**kwargs)
+
+
+# ======================================================
+# ENDPOINT
+# ======================================================
+class Endpointer:
+    """
+    Chốt câu nói từ chuỗi speech / non-speech của engine
+    - bắt đầu: đủ min_voice_frames frame speech
+    - kết thúc: > max_silence frame non-speech liên tiếp sau khi đã bắt đầu
+    """
+
+    def __init__(self, min_voice_frames: int, max_silence: int):
+        self.min_voice_frames = min_voice_frames
+        self.max_silence = max_silence
+        self.reset()
+
+    def reset(self):
+        self.voiced = 0
+        self.silence = 0
+        self.triggered = False
+
+    def update(self, speech: bool):
+        """
+        → "start" | "end" | None
+        """
+        if speech:
+            self.voiced += 1
+            self.silence = 0
+        else:
+            self.silence += 1
+
+        if not self.triggered and self.voiced >= self.min_voice_frames:
+            self.triggered = True
+            return "start"
+
+        if self.triggered and self.silence > self.max_silence:
+            return "end"
+
+        return None
@@ -0,0 +1,346 @@
+# src/services/voice_pipeline.py
+# Asyncio staged voice pipeline
+# capture/VAD → ASR → (controller) → retrieval → LLM → TTS → playback
+# Mỗi stage là 1 task, nối bằng asyncio.Queue có giới hạn, huỷ được giữa chừng
+
+import asyncio
+import concurrent.futures
+import threading
+
+from src.config.settings import settings
+from src.utils.tracing import tracer
+
+
+_DONE = object()
+_TRUNCATED = object()        # hết reply nhưng có câu TTS lỗi → không coi là trọn vẹn
+
+
+class VoicePipeline:
+    """
+    - Luôn thu âm: capture + ASR chạy liên tục, không chờ lượt trả lời
+    - Reply (1 câu trả lời) = retrieval → generation → synth → playback,
+      các stage chồng lên nhau; reply mới / interrupt() huỷ reply cũ
+    - Phần blocking (mic, ASR, Chroma, HTTP, audio out) chạy trong thread
+    """
+
+    def __init__(self, voice, queue_size: int = None):
+        self.voice = voice
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+
+        self.loop = None
+        self._utterances = None
+        self._texts = None
+        self._idle = None            # set khi không phát audio
+        self._tasks = []
+        self._reply = None
+        self._closing = False
+
+    # ================= LIFECYCLE =================
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._utterances = asyncio.Queue(maxsize=self.queue_size)
+        self._texts = asyncio.Queue(maxsize=self.queue_size)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self._tasks = [
+            asyncio.create_task(self._capture_stage(), name="capture"),
+            asyncio.create_task(self._asr_stage(), name="asr"),
+        ]
+
+    async def close(self):
+        self._closing = True
+        await self.interrupt()
+        self.voice.close()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def next_transcript(self) -> str:
+        # Turn của câu nói → context controller (reply task kế thừa)
+        turn, text = await self._texts.get()
+        tracer.set_turn(turn)
+        return text
+
+    # ================= STAGE: CAPTURE + VAD =================
+
+    async def _capture_stage(self):
+        while not self._closing:
+            # Tắt barge-in: không thu trong lúc loa đang phát
+            if self.voice.is_speaking and not self.voice.barge_in:
+                await self._idle.wait()
+                continue
+
+            info = {}
+            asr_stream = self.voice.start_transcription()
+            audio = await asyncio.to_thread(
+                self.voice.record_audio_with_vad, asr_stream, info
+            )
+
+            if audio is None:
+                asr_stream.cancel()
+                continue
+
+            # 1 lượt = từ lúc user nói xong → phát xong câu trả lời
+            tracer.start_turn(info.get("speech_end"))
+            if "speech_end" in info:
+                tracer.since_turn(
+                    "vad.endpoint",
+                    audio_s=round(len(audio) / self.voice.sample_rate, 2)
+                )
+            turn = tracer.current_turn()
+
+            if info.get("barge_in"):
+                # Stop word → loa đã dừng ngay trong check_barge_in
+                _, text = await asyncio.to_thread(
+                    self.voice.check_barge_in, asr_stream, audio, info
+                )
+                if text is not None:
+                    if text:
+                        await self._texts.put((turn, text))
+                    continue
+
+            await self._utterances.put((turn, asr_stream))
+
+    # ================= STAGE: ASR =================
+
+    async def _asr_stage(self):
+        while True:
+            turn, asr_stream = await self._utterances.get()
+            tracer.set_turn(turn)
+            try:
+                text = await asyncio.to_thread(self.voice.finish_transcription, asr_stream)
+            except Exception as e:
+                print(f"⚠️ ASR error: {e}")
+                continue
+
+            if text:
+                await self._texts.put((turn, text))
+
+    # ================= REPLY =================
+
+    async def say(self, text: str):
+        """
+        Phát câu cố định (không chờ phát xong)
+        """
+        async def produce(out):
+            await out.put(text)
+            await out.put(_DONE)
+
+        await self._start_reply(produce)
+
+    async def answer(self, query: str, retrieval, llm, query_embedding=None,
+                     on_complete=None, error_text: str = None, extractive=None,
+                     intents=None):
+        """
+        Retrieval → LLM (streaming từng câu) → TTS → playback
+        query_embedding / intents: đã tính từ 1 lần embed của lượt → không encode lại
+        extractive: ExtractiveAnswerer – đủ tự tin thì trả lời luôn, bỏ qua LLM
+        on_complete(answer): gọi khi đã phát hết (không bị ngắt)
+        """
+        error_text = error_text or llm.FALLBACK_ANSWER
+
+        async def produce(out):
+            # ---- STAGE: RETRIEVAL ----
+            try:
+                retrieved = await asyncio.to_thread(
+                    lambda: retrieval.retrieve(
+                        query=query,
+                        top_k=settings.CONTEXT_TOP_K,
+                        query_embedding=query_embedding,
+                        intents=intents
+                    )
+                )
+            except Exception as e:
+                print("❌ Retrieval error:", e)
+                await out.put(error_text)
+                await out.put(_DONE)
+                return
+
+            # ---- FAST PATH: EXTRACTIVE ----
+            if extractive is not None:
+                # Chấm câu + rerank trên CPU → không chặn event loop (barge-in, ASR)
+                try:
+                    text = await asyncio.to_thread(
+                        extractive.answer, query, retrieved, intents
+                    )
+                except Exception as e:
+                    print("⚠️ Extractive error:", e)
+                    text = None
+                if text:
+                    await out.put(text)
+                    await out.put(_DONE)
+                    return
+
+            # ---- STAGE: GENERATION ----
+            if settings.LLM_STREAMING:
+                await self._iterate_in_thread(
+                    lambda: llm.generate_answer_stream(
+                        query=query,
+                        retrieved_docs=retrieved
+                    ),
+                    out
+                )
+            else:
+                try:
+                    answer = await asyncio.to_thread(
+                        lambda: llm.generate_answer(query=query, retrieved_docs=retrieved)
+                    )
+                except Exception as e:
+                    print("❌ LLM error:", e)
+                    answer = error_text
+                await out.put(answer)
+
+            await out.put(_DONE)
+
+        def done(spoken):
+            answer = " ".join(spoken)
+            if on_complete is not None and answer and answer not in (
+                llm.FALLBACK_ANSWER, error_text
+            ):
+                on_complete(answer)
+
+        await self._start_reply(produce, done)
+
+    async def interrupt(self):
+        reply = self._reply
+        if reply is None or reply.done():
+            return
+
+        self.voice.stop()
+        reply.cancel()
+        await asyncio.gather(reply, return_exceptions=True)
+
+    async def wait_reply(self):
+        if self._reply is not None:
+            await asyncio.gather(self._reply, return_exceptions=True)
+
+    async def _start_reply(self, produce, on_complete=None):
+        await self.interrupt()
+        self._reply = asyncio.create_task(self._run_reply(produce, on_complete), name="reply")
+
+    async def _run_reply(self, produce, on_complete):
+        sentences = asyncio.Queue(maxsize=self.queue_size)
+        audio = asyncio.Queue(maxsize=settings.PIPELINE_AUDIO_QUEUE)
+
+        async def generate():
+            try:
+                await produce(sentences)
+            except Exception as e:
+                print(f"⚠️ Reply error: {e}")
+                await sentences.put(_DONE)
+
+        producer = asyncio.create_task(generate(), name="generate")
+        synth = asyncio.create_task(self._synth_stage(sentences, audio), name="synth")
+
+        try:
+            spoken, complete = await self._play_stage(audio)
+        finally:
+            for task in (producer, synth):
+                task.cancel()
+            await asyncio.gather(producer, synth, return_exceptions=True)
+
+        if complete and on_complete is not None:
+            on_complete(spoken)
+
+    # ================= STAGE: TTS =================
+
+    async def _synth_stage(self, sentences, audio):
+        skipped = False
+        while True:
+            sentence = await sentences.get()
+            if sentence is _DONE:
+                await audio.put(_TRUNCATED if skipped else _DONE)
+                return
+            if not sentence:
+                continue
+
+            try:
+                data, fs = await asyncio.to_thread(self.voice.synthesize, sentence)
+            except Exception as e:
+                print(f"⚠️ TTS error: {e}")
+                # Vẫn phát các câu sau, nhưng câu trả lời thiếu → không cache
+                skipped = True
+                continue
+
+            await audio.put((sentence, data, fs))
+
+    # ================= STAGE: PLAYBACK =================
+
+    async def _play_stage(self, audio):
+        """
+        → (các câu đã phát hết, True nếu phát trọn câu trả lời)
+        """
+        spoken = []
+        stream = None
+        write = None
+
+        try:
+            while True:
+                item = await audio.get()
+                if item is _DONE or item is _TRUNCATED:
+                    return spoken, item is _DONE
+
+                sentence, data, fs = item
+                if stream is None:
+                    self.voice.begin_playback()
+                    self._idle.clear()
+                    stream = await asyncio.to_thread(self.voice.open_output, fs)
+                    tracer.since_turn("playback.start")
+                    print("\n🤖 Bot:", end=" ", flush=True)
+
+                print(sentence, end=" ", flush=True)
+
+                write = asyncio.ensure_future(
+                    asyncio.to_thread(self.voice.write_output, stream, data)
+                )
+                if not await asyncio.shield(write):
+                    return spoken, False
+                spoken.append(sentence)
+
+        finally:
+            if stream is not None:
+                print()
+                # Block đang ghi dở phải xong trước khi đóng stream
+                if write is not None and not write.done():
+                    await asyncio.gather(write, return_exceptions=True)
+                await asyncio.to_thread(self.voice.close_output, stream)
+            self.voice.end_playback()
+            self._idle.set()
+
+    # ================= UTIL =================
+
+    async def _iterate_in_thread(self, factory, out):
+        """
+        Generator blocking (LLM stream) chạy trong thread, đẩy từng phần tử
+        vào asyncio.Queue (chờ khi queue đầy); huỷ → đóng generator
+        """
+        cancelled = threading.Event()
+        loop = self.loop
+
+        def worker():
+            gen = factory()
+            try:
+                for item in gen:
+                    future = asyncio.run_coroutine_threadsafe(out.put(item), loop)
+                    while True:
+                        try:
+                            future.result(timeout=0.1)
+                            break
+                        except concurrent.futures.TimeoutError:
+                            if cancelled.is_set():
+                                future.cancel()
+                                return
+                        except concurrent.futures.CancelledError:
+                            return
+                    if cancelled.is_set():
+                        return
+            finally:
+                gen.close()          # đóng HTTP stream của LLM
+
+        try:
+            await asyncio.to_thread(worker)
+        finally:
+            cancelled.set()
@@ -1,203 +1,380 @@
 # src/services/voice_service.py
-# OpenAI Whisper-1 ASR + Edge-TTS
+# Pluggable ASR (OpenAI Whisper-1 | Local Faster-Whisper) + Edge-TTS
 # Jetson SAFE – AUTO MIC – PRODUCTION GRADE (NO WORD LOSS – FINAL)
 
-import sounddevice as sd
-import soundfile as sf
 import numpy as np
-import tempfile
 import time
-import os
 import threading
 import asyncio
-import edge_tts
-from collections import deque
 
-from openai import OpenAI
 from src.config.settings import settings
+from src.services.asr_backends import create_asr_backend
+from src.services.audio_io import AudioInput, AudioOutput
+from src.services.barge_in import EchoSuppressor, InterruptStats, StopWordDetector
+from src.services.tts_cache import TTSCache
+from src.services.vad import Endpointer, create_vad
+from src.utils.audio_utils import decode_audio
+from src.utils.tracing import tracer
 
 
 class VoiceService:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(self, asr_backend=None, tts=None, mic=None, output_factory=None):
+        """
+        Inject (replay harness / test): tts(text) → (pcm, fs), mic giống AudioInput,
+        output_factory(fs) → giống AudioOutput; mặc định Edge-TTS + sounddevice
+        """
+        self.asr = asr_backend or create_asr_backend()
 
         self.sample_rate = 16000
         self.frame_duration = 0.03
         self.frame_size = int(self.sample_rate * self.frame_duration)
 
         self.max_record_seconds = 8
-        self.min_voice_frames = 6
+        self.min_voice_frames = settings.VAD_MIN_VOICE_FRAMES
         self.preroll_frames = int(0.4 / self.frame_duration)
 
+        self.vad = create_vad(
+            sample_rate=self.sample_rate,
+            frame_duration=self.frame_duration,
+        )
+
         self.voice = settings.TTS_VOICE
-        self.output_file = settings.OUTPUT_AUDIO_FILE
+        self.rate = settings.TTS_RATE
+        self._tts = tts or self._synthesize_edge
+        self.tts_cache = TTSCache() if settings.TTS_CACHE_ENABLED else None
 
         self.is_speaking = False
-        print("🔥 OpenAI ASR ready (whisper-1)")
+        self._stop_event = threading.Event()
+        self._closed = threading.Event()
+
+        # ---- barge-in (full duplex) ----
+        self.barge_in = settings.BARGE_IN_ENABLED
+        self.echo = EchoSuppressor()
+        self.stop_detector = StopWordDetector(self.asr)
+        self.interrupts = InterruptStats()
+        self._duck = 1.0             # gain loa, giảm khi user nói chen
+
+        # Gọi khi VAD bắt đầu 1 câu (vd: http_pool.prewarm) – phải nhanh, không block
+        self.on_speech_start = None
+
+        # ---- audio I/O: mở 1 lần, dùng suốt phiên ----
+        self.mic = mic or AudioInput(
+            self.sample_rate,
+            self.frame_size,
+            ring_seconds=settings.AUDIO_RING_SECONDS,
+            device=settings.MIC_DEVICE_INDEX,
+        )
+        self._output_factory = output_factory or (lambda fs: AudioOutput(
+            fs,
+            blocksize=settings.OUTPUT_BLOCK_SIZE,
+            buffer_seconds=settings.OUTPUT_BUFFER_SECONDS,
+        ))
+        self._outputs = {}           # sample rate → AudioOutput
+        print(f"🔥 ASR ready ({self.asr.name})")
 
     # ======================================================
     # RECORD AUDIO WITH VAD + PRE-ROLL
     # ======================================================
-    def record_audio_with_vad(self):
-        if self.is_speaking:
+    def record_audio_with_vad(self, asr_stream=None, info=None):
+        """
+        asr_stream: nếu có, frame được đẩy sang ASR ngay khi user còn nói
+        info: dict nhận thêm {"barge_in", "speech_end"}
+        Barge-in: đang phát vẫn thu, frame chỉ có echo bị chặn trước VAD
+        """
+        if self.is_speaking and not self.barge_in:
             return None
 
-        ring_buffer = deque(maxlen=self.preroll_frames)
-        frames = []
-
-        voiced = 0
-        silence = 0
-        max_silence = int(0.6 / self.frame_duration)
-
-        print("🎤 Mời bạn nói...")
+        self.mic.start()
+        pos = self.mic.position()    # chỉ nghe từ bây giờ, bỏ audio cũ trong ring
+        listen_start = pos
+        max_samples = int(self.max_record_seconds * self.sample_rate)
+        utter_start = None           # vị trí đầu câu (gồm pre-roll)
 
-        with sd.InputStream(
-            samplerate=self.sample_rate,
-            channels=1,
-            dtype="float32",
-            blocksize=self.frame_size,
-        ) as stream:
+        self.vad.reset()
+        normal_silence = int(settings.SILENCE_DURATION / self.frame_duration)
+        endpoint = Endpointer(self.min_voice_frames, normal_silence)
+        barge_in = False
+        # Quá độ dài này → không thể là stop word (check_barge_in bỏ qua)
+        barge_in_max = int(settings.BARGE_IN_MAX_SECONDS * self.sample_rate)
 
-            start_time = time.time()
-            triggered = False
+        if not self.is_speaking:
+            print("🎤 Mời bạn nói...")
 
-            while True:
-                if self.is_speaking:
-                    return None
+        while True:
+            if self._closed.is_set() or (self.is_speaking and not self.barge_in):
+                return None
 
-                indata, overflow = stream.read(self.frame_size)
-                if overflow:
-                    continue
+            # View trong ring (không copy); timeout → kiểm tra lại cờ
+            raw, pos = self.mic.read(pos)
+            if raw is None:
+                continue
 
-                frame = indata[:, 0]
-                ring_buffer.append(frame.copy())
+            # Hết cửa sổ stop word → câu hỏi thật, trả endpoint bình thường
+            # (không cắt ở khoảng ngừng ngắn đầu tiên)
+            if barge_in and endpoint.max_silence != normal_silence \
+                    and pos - utter_start > barge_in_max:
+                endpoint.max_silence = normal_silence
 
-                rms = np.sqrt(np.mean(frame ** 2))
-                zcr = np.mean(np.abs(np.diff(np.sign(frame))))
+            frame = raw
+            if self.is_speaking:
+                t_frame = self.mic.capture_time(pos - self.frame_size)
+                frame, _ = self.echo.process(raw, t_frame)
 
-                if rms > settings.SILENCE_THRESHOLD and zcr > 0.02:
-                    voiced += 1
-                    silence = 0
-                else:
-                    silence += 1
+            event = endpoint.update(bool(self.vad.is_speech(frame)[0]))
 
-                if not triggered and voiced >= self.min_voice_frames:
-                    triggered = True
-                    frames.extend(ring_buffer)
+            if event == "start":
+                if self.on_speech_start is not None:
+                    self.on_speech_start()
+                if self.is_speaking:
+                    # User nói chen → hạ loa ngay, endpoint ngắn hơn
+                    # (chỉ trong BARGE_IN_MAX_SECONDS đầu, đủ để bắt stop word)
+                    barge_in = True
+                    self._duck = settings.BARGE_IN_DUCK_GAIN
+                    endpoint.max_silence = int(settings.BARGE_IN_SILENCE / self.frame_duration)
+
+                # Pre-roll lấy thẳng từ ring, gồm cả frame hiện tại
+                utter_start = max(
+                    pos - self.preroll_frames * self.frame_size,
+                    listen_start,
+                    self.mic.ring.oldest,
+                )
+                if asr_stream is not None:
+                    # accept() copy view → ring quay vòng không ảnh hưởng ASR
+                    asr_stream.accept(self.mic.ring.view(utter_start, pos))
 
-                if triggered:
-                    frames.append(frame.copy())
+            elif endpoint.triggered and asr_stream is not None:
+                asr_stream.accept(raw)
 
-                if triggered and silence > max_silence:
-                    break
+            if event == "end":
+                break
 
-                if time.time() - start_time > self.max_record_seconds:
-                    break
+            if pos - listen_start > max_samples:
+                break
 
-        if not frames:
+        if utter_start is None:
             return None
 
-        return np.concatenate(frames)
+        if info is not None:
+            info["barge_in"] = barge_in
+            info["speech_end"] = self.mic.capture_time(pos) - endpoint.silence * self.frame_duration
+
+        # Zero-copy: view read-only, hợp lệ trong AUDIO_RING_SECONDS
+        return self.mic.ring.view(max(utter_start, self.mic.ring.oldest), pos)
 
     # ======================================================
-    # SPEECH TO TEXT (🔥 REAL FIX HERE)
+    # BARGE-IN
     # ======================================================
-    def speech_to_text(self):
-        if self.is_speaking:
-            return None
-
-        audio = self.record_audio_with_vad()
-        if audio is None:
-            return None
-
-        # 🔑 ABSOLUTE FIX: prepend 300ms silence
-        silence = np.zeros(int(self.sample_rate * 0.3), dtype=np.float32)
-        audio = np.concatenate([silence, audio])
-
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-            sf.write(f.name, audio, self.sample_rate)
-            wav_path = f.name
-
-        try:
-            t0 = time.time()
-            with open(wav_path, "rb") as audio_file:
-                result = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="vi",
-                    temperature=0.0,
-                )
+    def check_barge_in(self, asr_stream, audio, info):
+        """
+        Câu chen ngang lúc đang phát → có phải stop word không
+        → (is_stop, transcript | None nếu ASR chính cần decode tiếp)
+        Stop word → dừng loa ngay ở đây, không chờ controller
+        """
+        if len(audio) > settings.BARGE_IN_MAX_SECONDS * self.sample_rate:
+            self._duck = 1.0
+            return False, None
+
+        if self.stop_detector.shared:
+            text = self.finish_transcription(asr_stream) or ""
+        else:
+            text = self.stop_detector.transcribe(audio, self.sample_rate)
+
+        is_stop = bool(text) and self.stop_detector.matches(text)
+        if is_stop:
+            self.interrupts.detected(info["speech_end"])
+            self.stop()
+            print(f"🛑 Barge-in: {text}")
+            if not self.stop_detector.shared:
+                asr_stream.cancel()
+            return True, text
+
+        self._duck = 1.0
+        return False, (text if self.stop_detector.shared else None)
 
+    # ======================================================
+    # SPEECH TO TEXT (streaming backend)
+    # ======================================================
+    def start_transcription(self):
+        on_partial = None
+        if settings.ASR_SHOW_PARTIAL:
+            def on_partial(text):
+                print(f"💬 {text}", end="\r", flush=True)
+
+        return self.asr.start_stream(self.sample_rate, on_partial)
+
+    def finish_transcription(self, asr_stream):
+        """
+        Chốt transcript sau khi VAD đã kết thúc câu nói
+        """
+        t0 = time.time()
+        with tracer.span("asr", backend=self.asr.name):
+            text = asr_stream.finalize()
+
+        if settings.LOG_LATENCY:
             print(f"⚡ ASR latency: {int((time.time() - t0) * 1000)} ms")
 
-            text = result.text.strip()
-            if not text:
-                return None
-
-            blacklist = [
-                "subscribe",
-                "ghiền mì gõ",
-                "like và share",
-                "video hấp dẫn",
-            ]
-            if any(b in text.lower() for b in blacklist):
-                print(f"🚫 Reject ASR hallucination: {text}")
-                return None
+        if not text:
+            return None
 
-            return text
+        blacklist = [
+            "subscribe",
+            "ghiền mì gõ",
+            "like và share",
+            "video hấp dẫn",
+        ]
+        if any(b in text.lower() for b in blacklist):
+            print(f"🚫 Reject ASR hallucination: {text}")
+            return None
 
-        finally:
-            if os.path.exists(wav_path):
-                os.remove(wav_path)
+        return text
 
     # ======================================================
     # TTS (STABLE)
     # ======================================================
-    def speak(self, text: str):
-        if not text:
-            return
-
-        def worker():
-            self.is_speaking = True
-            try:
-                async def run():
-                    tts = edge_tts.Communicate(text, self.voice)
-                    await tts.save(self.output_file)
-
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(run())
-
-                data, fs = sf.read(self.output_file, dtype="float32")
+    def synthesize(self, text: str):
+        """
+        TTS cache → hit: phát ngay | miss: Edge-TTS rồi lưu cache
+        """
+        if self.tts_cache is not None:
+            cached = self.tts_cache.get(self.voice, text, self.rate)
+            if cached is not None:
+                tracer.record("tts.cache_hit", 0.0, chars=len(text))
+                return cached
+
+        with tracer.span("tts.synthesize", chars=len(text)):
+            data, fs = self._tts(text)
+
+        if self.tts_cache is not None:
+            self.tts_cache.put(self.voice, text, self.rate, data, fs)
+
+        return data, fs
+
+    def _synthesize_edge(self, text: str):
+        """
+        Edge-TTS stream → float32 PCM (đã fade-in), hoàn toàn trong RAM
+        """
+        import edge_tts  # lazy: không kéo aiohttp lúc khởi động
+
+        async def run():
+            audio = bytearray()
+            tts = edge_tts.Communicate(text, self.voice, rate=self.rate)
+            async for chunk in tts.stream():
+                if chunk["type"] == "audio":
+                    audio.extend(chunk["data"])
+            return bytes(audio)
+
+        loop = asyncio.new_event_loop()
+        try:
+            encoded = loop.run_until_complete(
+                asyncio.wait_for(run(), settings.TTS_DEADLINE)
+            )
+        finally:
+            loop.close()
 
-                fade = int(fs * 0.05)
-                data[:fade] *= np.linspace(0, 1, fade)
+        data, fs = decode_audio(encoded)
 
-                silence = np.zeros((int(fs * 0.03),), dtype=np.float32)
+        fade = min(int(fs * 0.05), len(data))
+        data[:fade] *= np.linspace(0, 1, fade)
 
-                with sd.OutputStream(
-                    samplerate=fs,
-                    channels=1,
-                    dtype="float32",
-                    blocksize=512,
-                ) as stream:
-                    stream.write(silence.reshape(-1, 1))
-                    stream.write(data.reshape(-1, 1))
+        return data, fs
 
-            finally:
-                self.is_speaking = False
+    def prerender(self, texts, background: bool = True):
+        """
+        Render sẵn câu cố định lúc khởi động + giữ trong RAM
+        """
+        if self.tts_cache is None:
+            return
 
-        threading.Thread(target=worker, daemon=True).start()
+        def worker():
+            for text in texts:
+                try:
+                    data, fs = self.synthesize(text)
+                    self.tts_cache.pin(self.voice, text, self.rate, data, fs)
+                except Exception as e:
+                    print(f"⚠️ Prerender error: {e}")
+            print(f"🗂️ TTS cache ready {self.tts_cache.stats()}")
+
+        if background:
+            threading.Thread(target=worker, daemon=True).start()
+        else:
+            worker()
+
+    def open_output(self, fs):
+        """
+        Output stream dài hạn theo sample rate (mở lần đầu, sau đó dùng lại)
+        """
+        output = self._outputs.get(fs)
+        if output is None:
+            output = self._output_factory(fs)
+            self._outputs[fs] = output
+        output.start()
+        return output
+
+    def close_output(self, output):
+        # Không đóng stream: drain() chờ phát hết, flush() bỏ ngay khi bị ngắt
+        if self._stop_event.is_set():
+            output.flush()
+            event = self.interrupts.halted()
+            if event:
+                tracer.record("interrupt.detect", event["detect_ms"] / 1000)
+                tracer.record("interrupt.halt", event["halt_ms"] / 1000)
+            if event and settings.LOG_LATENCY:
+                print(
+                    f"⚡ Interrupt latency: {event['total_ms']} ms "
+                    f"(detect {event['detect_ms']} + halt {event['halt_ms']})"
+                )
+        else:
+            output.drain(self._stop_event)
+
+    def write_output(self, output, data, block: int = 1024) -> bool:
+        """
+        Ghi theo block nhỏ → stop() có hiệu lực sau tối đa 1 block
+        Mỗi block đã ghi là reference cho echo suppressor
+        Trả về False nếu bị ngắt giữa chừng
+        """
+        for i in range(0, len(data), block):
+            if self._stop_event.is_set():
+                return False
+            chunk = data[i:i + block]
+            if self._duck != 1.0:
+                chunk = chunk * self._duck
+            if not output.write(chunk, self._stop_event):
+                return False
+            # chunk vừa ghi nằm cuối ring → phát sau phần còn chờ + latency
+            t_play = (time.monotonic() + output.latency + output.pending_seconds()
+                      - len(chunk) / output.sample_rate)
+            self.echo.push_reference(chunk, output.sample_rate, t_play)
+        return True
+
+    def begin_playback(self):
+        self._stop_event.clear()
+        self._duck = 1.0
+        self.is_speaking = True
+
+    def end_playback(self):
+        self.is_speaking = False
 
     def stop(self):
-        try:
-            sd.stop()
-        except Exception:
-            pass
+        self._stop_event.set()
+        # Bỏ phần chưa phát ngay → loa im sau tối đa 1 callback block
+        for output in list(self._outputs.values()):
+            output.flush()
         self.is_speaking = False
 
-    def listen(self):
-        if self.is_speaking:
-            time.sleep(0.1)
-            return None
-        return self.speech_to_text()
+    def close(self):
+        """
+        Dừng vòng thu âm đang chạy + đóng audio stream (pipeline thoát)
+        """
+        self._closed.set()
+        self.stop()
+        self.mic.close()
+        for output in self._outputs.values():
+            output.close()
+
+    def audio_stats(self) -> dict:
+        return {
+            "input_xruns": self.mic.xruns,
+            "input_dropped_frames": self.mic.dropped_frames,
+            "output_xruns": sum(o.xruns for o in self._outputs.values()),
+            "output_underflows": sum(o.underflows for o in self._outputs.values()),
+        }
@@ -1 +1,29 @@
- # silence detect, audio helpers
\ No newline at end of file
+# src/utils/audio_utils.py
+# Audio helpers – encode / decode hoàn toàn trong RAM (không file tạm)
+
+import io
+
+import numpy as np
+import soundfile as sf
+
+
+def encode_wav(audio: np.ndarray, sample_rate: int, name: str = "audio.wav") -> io.BytesIO:
+    """
+    numpy → WAV (PCM 16-bit) trong BytesIO, sẵn sàng để upload
+    - .name giúp SDK (OpenAI) nhận đúng định dạng file
+    """
+    buf = io.BytesIO()
+    sf.write(buf, audio, sample_rate, format="WAV", subtype="PCM_16")
+    buf.seek(0)
+    buf.name = name
+    return buf
+
+
+def decode_audio(data: bytes):
+    """
+    Bytes (mp3 / wav ...) → (float32 mono, sample_rate)
+    """
+    audio, fs = sf.read(io.BytesIO(data), dtype="float32")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    return np.ascontiguousarray(audio, dtype=np.float32), fs
@@ -0,0 +1,110 @@
+# src/utils/keyword_matcher.py
+# Matcher nhiều keyword compile 1 lần (trie → 1 regex), quét text 1 lượt
+# - Kết quả giống hệt `any(k in text for k in keywords)` cho từng nhóm,
+#   kể cả keyword chồng lên nhau ("dừng tư vấn" ⊃ "dừng", "tư vấn")
+# - Quét match dài nhất trái → phải (không chồng); keyword nằm trong match
+#   suy ra từ bảng tính sẵn (không quét lại)
+# - Chỉ khi có 2 keyword "gối đầu" (đuôi keyword này = đầu keyword kia) mới
+#   cần lookahead ở mọi vị trí (chậm hơn) để không sót match chồng nhau
+
+import re
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Trie → regex đã gộp tiền tố: thử nhánh dài trước (greedy)
+    node: {char: child, "": True nếu có keyword kết thúc tại đây}
+    """
+    end = "" in node
+    branches = [re.escape(ch) + _trie_pattern(child)
+                for ch, child in sorted(node.items()) if ch]
+
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if end else body
+
+
+class KeywordMatcher:
+    """
+    groups: {tên nhóm: [keyword, ...]}
+    - scan(text)  → {nhóm: [keyword khớp, theo thứ tự trong bảng]}
+    - groups(text) → set nhóm có ít nhất 1 keyword trong text
+    """
+
+    def __init__(self, groups: dict):
+        self.tables = {name: list(keywords) for name, keywords in groups.items()}
+
+        owners = {}                          # keyword → [(nhóm, vị trí trong bảng)]
+        for name, keywords in self.tables.items():
+            for i, kw in enumerate(keywords):
+                if kw:
+                    owners.setdefault(kw, []).append((name, i))
+
+        trie = {}
+        for kw in owners:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        self.overlapping = self._has_overlap(owners)
+        pattern = _trie_pattern(trie)
+
+        if self.overlapping:
+            # match dài nhất tại mọi vị trí → keyword là tiền tố của match
+            self._implied = {
+                kw: tuple(o for n in range(1, len(kw) + 1) if kw[:n] in owners
+                          for o in owners[kw[:n]])
+                for kw in owners
+            }
+            self._regex = re.compile(f"(?=({pattern}))") if owners else None
+        else:
+            # match không chồng → keyword là chuỗi con của match
+            self._implied = {
+                kw: tuple(o for sub in owners if sub in kw for o in owners[sub])
+                for kw in owners
+            }
+            self._regex = re.compile(f"({pattern})") if owners else None
+
+    @staticmethod
+    def _has_overlap(keywords) -> bool:
+        """
+        Có keyword B bắt đầu giữa keyword A và kéo dài quá A không
+        (đuôi thật sự của A = đầu thật sự của B)
+        """
+        prefixes = {kw[:n] for kw in keywords for n in range(1, len(kw))}
+        return any(kw[i:] in prefixes for kw in keywords for i in range(1, len(kw)))
+
+    def _hits(self, text: str) -> set:
+        hits = set()
+        if self._regex is None or not text:
+            return hits
+        implied = self._implied
+        for m in self._regex.finditer(text):
+            key = m.group(1)
+            if key:
+                hits.update(implied[key])
+        return hits
+
+    def scan(self, text: str) -> dict:
+        found = {}
+        for name, i in sorted(self._hits(text), key=lambda h: (h[0], h[1])):
+            found.setdefault(name, []).append(self.tables[name][i])
+        return found
+
+    def groups(self, text: str) -> set:
+        return {name for name, _ in self._hits(text)}
+
+    def first(self, text: str, group: str):
+        """
+        Keyword khớp đứng đầu bảng (giống vòng for ... if k in text: break)
+        """
+        hits = [i for name, i in self._hits(text) if name == group]
+        return self.tables[group][min(hits)] if hits else None
+
+    def count(self, text: str, group: str) -> int:
+        """
+        Số keyword (tính theo bảng, kể cả trùng) của nhóm có trong text
+        """
+        return sum(1 for name, _ in self._hits(text) if name == group)
@@ -0,0 +1,146 @@
+# src/utils/startup.py
+# Cold start: đo thời gian import / init + warm-up model ở background thread
+# → IDLE loop nghe được ngay, ACTIVE chỉ chờ (barrier) khi thật sự cần model
+
+import builtins
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupProfiler:
+    """
+    - Import: bọc builtins.__import__, ghi thời gian của module top-level
+      chưa có trong sys.modules (đã gồm các module con nó kéo theo)
+    - Step: thời gian từng bước init (ghi cả khi chạy ở thread warm-up)
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.t0 = time.perf_counter()
+        self.imports = {}            # module → seconds
+        self.steps = []              # (name, thread, start, seconds)
+        self.marks = {}              # mốc: first_listen, ready, ...
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._orig_import = None
+
+    # ================= IMPORT =================
+
+    def install(self):
+        if not self.enabled or self._orig_import is not None:
+            return
+
+        self._orig_import = builtins.__import__
+        orig = self._orig_import
+        local = self._local
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            depth = getattr(local, "depth", 0)
+            if depth or level or name in sys.modules:
+                local.depth = depth + 1
+                try:
+                    return orig(name, globals, locals, fromlist, level)
+                finally:
+                    local.depth = depth
+
+            local.depth = 1
+            start = time.perf_counter()
+            try:
+                return orig(name, globals, locals, fromlist, level)
+            finally:
+                local.depth = 0
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.imports[name] = self.imports.get(name, 0.0) + elapsed
+
+        builtins.__import__ = timed_import
+
+    def uninstall(self):
+        if self._orig_import is not None:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+
+    # ================= STEP =================
+
+    def step(self, name: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.steps.append((
+                    name,
+                    threading.current_thread().name,
+                    start - self.t0,
+                    time.perf_counter() - start,
+                ))
+
+    def mark(self, name: str):
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self.t0)
+
+    # ================= REPORT =================
+
+    def report(self, top: int = 15) -> str:
+        with self._lock:
+            imports = sorted(self.imports.items(), key=lambda x: x[1], reverse=True)
+            steps = sorted(self.steps, key=lambda x: x[2])
+            marks = sorted(self.marks.items(), key=lambda x: x[1])
+
+        lines = ["", "⏱️ Startup profile", "-" * 60, "Imports (top-level, gồm module con):"]
+        for name, sec in imports[:top]:
+            lines.append(f"  {sec * 1000:8.0f} ms  {name}")
+
+        lines.append("Init steps (bắt đầu @ thời điểm, thread):")
+        for name, thread, start, sec in steps:
+            lines.append(f"  {sec * 1000:8.0f} ms  {name:<28} @{start:6.2f} s  [{thread}]")
+
+        lines.append("Mốc:")
+        for name, sec in marks:
+            lines.append(f"  {sec:8.2f} s   {name}")
+        lines.append("-" * 60)
+
+        return "\n".join(lines)
+
+
+class Warmup:
+    """
+    Chạy các bước init nặng ở thread nền
+    - wait(name): readiness barrier, raise lại lỗi nếu warm-up hỏng
+    """
+
+    def __init__(self, profiler: StartupProfiler, workers: int = 3):
+        self.profiler = profiler
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+        self._futures = {}
+
+    def submit(self, name: str, fn, *args, **kwargs):
+        self._futures[name] = self._pool.submit(self.profiler.step, name, fn, *args, **kwargs)
+        return self._futures[name]
+
+    def after(self, name: str, deps, fn):
+        """
+        Bước phụ thuộc: chờ deps xong rồi gọi fn(*kết quả deps)
+        """
+        def run():
+            results = [self.wait(d) for d in deps]
+            return self.profiler.step(name, fn, *results)
+
+        self._futures[name] = self._pool.submit(run)
+        return self._futures[name]
+
+    def ready(self, name: str) -> bool:
+        future = self._futures.get(name)
+        return future is not None and future.done()
+
+    def wait(self, name: str, timeout: float = None):
+        return self._futures[name].result(timeout=timeout)
+
+    def wait_all(self, timeout: float = None):
+        return {name: self.wait(name, timeout) for name in list(self._futures)}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
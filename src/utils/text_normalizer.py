@@ -4,6 +4,8 @@
 import re
 import unicodedata
 
+from src.utils.keyword_matcher import KeywordMatcher
+
 
 # ===== ABBREVIATION =====
 ABBREVIATION_MAP = {
@@ -30,6 +32,12 @@ COMMAND_FIX = {
     "kết thuc": "kết thúc",
 }
 
+# Compile 1 lần: 1 lượt quét thay cho vòng `k in text` qua COMMAND_FIX
+COMMAND_MATCHER = KeywordMatcher({"command": list(COMMAND_FIX)})
+
+# Từ = chuỗi \w liên tục (bỏ dấu câu + split + gộp space trong 1 lượt)
+WORD_RE = re.compile(r"\w+")
+
 
 def normalize_text(text: str) -> str:
     """
@@ -47,21 +55,27 @@ def normalize_text(text: str) -> str:
     # 2️⃣ Chuẩn hoá unicode tiếng Việt
     text = unicodedata.normalize("NFC", text)
 
-    # 3️⃣ ASR COMMAND FIX (PHẢI LÀM TRƯỚC)
-    for k, v in COMMAND_FIX.items():
-        if k in text:
-            text = v
-            return text  # ⛔ Ưu tiên command, không normalize thêm
+    # 3️⃣ ASR COMMAND FIX (PHẢI LÀM TRƯỚC) – key đứng đầu bảng thắng
+    command = COMMAND_MATCHER.first(text, "command")
+    if command is not None:
+        return COMMAND_FIX[command]  # ⛔ Ưu tiên command, không normalize thêm
 
-    # 4️⃣ Remove punctuation (giữ chữ + số)
-    text = re.sub(r"[^\w\s]", " ", text)
+    # 4️⃣ Bỏ dấu câu (giữ chữ + số) + abbreviation + gộp space: 1 lượt regex
+    return " ".join(ABBREVIATION_MAP.get(w, w) for w in WORD_RE.findall(text))
 
-    # 5️⃣ Normalize abbreviations
-    words = text.split()
-    words = [ABBREVIATION_MAP.get(w, w) for w in words]
-    text = " ".join(words)
 
-    # 6️⃣ Collapse spaces
-    text = re.sub(r"\s+", " ", text).strip()
+def tokenize(text: str) -> list:
+    """
+    Token cho lexical search (BM25) – giống normalize_text
+    nhưng KHÔNG áp dụng COMMAND_FIX (chunk dài không phải voice command)
+    """
+    if not text:
+        return []
+
+    text = unicodedata.normalize("NFC", text.lower())
+    text = re.sub(r"[^\w\s]", " ", text)
 
-    return text
+    words = []
+    for w in text.split():
+        words.extend(ABBREVIATION_MAP.get(w, w).split())
+    return words
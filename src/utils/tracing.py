@@ -0,0 +1,295 @@
+# src/utils/tracing.py
+# Tracing theo lượt hội thoại: span cho từng stage + histogram trong process
+# - Turn id đi theo contextvars → tự truyền qua asyncio task / asyncio.to_thread
+# - Export: JSONL (thread ghi nền) | OpenTelemetry SDK | none
+# - Hot path: 1 lần monotonic() + 1 bisect + đẩy vào queue, không I/O
+
+import contextvars
+import itertools
+import json
+import math
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+
+from src.config.settings import settings
+
+
+# Bucket log (1.25x) từ 0.1 ms → ~120 s: sai số percentile <= 12.5%
+BUCKET_BOUNDS = [0.1 * 1.25 ** i for i in range(64)]
+
+_turn = contextvars.ContextVar("trace_turn", default=None)     # (turn_id, t0)
+
+
+# ======================================================
+# HISTOGRAM
+# ======================================================
+class Histogram:
+    """
+    Histogram bucket cố định (ms) – add() O(log n), không giữ từng mẫu
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50": round(self.percentile(50), 1),
+            "p95": round(self.percentile(95), 1),
+            "p99": round(self.percentile(99), 1),
+            "mean": round(self.total / self.count, 1) if self.count else 0.0,
+            "max": round(self.max, 1),
+        }
+
+
+# ======================================================
+# EXPORTERS
+# ======================================================
+class JSONLExporter:
+    """
+    1 dòng JSON / span, ghi ở thread nền (hot path chỉ put vào queue)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-jsonl", daemon=True)
+        self._thread.start()
+
+    def export(self, record: dict):
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+
+class OTelExporter:
+    """
+    OpenTelemetry SDK (đã pin trong requirements) – BatchSpanProcessor
+    + OTLP gRPC (OTEL_EXPORTER_OTLP_ENDPOINT, mặc định localhost:4317)
+    Span được tạo lại với start / end đã đo → không giữ span mở trong hot path
+    """
+
+    def __init__(self):
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        self._provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.TRACE_SERVICE_NAME})
+        )
+        self._provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        self._tracer = self._provider.get_tracer("voice-rag-chatbot")
+
+    def export(self, record: dict):
+        start_ns = int(record["start"] * 1e9)
+        span = self._tracer.start_span(
+            record["name"],
+            start_time=start_ns,
+            attributes={"turn.id": record["turn"] or 0, **record.get("attrs", {})},
+        )
+        span.end(end_time=start_ns + int(record["ms"] * 1e6))
+
+    def shutdown(self):
+        self._provider.shutdown()
+
+
+# ======================================================
+# TRACER
+# ======================================================
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "turn", "t0")
+
+    def __init__(self, tracer, name, attrs, turn):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.turn = turn
+
+    def __enter__(self):
+        self.t0 = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, time.monotonic() - self.t0, turn=self.turn,
+                           start=self.t0, **self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    - start_turn(): turn id mới cho context hiện tại (t0 = lúc user nói xong)
+    - span(name): with-block đo 1 stage | record(name, seconds): đã đo sẵn
+    - since_turn(name): thời gian từ đầu turn (vd: playback.start)
+    """
+
+    def __init__(self, enabled: bool = None, export: str = None, path: str = None):
+        self.enabled = settings.TRACE_ENABLED if enabled is None else enabled
+        self._ids = itertools.count(1)
+        self._hist = {}
+        self._lock = threading.Lock()
+
+        # monotonic → wall clock cho exporter
+        self._wall_offset = time.time() - time.monotonic()
+
+        # Exporter tạo lazy ở span đầu tiên → import module không mở file / thread
+        self.export = (export or settings.TRACE_EXPORT).lower()
+        self.path = path or settings.TRACE_FILE
+        self.exporter = None
+        self._exporter_ready = False
+
+    # ================= TURN =================
+
+    def start_turn(self, t0: float = None) -> int:
+        turn_id = next(self._ids)
+        _turn.set((turn_id, t0 or time.monotonic()))
+        return turn_id
+
+    def set_turn(self, turn):
+        """
+        turn: (turn_id, t0) lấy từ current_turn() ở context khác
+        """
+        _turn.set(turn)
+
+    @staticmethod
+    def current_turn():
+        return _turn.get()
+
+    # ================= SPAN =================
+
+    def span(self, name: str, turn=None, **attrs):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, attrs, turn)
+
+    def record(self, name: str, seconds: float, turn=None, start: float = None, **attrs):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        turn = turn or _turn.get()
+
+        with self._lock:
+            hist = self._hist.get(name)
+            if hist is None:
+                hist = self._hist[name] = Histogram()
+            hist.add(ms)
+
+        exporter = self.exporter if self._exporter_ready else self._init_exporter()
+        if exporter is not None:
+            t_start = (start if start is not None else time.monotonic() - seconds)
+            exporter.export({
+                "turn": turn[0] if turn else None,
+                "name": name,
+                "start": round(t_start + self._wall_offset, 6),
+                "ms": round(ms, 3),
+                "attrs": attrs,
+            })
+
+    def _init_exporter(self):
+        with self._lock:
+            if not self._exporter_ready:
+                self._exporter_ready = True
+                if self.export == "jsonl":
+                    self.exporter = JSONLExporter(self.path)
+                elif self.export == "otel":
+                    try:
+                        self.exporter = OTelExporter()
+                    except ImportError as e:
+                        print(f"⚠️ OpenTelemetry chưa cài ({e.name}) → chỉ giữ histogram")
+        return self.exporter
+
+    def since_turn(self, name: str, **attrs):
+        turn = _turn.get()
+        if turn is not None:
+            self.record(name, time.monotonic() - turn[1], turn=turn, start=turn[1], **attrs)
+
+    # ================= REPORT =================
+
+    def histograms(self) -> dict:
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._hist.items())}
+
+    def percentile(self, name: str, q: float = 50):
+        """
+        Percentile (ms) của 1 span, None khi chưa có mẫu
+        """
+        with self._lock:
+            hist = self._hist.get(name)
+            return hist.percentile(q) if hist is not None and hist.count else None
+
+    def report(self) -> str:
+        lines = ["", "📊 Latency (ms)", "-" * 72,
+                 f"{'span':<26}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>10}"]
+        for name, s in self.histograms().items():
+            lines.append(f"{name:<26}{s['count']:>7}{s['p50']:>9}{s['p95']:>9}"
+                         f"{s['p99']:>9}{s['max']:>10}")
+        lines.append("-" * 72)
+        return "\n".join(lines)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+            self.exporter = None
+
+
+tracer = Tracer()
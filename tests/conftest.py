@@ -0,0 +1,7 @@
+# tests/conftest.py
+# Chạy từ gốc repo: python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
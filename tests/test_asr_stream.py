@@ -0,0 +1,146 @@
+# tests/test_asr_stream.py
+# LocalWhisperStream với decoder giả: partial, chốt segment, finalize chỉ decode phần đuôi
+
+import numpy as np
+import pytest
+
+from src.config.settings import settings
+from src.services.asr_backends import LocalWhisperStream
+
+
+SR = 100                     # sample rate nhỏ → audio test ngắn, dễ đọc
+
+
+class StubDecoder:
+    """
+    Mỗi đoạn sample khác 0 liên tục = 1 segment, text = "w<giá trị>"
+    Thời gian tính theo audio được đưa vào (như faster-whisper)
+    """
+
+    def __init__(self):
+        self.calls = []      # số sample mỗi lần decode
+
+    def decode_segments(self, audio, vad_filter=False):
+        self.calls.append(len(audio))
+        segments = []
+        start = None
+        for i, value in enumerate(np.append(audio, 0.0)):
+            if value and start is None:
+                start = i
+            elif not value and start is not None:
+                segments.append((start / SR, i / SR, f"w{int(audio[start])}"))
+                start = None
+        return segments
+
+
+def speech(word: int, seconds: float):
+    return np.full(int(seconds * SR), word, dtype=np.float32)
+
+
+def silence(seconds: float):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    # Worker nền không tự chạy → test gọi _decode_pending đúng lúc cần
+    monkeypatch.setattr(settings, "ASR_PARTIAL_INTERVAL", 60.0)
+    monkeypatch.setattr(settings, "ASR_COMMIT_MARGIN", 0.8)
+    monkeypatch.setattr(settings, "ASR_COMMIT_TOLERANCE", 0.2)
+
+    partials = []
+    s = LocalWhisperStream(StubDecoder(), SR, on_partial=partials.append)
+    s.partials = partials
+    yield s
+    s.cancel()
+
+
+def decode(stream):
+    stream._decode_pending(stream.audio())
+
+
+def test_partial_reports_text_so_far(stream):
+    stream.accept(speech(1, 0.5))
+    decode(stream)
+
+    assert stream.partial() == "w1"
+    assert stream.partials == ["w1"]
+    assert stream._committed_pos == 0        # còn sát mép audio → chưa chốt
+
+
+def test_single_segment_commits_once_stable(stream):
+    # Câu ngắn 1 segment: chốt theo end time, không cần segment thứ 2
+    stream.accept(speech(1, 0.5))
+    stream.accept(silence(1.0))
+    decode(stream)
+    assert stream._committed_pos == 0        # mới thấy 1 lần
+
+    stream.accept(silence(0.2))
+    decode(stream)
+    assert stream._committed_pos == int(0.5 * SR)
+    assert stream._committed_text == ["w1"]
+    assert stream.partial() == "w1"
+
+
+def test_segment_near_live_edge_is_not_committed(stream):
+    # Kết thúc cách mép audio < ASR_COMMIT_MARGIN → whisper có thể còn sửa
+    stream.accept(speech(1, 0.5))
+    stream.accept(silence(0.4))
+    decode(stream)
+    decode(stream)
+    assert stream._committed_pos == 0
+
+
+def test_changed_text_is_not_committed(stream):
+    stream.accept(speech(1, 0.5))
+    stream.accept(silence(1.0))
+    decode(stream)
+
+    # Lần decode sau whisper ra text khác cho cùng đoạn → chưa ổn định
+    decode_segments = stream.backend.decode_segments
+    stream.backend.decode_segments = lambda audio: [
+        (start, end, text + "!") for start, end, text in decode_segments(audio)
+    ]
+    decode(stream)
+    assert stream._committed_pos == 0
+
+    decode(stream)
+    assert stream._committed_text == ["w1!"]
+
+
+def test_decode_after_commit_only_sees_tail(stream):
+    stream.accept(speech(1, 0.5))
+    stream.accept(silence(1.0))
+    decode(stream)
+    decode(stream)
+    committed = stream._committed_pos
+
+    stream.accept(speech(2, 0.4))
+    decode(stream)
+
+    assert stream.backend.calls[-1] == len(stream.audio()) - committed
+    assert stream.partial() == "w1 w2"
+
+
+def test_finalize_decodes_only_uncommitted_tail(stream):
+    stream.accept(speech(1, 0.5))
+    stream.accept(silence(1.0))
+    decode(stream)
+    decode(stream)
+    committed = stream._committed_pos
+
+    stream.accept(speech(2, 0.4))
+    stream.accept(silence(0.3))
+    text = stream.finalize()
+
+    assert text == "w1 w2"
+    assert stream.backend.calls[-1] == len(stream.audio()) - committed
+
+
+def test_finalize_without_commit_decodes_everything(stream):
+    stream.accept(speech(1, 0.3))
+    stream.accept(silence(0.1))
+    stream.accept(speech(2, 0.3))
+
+    assert stream.finalize() == "w1 w2"
+    assert stream.backend.calls == [len(stream.audio())]
@@ -0,0 +1,113 @@
+# tests/test_index_pipeline.py
+# IndexPipeline với collection giả trong RAM (không cần Chroma / model)
+
+import json
+
+import numpy as np
+import pytest
+
+from src.rag.index_manifest import IndexManifest
+from src.rag.index_pipeline import IndexPipeline
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}           # id → (document, metadata)
+        self.added = 0
+        self.scans = 0           # get() không theo id = quét cả collection
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        if ids is None:
+            self.scans += 1
+            keys = sorted(self.rows)[offset:offset + (limit or len(self.rows))]
+        else:
+            keys = [i for i in ids if i in self.rows]
+        return {
+            "ids": keys,
+            "documents": [self.rows[k][0] for k in keys],
+            "metadatas": [dict(self.rows[k][1]) for k in keys],
+        }
+
+    def add(self, ids, embeddings, documents, metadatas):
+        for i, doc, meta in zip(ids, documents, metadatas):
+            self.rows[i] = (doc, dict(meta))
+        self.added += len(ids)
+
+    def update(self, ids, metadatas):
+        for i, meta in zip(ids, metadatas):
+            self.rows[i] = (self.rows[i][0], dict(meta))
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+
+def fake_embed(texts):
+    return [np.ones(4, dtype=np.float32) for _ in texts]
+
+
+def index(tmp_path, collection, docs):
+    data_file = tmp_path / "data.json"
+    data_file.write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+    manifest = IndexManifest.load(str(tmp_path / "manifest.json"))
+    pipeline = IndexPipeline(collection, fake_embed, workers=1, embed_batch=8)
+    return pipeline.run(str(data_file), manifest=manifest)
+
+
+@pytest.fixture
+def doc():
+    return {"url": "https://fpt.edu.vn/hoc-phi", "title": "Học phí",
+            "type": "general", "content": "Học phí ngành CNTT 28 triệu / kỳ."}
+
+
+def test_type_change_rewrites_metadata_without_reembedding(tmp_path, doc):
+    collection = FakeCollection()
+    index(tmp_path, collection, [doc])
+    assert collection.added == 1
+
+    stats = index(tmp_path, collection, [{**doc, "type": "tuition"}])
+
+    # Text chunk không đổi → cùng id, không embed lại, metadata theo bản mới
+    assert collection.added == 1
+    assert stats["chunks_refreshed"] == 1
+    (_, meta), = collection.rows.values()
+    assert meta["doc_type"] == "tuition"
+
+
+def test_unchanged_document_is_not_rewritten(tmp_path, doc):
+    collection = FakeCollection()
+    index(tmp_path, collection, [doc])
+
+    stats = index(tmp_path, collection, [doc])
+
+    assert stats["docs_unchanged"] == 1
+    assert stats["chunks_refreshed"] == 0
+
+
+def test_feature_scan_runs_once_per_feature_version(tmp_path, doc):
+    collection = FakeCollection()
+    index(tmp_path, collection, [doc])
+    scans = collection.scans
+    assert scans > 0
+
+    # Manifest đã ghi FEATURE_VERSION → run không đổi gì không quét collection
+    index(tmp_path, collection, [doc])
+    assert collection.scans == scans
+
+
+def test_stale_features_are_refreshed_for_unchanged_documents(tmp_path, doc):
+    collection = FakeCollection()
+    index(tmp_path, collection, [doc])
+    (chunk_id, (text, meta)), = collection.rows.items()
+    collection.rows[chunk_id] = (text, {**meta, "rf_version": 1})
+
+    # Manifest từ bản cũ (chưa có feature_version) → quét và nâng cấp
+    manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+    manifest.pop("feature_version")
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    stats = index(tmp_path, collection, [doc])
+
+    assert stats["docs_unchanged"] == 1
+    assert stats["chunks_refreshed"] == 1
+    assert collection.rows[chunk_id][1]["rf_version"] == meta["rf_version"]
@@ -0,0 +1,170 @@
+# tests/test_llm_router.py
+# LLMRouter với server OpenAI / Gemini giả (HTTP thật trên localhost)
+
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("google.genai")
+
+from openai import OpenAI  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+from src.services import http_pool  # noqa: E402
+from src.services.fakes import (  # noqa: E402
+    FakeGeminiServer,
+    FakeOpenAIClient,
+    FakeOpenAIServer,
+    LatencyModel,
+)
+from src.services.llm_providers import GeminiProvider, LLMRouter, OpenAIProvider  # noqa: E402
+
+
+MESSAGES = [
+    {"role": "system", "content": "Trả lời ngắn."},
+    {"role": "user", "content": "Học phí bao nhiêu?"},
+]
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+
+    fake_openai = FakeOpenAIClient(llm_ttft="const:150", llm_token="const:1", seed=1)
+    fake_gemini = FakeOpenAIClient(llm_ttft="const:20", llm_token="const:1", seed=2)
+    openai_server = FakeOpenAIServer(fake_openai).start()
+    gemini_server = FakeGeminiServer(fake_gemini).start()
+
+    http_client = httpx.Client()
+    openai = OpenAIProvider(client=OpenAI(
+        api_key="test", base_url=openai_server.base_url,
+        http_client=http_client, max_retries=0,
+    ))
+    gemini = GeminiProvider(api_key="test", base_url=gemini_server.base_url)
+
+    yield {"openai": (openai, fake_openai), "gemini": (gemini, fake_gemini)}
+
+    openai_server.stop()
+    gemini_server.stop()
+    http_client.close()
+    http_pool.close()
+
+
+def _stream_once(router):
+    stream, name = router.open_stream(MESSAGES)
+    text = "".join(stream)
+    return name, text
+
+
+def test_routes_to_fastest_provider(backends):
+    openai, _ = backends["openai"]
+    gemini, _ = backends["gemini"]
+    router = LLMRouter([openai, gemini], race=False)
+
+    names = [_stream_once(router)[0] for _ in range(5)]
+
+    # 2 lượt đầu đo thử cả 2 provider, sau đó chỉ còn provider nhanh hơn
+    assert set(names[:2]) == {"openai", "gemini"}
+    assert names[2:] == ["gemini"] * 3
+
+
+def test_falls_back_on_error(backends):
+    openai, _ = backends["openai"]
+    gemini, fake_gemini = backends["gemini"]
+    fake_gemini.llm_error = 1.0
+    router = LLMRouter([gemini, openai], race=False)
+
+    text, name = router.complete(MESSAGES)
+    assert name == "openai"
+    assert text
+
+    name, text = _stream_once(router)
+    assert name == "openai"
+    assert router.stats()["gemini"]["error_rate"] == 1.0
+
+
+def test_race_returns_winner_and_cancels_loser(backends):
+    openai, fake_openai = backends["openai"]
+    gemini, _ = backends["gemini"]
+    fake_openai.llm_ttft = LatencyModel("const:2000")
+    router = LLMRouter([openai, gemini], race=True, race_after=0.0)
+
+    t0 = time.monotonic()
+    name, text = _stream_once(router)
+    elapsed = time.monotonic() - t0
+
+    assert name == "gemini"
+    assert text
+    assert elapsed < 1.0
+
+    # Bên thua bị huỷ ngay (latency ghi nhận lúc huỷ, không phải 2 s), không tính lỗi
+    time.sleep(0.2)
+    stats = router.stats()["openai"]
+    assert stats["samples"] == 1
+    assert stats["p50_ms"] < 1000
+    assert stats["error_rate"] == 0.0
+
+
+def test_recovers_after_cooldown(backends, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_FAILURES", 1)
+    monkeypatch.setattr(settings, "LLM_ROUTER_COOLDOWN", 0.3)
+    monkeypatch.setattr(settings, "LLM_ROUTER_ERROR_TTL", 0.5)
+
+    openai, _ = backends["openai"]
+    gemini, fake_gemini = backends["gemini"]
+    router = LLMRouter([gemini, openai], race=False)
+
+    # đo cả 2 provider trước (provider chưa có mẫu được thử trước)
+    assert [_stream_once(router)[0] for _ in range(3)] == ["gemini", "openai", "gemini"]
+
+    fake_gemini.llm_error = 1.0
+    assert _stream_once(router)[0] == "openai"
+    assert router.stats()["gemini"]["resting"]
+    assert [p.name for p in router.ranked()] == ["openai", "gemini"]
+
+    # Hết cooldown + lỗi cũ hết hạn → provider nhanh được dùng lại
+    fake_gemini.llm_error = 0.0
+    time.sleep(0.6)
+    assert [p.name for p in router.ranked()] == ["gemini", "openai"]
+    assert _stream_once(router)[0] == "gemini"
+
+
+def test_single_error_does_not_sideline_provider():
+    class Stub:
+        def __init__(self, name):
+            self.name = name
+
+    router = LLMRouter([Stub("openai"), Stub("gemini")], race=False)
+    router.record_error("gemini")
+    for _ in range(100):
+        router._stats["openai"].success(5.0)
+
+    # 1 lỗi thoáng qua không loại provider khỏi nhóm khỏe
+    assert [p.name for p in router.ranked()] == ["gemini", "openai"]
+
+
+def test_answer_stream_closes_provider_stream_when_consumer_stops():
+    from src.services.llm_providers import LLMStream
+    from src.services.llm_service import LLMService
+
+    closed = []
+
+    class StubRouter:
+        def open_stream(self, messages):
+            deltas = iter(["Học phí 28 triệu. ", "Đóng theo kỳ. ", "Có học bổng. "])
+            return LLMStream(deltas, close=lambda: closed.append(True)), "stub"
+
+        def record_error(self, name):
+            pass
+
+    service = LLMService(providers=[])
+    service.router = StubRouter()
+
+    # Consumer bị huỷ sau câu đầu (barge-in) → response phải được đóng ngay
+    answer = service.generate_answer_stream("học phí", {})
+    assert next(answer) == "Học phí 28 triệu."
+    answer.close()
+
+    assert closed == [True]